@@ -0,0 +1,132 @@
+"""Incrementally maintained player status table for the admin activity monitor.
+
+``ActivityTable`` keeps one row per player and is updated event by event
+from the game log, so each admin refresh only touches the players named in
+new events instead of rescanning every match for every player. Filtering and
+pagination run on the server, and only the requested page is turned into a
+DataFrame.
+"""
+import time
+from dataclasses import dataclass
+
+import game_events
+from game_records import Guilt, Offer, Response, Role, label, parse_code
+
+REGISTERED = "🔴 Registered"
+IN_MATCH = "🟡 In Match"
+COMPLETED = "🟢 Completed"
+STATUSES = [REGISTERED, IN_MATCH, COMPLETED]
+
+
+@dataclass(slots=True)
+class ActivityRow:
+    name: str
+    role: Role = None
+    guilt: Guilt = None
+    status: str = REGISTERED
+    activity: str = "Waiting for match"
+    match_id: str = None
+    since: float = None  # when the current status/activity started
+
+    def as_dict(self, now):
+        return {
+            "Player Name": self.name,
+            "Role": label(self.role) or "Unknown",
+            "Status": self.status,
+            "Activity": self.activity,
+            "Extra Info": f"({label(self.guilt) or 'Unknown'})" if self.role == Role.EBAY else "",
+            "For (s)": int(now - self.since) if self.since else None,
+        }
+
+
+class ActivityTable(game_events.FoldingHandler):
+    def __init__(self):
+        self.rows = {}
+        self.matches = {}  # match id -> (eBay player, AT&T player)
+
+    def _row(self, name, ts):
+        if name not in self.rows:
+            self.rows[name] = ActivityRow(name, since=ts)
+        return self.rows[name]
+
+    def apply(self, event):
+        kind = event.get("kind")
+        ts = event.get("ts")
+
+        if kind == game_events.JOIN:
+            self.rows[event["player"]] = ActivityRow(event["player"], since=ts)
+        elif kind == game_events.ROLE_ASSIGNED:
+            row = self._row(event["player"], ts)
+            row.role = parse_code(Role, event["role"])
+            row.guilt = parse_code(Guilt, event.get("guilt_status"))
+        elif kind == game_events.MATCHED:
+            self.matches[event["match_id"]] = (event["ebay_player"], event["att_player"])
+            if (event.get("round") or 1) == 1:  # later rounds start on an ``advanced`` event
+                for name in (event["ebay_player"], event["att_player"]):
+                    self._start_match(name, event["match_id"], ts)
+        elif kind == game_events.ADVANCED:
+            self._start_match(event["player"], event["match_id"], ts)
+        elif kind == game_events.OFFER:
+            ebay_player, att_player = self.matches.get(event["match_id"], (None, None))
+            if ebay_player in self.rows:
+                row = self.rows[ebay_player]
+                row.status = COMPLETED
+                row.activity = f"Offered: {label(parse_code(Offer, event['offer']))}"
+                if event.get("timed_out"):
+                    row.activity += " (timed out)"
+                row.since = ts
+            if att_player in self.rows and self.rows[att_player].match_id == event["match_id"]:
+                self.rows[att_player].activity = "Deciding on offer..."
+                self.rows[att_player].since = ts
+        elif kind == game_events.RESPONSE:
+            _, att_player = self.matches.get(event["match_id"], (None, None))
+            if att_player in self.rows:
+                row = self.rows[att_player]
+                row.status = COMPLETED
+                row.activity = f"Response: {label(parse_code(Response, event['response']))}"
+                if event.get("timed_out"):
+                    row.activity += " (timed out)"
+                row.since = ts
+        elif kind == game_events.LEFT:
+            self.rows.pop(event["player"], None)
+            self.matches.pop(event.get("match_id"), None)
+            for match_id in event.get("dropped") or {}:
+                self.matches.pop(match_id, None)
+            partner = self.rows.get(event.get("partner"))
+            if partner:
+                partner.status, partner.activity = REGISTERED, "Partner left - waiting for match"
+                partner.match_id = None
+                partner.since = ts
+        elif kind == game_events.RESET:
+            self.rows.clear()
+            self.matches.clear()
+
+    def _start_match(self, name, match_id, ts):
+        ebay_player, _ = self.matches[match_id]
+        row = self._row(name, ts)
+        row.status = IN_MATCH
+        row.activity = "Making offer..." if name == ebay_player else "Waiting for eBay offer..."
+        row.match_id = match_id
+        row.since = ts
+
+    def filter(self, role=None, status=None, stuck_for=None, search="", now=None):
+        """Rows matching every given filter, sorted by player name.
+
+        ``stuck_for`` keeps only players who have been in a match for at
+        least that many seconds without finishing their move.
+        """
+        now = time.time() if now is None else now
+        search = search.strip().lower()
+        selected = []
+        for row in self.rows.values():
+            if role is not None and row.role != role:
+                continue
+            if status is not None and row.status != status:
+                continue
+            if stuck_for and not (row.status == IN_MATCH and row.since and now - row.since >= stuck_for):
+                continue
+            if search and search not in row.name.lower():
+                continue
+            selected.append(row)
+        selected.sort(key=lambda row: row.name)
+        return selected
@@ -0,0 +1,149 @@
+"""Admission control for the registration burst.
+
+When the instructor says "go", the whole room joins within a few seconds.
+Instead of each join writing its own player node and counter, joins are
+admitted into a bounded, process-wide ``JoinQueue`` and one applier thread
+writes them in batches: a single multi-path update for up to
+``JOIN_BATCH`` players (their nodes and ``join`` events), then one
+transaction per registration shard touched. A join that finds the queue
+full is told to retry shortly.
+
+Waiting students see their position in the queue and the class count. The
+count is read for the whole process by at most one caller every
+``COUNT_INTERVAL``. So during a burst each server process sends roughly
+(1 + ``cohort.REGISTRATION_SHARDS``) writes every ``JOIN_INTERVAL`` and one
+small read per ``COUNT_INTERVAL``. That rate does not grow with the class
+size.
+"""
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import cohort
+from background import Backoff, PerDatabase, ensure_thread
+
+MAX_QUEUED = cohort.MAX_PLAYERS  # joins waiting to be written, per process
+JOIN_BATCH = 500  # players per multi-path update
+JOIN_INTERVAL = 0.5  # seconds between batches
+COUNT_INTERVAL = 1.0  # seconds a registration count is reused
+
+
+class JoinQueue:
+    def __init__(self, database, interval=JOIN_INTERVAL, max_queued=MAX_QUEUED):
+        self.database = database
+        self.interval = interval
+        self.max_queued = max_queued
+        self.last_error = None
+        self._queued = OrderedDict()  # name -> (Player, registration update), in arrival order
+        self._count = (0, 0.0)  # (registered, read at)
+        self._cond = threading.Condition()
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    def admit(self, player):
+        """Queue ``player``'s join; returns their 1-based position, or None if the queue is full."""
+        with self._cond:
+            if player.name not in self._queued:
+                if len(self._queued) >= self.max_queued:
+                    return None
+                # Built once, so a retried batch rewrites the same nodes and event keys
+                self._queued[player.name] = (player, cohort.registration_update(player))
+                self._thread = ensure_thread(self._thread, self._run, "join-queue")
+                self._cond.notify_all()
+            return self._position(player.name)
+
+    def _position(self, name):
+        for position, queued_name in enumerate(self._queued, start=1):
+            if queued_name == name:
+                return position
+        return None
+
+    def position(self, name):
+        """1-based place in the queue, or None once the join has been written (or was never queued)."""
+        with self._cond:
+            return self._position(name) if name in self._queued else None
+
+    def queued_player(self, name):
+        with self._cond:
+            return self._queued[name][0] if name in self._queued else None
+
+    def registered_count(self):
+        """Written registrations; one caller per process refreshes it every ``COUNT_INTERVAL``."""
+        with self._count_lock:
+            count, read_at = self._count
+            if time.time() - read_at >= COUNT_INTERVAL:
+                count = cohort.registered_count(self.database)
+                self._count = (count, time.time())
+            return count
+
+    def forget(self):
+        """Drop joins not yet written (after an admin reset or restore).
+
+        They were admitted into the previous game and must not be written into
+        the next one. A batch already on its way to the database can't be
+        called back.
+        """
+        with self._cond:
+            self._queued.clear()
+            self._count = (0, 0.0)
+            self._cond.notify_all()
+
+    def flush(self, timeout=10.0):
+        """Block until every join queued so far has been written; True on success."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._queued:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        backoff = Backoff()
+        while True:
+            with self._cond:
+                while not self._queued:
+                    self._cond.wait()
+            time.sleep(self.interval)
+            with self._cond:
+                batch = list(self._queued.values())[:JOIN_BATCH]
+            if not batch:  # forgotten while the interval was open
+                continue
+
+            try:
+                updates = {}
+                for _, update in batch:
+                    updates.update(update)
+                self.database.reference("/").update(updates)
+            except Exception as error:
+                self.last_error = error
+                backoff.wait()
+                continue
+
+            # The players are written; from here on only the counters are retried, under one token
+            # so an increment that landed without an acknowledgement is not added again
+            pending = Counter(cohort.registration_shard(player.name) for player, _ in batch)
+            token = secrets.token_hex(4)
+            while pending:
+                for shard, joined in list(pending.items()):
+                    try:
+                        cohort.add_registrations(self.database, shard, joined, token)
+                        del pending[shard]
+                    except Exception as error:
+                        self.last_error = error
+                if pending:
+                    backoff.wait()
+
+            with self._cond:
+                for player, _ in batch:
+                    self._queued.pop(player.name, None)
+                self._count = (0, 0.0)  # the next count must include this batch
+                self._cond.notify_all()
+            backoff.reset()
+            self.last_error = None
+
+
+# Process-wide join queue for a database (shared by every session)
+queue_for = PerDatabase(JoinQueue)
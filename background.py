@@ -0,0 +1,49 @@
+"""Pieces shared by the background writers (``write_behind``, ``admission``).
+
+Each keeps one queue per database for the whole server process, drained by
+a daemon thread that retries failed writes with exponential backoff.
+"""
+import threading
+import time
+
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 8.0
+
+
+class Backoff:
+    """Exponential backoff between retries: 0.5 s, 1 s, 2 s ... capped at ``MAX_BACKOFF``."""
+
+    def __init__(self, sleep=time.sleep):
+        self.delay = 0.0
+        self._sleep = sleep
+
+    def wait(self):
+        self.delay = min(max(self.delay * 2, MIN_BACKOFF), MAX_BACKOFF)
+        self._sleep(self.delay)
+
+    def reset(self):
+        self.delay = 0.0
+
+
+def ensure_thread(thread, target, name):
+    """``thread`` if it is still running, else a new daemon thread running ``target`` (started)."""
+    if thread is not None and thread.is_alive():
+        return thread
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+class PerDatabase:
+    """One ``factory(database)`` per database for the whole process, created on first use."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, database):
+        with self._lock:
+            if id(database) not in self._instances:
+                self._instances[id(database)] = self.factory(database)
+            return self._instances[id(database)]
@@ -0,0 +1,174 @@
+"""Bot players that fill empty seats and stand in for players who left.
+
+A single no-show or an odd headcount otherwise stalls the whole room: the
+waiting room waits for every expected registration, and pairing needs as
+many AT&T players as eBay players. With bots enabled, the admin can:
+
+* fill every empty seat in one batch (``fill_seats``). An odd class gets
+  one extra seat. Bots take the open AT&T seats first and then eBay seats
+  (with the usual guilt draw). In classes paired player by player, bots
+  that no human will be paired with are matched with each other straight
+  away.
+* have a bot take over a player who goes silent mid-game (``take_over``,
+  from ``presence.sweep``) instead of removing them, so the partner keeps
+  their match.
+
+Bots have no screen of their own. Whoever is waiting on one (the
+partner's page, or the admin refresh for bot-vs-bot matches) makes the
+bot's move at once with ``play``. Like a deadline default, the move is
+written in a transaction on the match, so only one client moves for the
+bot. Bots follow the equilibrium mixed strategy of the current game
+parameters, or a configured one. Settings and the bot roster live under
+``lawsuit_bots``:
+
+    {"enabled": True, "strategy": "Equilibrium", "guilty_stingy": 0.5, "accept_stingy": 0.5,
+     "players": {"Bot 01": True, ...}}
+"""
+import random
+import time
+from collections import Counter
+
+import cohort
+import deadlines
+import equilibrium
+import game_events
+import rounds
+from equilibrium import DEFAULT_PRIOR
+from game_records import Guilt, Match, Player, Role, label
+
+BOTS_PATH = "lawsuit_bots"
+PLAYERS_PATH = f"{BOTS_PATH}/players"  # name -> True for every bot (and player taken over)
+NAME_PREFIX = "Bot"
+EQUILIBRIUM = "Equilibrium"
+CUSTOM = "Custom"
+STRATEGIES = [EQUILIBRIUM, CUSTOM]
+
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "strategy": EQUILIBRIUM,
+    "guilty_stingy": 0.5,  # custom strategy: P(guilty bot offers Stingy)
+    "accept_stingy": 0.5,  # P(AT&T bot accepts a Stingy offer)
+}
+
+
+def load_settings(database):
+    raw = database.reference(BOTS_PATH).get()
+    return {**DEFAULT_SETTINGS, "players": {}, **(raw if isinstance(raw, dict) else {})}
+
+
+def save_settings(database, settings):
+    """Store the admin's settings (the bot roster is left alone)."""
+    database.reference(BOTS_PATH).update({key: settings[key] for key in DEFAULT_SETTINGS})
+
+
+def is_bot(settings, name):
+    return name in (settings.get("players") or {})
+
+
+def strategy(settings, params):
+    """(P(guilty offers Stingy), P(AT&T accepts Stingy)) the bots play."""
+    if settings["strategy"] == CUSTOM:
+        return settings["guilty_stingy"], settings["accept_stingy"]
+    eq = equilibrium.solve(params)
+    return eq.guilty_stingy, eq.accept_stingy
+
+
+def free_names(players, count):
+    """``count`` bot names not taken by anyone in ``players``."""
+    names = []
+    n = 0
+    while len(names) < count:
+        n += 1
+        name = f"{NAME_PREFIX} {n:02d}"
+        if name not in players:
+            names.append(name)
+    return names
+
+
+def fill_seats(database, players, expected_players, pair=False, rng=random, guilt_prior=DEFAULT_PRIOR, now=None):
+    """Register a bot for every empty seat; returns the bots added.
+
+    ``players`` is a parsed {name: Player} snapshot. An odd expected count is
+    raised by one first. With ``pair`` (classes paired player by player),
+    bot eBay and AT&T players are matched with each other as far as the
+    humans still to be paired leave room for.
+    """
+    now = time.time() if now is None else now
+    seats = expected_players + expected_players % 2
+    missing = seats - len(players)
+    if missing <= 0:
+        return []
+    att_open = max(0, seats - seats // 2 - len([p for p in players.values() if p.role == Role.ATT]))
+
+    new_bots = []
+    for i, name in enumerate(free_names(players, missing)):
+        if i < att_open:
+            new_bots.append(Player(name, now, Role.ATT))
+        else:
+            guilt = Guilt.GUILTY if rng.random() < guilt_prior else Guilt.INNOCENT
+            new_bots.append(Player(name, now, Role.EBAY, guilt))
+
+    matches = []
+    if pair:
+        ebay_bots = [bot for bot in new_bots if bot.role == Role.EBAY]
+        att_bots = [bot for bot in new_bots if bot.role == Role.ATT]
+        for ebay_bot, att_bot in zip(ebay_bots, att_bots):
+            match = Match(f"{ebay_bot.name}_vs_{att_bot.name}", ebay_bot.name, att_bot.name, ebay_bot.guilt, now)
+            ebay_bot.match_id = att_bot.match_id = match.match_id
+            matches.append(match)
+
+    updates = {}
+    for bot in new_bots:
+        updates.update(cohort.registration_update(bot))
+        updates.update(game_events.event_update(game_events.ROLE_ASSIGNED, player=bot.name, role=label(bot.role),
+                                                guilt_status=label(bot.guilt), ts=now))
+        updates[f"{PLAYERS_PATH}/{bot.name}"] = True
+    for match in matches:
+        # The player nodes above already link to their match
+        updates.update({path: value for path, value in cohort.match_update(match).items()
+                        if not path.startswith("lawsuit_players/")})
+    if seats != expected_players:
+        updates["lawsuit_expected_players"] = seats
+        updates.update(game_events.event_update(game_events.CONFIGURE, expected_players=seats, ts=now))
+    database.reference("/").update(updates)
+
+    token = f"bots-{now}"
+    for shard, joined in Counter(cohort.registration_shard(bot.name) for bot in new_bots).items():
+        cohort.add_registrations(database, shard, joined, token)
+    return new_bots
+
+
+def take_over(database, player):
+    """Let a bot play on for ``player``; False if another client already handed them over."""
+    taken = {}
+
+    def take(current):
+        taken["ok"] = current is None
+        return True
+
+    database.reference(f"{PLAYERS_PATH}/{player.name}").transaction(take)
+    if taken.get("ok"):
+        game_events.log_event(database, game_events.REPLACED, player=player.name, match_id=player.match_id)
+    return bool(taken.get("ok"))
+
+
+def play(database, match, settings, params, now=None, rng=random):
+    """Make the pending move in ``match`` if it is a bot's; returns the step played, or None."""
+    if not settings["enabled"] or match.is_complete:
+        return None
+    step = deadlines.pending_step(match)
+    mover, partner = ((match.ebay_player, match.att_player) if step == deadlines.OFFER
+                      else (match.att_player, match.ebay_player))
+    if not is_bot(settings, mover):
+        return None
+    now = time.time() if now is None else now
+    if match.created_at is None:
+        # A later round starts when its players get there; a human partner does that themselves
+        if not is_bot(settings, partner):
+            return None
+        rounds.advance(database, (match.ebay_player, match.att_player), match.match_id, match.round_no, now)
+
+    guilty_stingy, accept_stingy = strategy(settings, params)
+    move = (deadlines.offer_move(match, guilty_stingy, rng) if step == deadlines.OFFER
+            else deadlines.response_move(match, accept_stingy, rng))
+    return deadlines.apply_move(database, match, step, move, now, params.table(), bot=True)
@@ -0,0 +1,139 @@
+"""Dashboard charts with a choice of renderer.
+
+Every live chart is a handful of aggregated numbers (percentages per
+choice, or a binned distribution). ``NATIVE`` sends just those numbers as
+a Vega-Lite spec that the browser draws; ``MATPLOTLIB`` rasterizes the
+same chart on the server as before. The backend is chosen with the
+``chart_backend`` secret and defaults to native. The PDF report always
+uses matplotlib (see ``reports``).
+
+The ``*_spec`` builders are plain functions of the numbers, so they can be
+checked without Streamlit.
+"""
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+import numpy as np
+import streamlit as st
+
+NATIVE = "native"
+MATPLOTLIB = "matplotlib"
+BACKENDS = [NATIVE, MATPLOTLIB]
+
+
+def backend():
+    try:
+        choice = st.secrets.get("chart_backend", NATIVE)
+    except Exception:  # no secrets file
+        choice = NATIVE
+    return choice if choice in BACKENDS else NATIVE
+
+
+def percentages(choices, labels):
+    """Share of each label among ``choices``, in percent (labels never chosen get 0)."""
+    total = len(choices)
+    return [sum(1 for choice in choices if choice == label) / total * 100 if total else 0 for label in labels]
+
+
+def bar_spec(categories, values, colors, title, subtitle=None, y_max=110):
+    """Vega-Lite bar chart with value labels, from the percentages alone."""
+    data = [{"category": category, "value": round(value, 1)} for category, value in zip(categories, values)]
+    return {
+        "title": {"text": title, **({"subtitle": subtitle} if subtitle else {})},
+        "data": {"values": data},
+        "encoding": {
+            "x": {"field": "category", "type": "nominal", "sort": list(categories), "title": None,
+                  "axis": {"labelAngle": 0}},
+            "y": {"field": "value", "type": "quantitative", "title": "Percentage (%)",
+                  "scale": {"domain": [0, max(y_max, max(values, default=0) * 1.1)]}},
+        },
+        "layer": [
+            {"mark": {"type": "bar", "opacity": 0.8},
+             "encoding": {"color": {"field": "category", "type": "nominal", "legend": None,
+                                    "scale": {"domain": list(categories), "range": list(colors)}}}},
+            {"mark": {"type": "text", "dy": -8, "fontWeight": "bold"},
+             "encoding": {"text": {"field": "value", "type": "quantitative", "format": ".1f"}}},
+        ],
+    }
+
+
+def distribution_spec(edges, density, band, class_value, title):
+    """Histogram of simulated class results with the 95% band and the class's own value."""
+    bins = [{"start": float(start), "end": float(end), "density": float(d)}
+            for start, end, d in zip(edges[:-1], edges[1:], density)]
+    layers = [
+        {"data": {"values": [{"low": float(band[0]), "high": float(band[1])}]},
+         "mark": {"type": "rect", "color": "#95a5a6", "opacity": 0.2},
+         "encoding": {"x": {"field": "low", "type": "quantitative"}, "x2": {"field": "high"}}},
+        {"data": {"values": bins},
+         "mark": {"type": "bar", "color": "#3498db", "opacity": 0.7},
+         "encoding": {"x": {"field": "start", "type": "quantitative", "title": "Percentage (%)",
+                            "scale": {"domain": [0, 100]}},
+                      "x2": {"field": "end"},
+                      "y": {"field": "density", "type": "quantitative", "axis": None}}},
+    ]
+    if class_value is not None:
+        layers.append({"data": {"values": [{"value": float(class_value)}]},
+                       "mark": {"type": "rule", "color": "#e74c3c", "strokeWidth": 3},
+                       "encoding": {"x": {"field": "value", "type": "quantitative"}}})
+    subtitle = f"95% of classes: {band[0]:.0f}-{band[1]:.0f}%"
+    if class_value is not None:
+        subtitle += f" · Your class: {class_value:.1f}%"
+    return {"title": {"text": title, "subtitle": subtitle}, "layer": layers}
+
+
+def show_percentage_bar(categories, values, colors, title, subtitle=None, chart_backend=None):
+    """Bar chart of percentages per category with value labels."""
+    if (chart_backend or backend()) == NATIVE:
+        st.vega_lite_chart(bar_spec(categories, values, colors, title, subtitle), use_container_width=True)
+        return
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    bars = ax.bar(categories, values, color=colors, alpha=0.8)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_ylabel("Percentage (%)")
+    ax.set_ylim(0, 110)
+
+    # Add value labels
+    for bar, pct in zip(bars, values):
+        ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
+               f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
+
+    if subtitle:
+        ax.text(0.02, 0.98, subtitle, transform=ax.transAxes, fontsize=10, verticalalignment='top', alpha=0.7)
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+def show_distributions(panels, suptitle, chart_backend=None):
+    """Side-by-side histograms; ``panels`` are (values, band, class value or None, title)."""
+    edges = np.linspace(0, 100, 21)
+    if (chart_backend or backend()) == NATIVE:
+        for column, (values, band, class_value, title) in zip(st.columns(len(panels)), panels):
+            density, _ = np.histogram(values[~np.isnan(values)], bins=edges, density=True)
+            with column:
+                st.vega_lite_chart(distribution_spec(edges, density, band, class_value, title),
+                                   use_container_width=True)
+        st.caption(suptitle)
+        return
+
+    fig, axes = plt.subplots(1, len(panels), figsize=(14, 5))
+    for ax, (values, (low, high), class_value, title) in zip(np.atleast_1d(axes), panels):
+        ax.hist(values[~np.isnan(values)], bins=edges, density=True, color='#3498db', alpha=0.7)
+        ax.axvspan(low, high, color='#95a5a6', alpha=0.2, label=f"95% of classes: {low:.0f}-{high:.0f}%")
+        if class_value is not None:
+            ax.axvline(class_value, color='#e74c3c', linewidth=3, label=f"Your class: {class_value:.1f}%")
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.set_yticks([])
+        ax.legend(loc='upper right')
+        ax.grid(True, alpha=0.3)
+    fig.suptitle(suptitle, fontsize=14)
+    plt.tight_layout()
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+def generated_note(sample_size):
+    return f"Sample size: {sample_size} participants · Generated: {datetime.today().strftime('%B %d, %Y')}"
@@ -0,0 +1,137 @@
+"""Confidence intervals and tests for the class-vs-theory metrics.
+
+Every class metric is a ratio of outcome counts over the completed
+matches (e.g. accepted / all Stingy offers). For each metric this module
+reports:
+
+* an exact (Clopper-Pearson) binomial interval,
+* a bootstrap interval that resamples whole matches. It is vectorized:
+  one multinomial draw per replicate over the five possible outcomes,
+* an exact two-sided binomial test against the equilibrium value.
+
+The five outcome counts are all the data the report depends on, so
+``class_report`` is memoized on them, the game parameters and the
+settings. Dashboard refreshes that see no new completed match reuse the
+cached report.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+import equilibrium
+
+CONFIDENCE = 0.95
+BOOTSTRAP_REPLICATES = 20_000
+
+
+def outcome_counts(matches):
+    """Counts of each outcome in ``equilibrium.OUTCOMES`` order, over completed matches."""
+    index = {outcome: i for i, outcome in enumerate(equilibrium.OUTCOMES)}
+    counts = [0] * len(index)
+    for match in matches:
+        outcome = (match.guilt, match.offer, match.response)
+        if outcome in index:
+            counts[index[outcome]] += 1
+    return tuple(counts)
+
+
+@lru_cache(maxsize=1024)
+def _log_choose(n):
+    """log C(n, i) for i = 0..n."""
+    steps = np.log(np.arange(n, 0, -1, dtype=float)) - np.log(np.arange(1, n + 1, dtype=float))
+    return np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def binomial_pmf(n, p):
+    i = np.arange(n + 1)
+    if p <= 0:
+        return (i == 0).astype(float)
+    if p >= 1:
+        return (i == n).astype(float)
+    return np.exp(_log_choose(n) + i * np.log(p) + (n - i) * np.log1p(-p))
+
+
+def exact_interval(successes, trials, level=CONFIDENCE):
+    """Clopper-Pearson interval for a binomial proportion (by bisection on the CDF)."""
+    if trials == 0:
+        return (float("nan"), float("nan"))
+    alpha = (1 - level) / 2
+
+    def solve(target, tail):
+        low, high = 0.0, 1.0
+        for _ in range(60):
+            mid = (low + high) / 2
+            pmf = binomial_pmf(trials, mid)
+            value = pmf[successes:].sum() if tail == "upper" else pmf[:successes + 1].sum()
+            # P(X >= k) grows with p; P(X <= k) shrinks with p
+            if (value < target) == (tail == "upper"):
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    lower = 0.0 if successes == 0 else solve(alpha, "upper")
+    upper = 1.0 if successes == trials else solve(alpha, "lower")
+    return (lower, upper)
+
+
+def binomial_test(successes, trials, p):
+    """Exact two-sided p-value for ``successes`` out of ``trials`` against rate ``p``."""
+    if trials == 0:
+        return float("nan")
+    pmf = binomial_pmf(trials, p)
+    return float(min(1.0, pmf[pmf <= pmf[successes] * (1 + 1e-7)].sum()))
+
+
+def _ratios(counts):
+    """Metric numerators and denominators from outcome count arrays (last axis = outcome)."""
+    gga, gsa, gsr, isa, isr = (counts[..., i] for i in range(5))  # equilibrium.OUTCOMES order
+    guilty_stingy = gsa + gsr
+    stingy = guilty_stingy + isa + isr
+    return {
+        "Guilty eBay choose Stingy": (guilty_stingy, gga + guilty_stingy),
+        "AT&T accept Stingy": (gsa + isa, stingy),
+        "P(Guilty | Stingy)": (guilty_stingy, stingy),
+    }
+
+
+@lru_cache(maxsize=256)
+def class_report(counts, params=equilibrium.GameParameters(), level=CONFIDENCE,
+                 replicates=BOOTSTRAP_REPLICATES, seed=0):
+    """One row per metric: class value, theory, exact and bootstrap intervals, test.
+
+    ``counts`` comes from ``outcome_counts``; results are memoized on it.
+    """
+    theory = equilibrium.solve(params)
+    theory_values = {
+        "Guilty eBay choose Stingy": theory.guilty_stingy,
+        "AT&T accept Stingy": theory.accept_stingy,
+        "P(Guilty | Stingy)": theory.posterior,
+    }
+    observed = _ratios(np.array(counts))
+
+    total = sum(counts)
+    boot = None
+    if total:
+        rng = np.random.default_rng(seed)
+        resampled = rng.multinomial(total, np.array(counts) / total, size=replicates)
+        boot = _ratios(resampled)
+
+    tail = (1 - level) / 2 * 100
+    rows = []
+    for metric, (successes, trials) in observed.items():
+        successes, trials = int(successes), int(trials)
+        row = {"Metric": metric, "Class": None, "Theory": theory_values[metric], "n": trials,
+               "Exact CI": (None, None), "Bootstrap CI": (None, None), "p-value": None, "Verdict": "No data yet"}
+        if trials:
+            row["Class"] = successes / trials
+            row["Exact CI"] = exact_interval(successes, trials, level)
+            numerators, denominators = boot[metric]
+            valid = denominators > 0
+            row["Bootstrap CI"] = tuple(float(x) for x in
+                                        np.percentile(numerators[valid] / denominators[valid], [tail, 100 - tail]))
+            row["p-value"] = binomial_test(successes, trials, theory_values[metric])
+            row["Verdict"] = ("Consistent with theory" if row["p-value"] >= 1 - level
+                              else "Differs from theory")
+        rows.append(row)
+    return rows
@@ -0,0 +1,223 @@
+"""Registration, pairing and paging helpers that scale to large cohorts.
+
+Classes with more than ``LARGE_COHORT_THRESHOLD`` expected players run in
+large-cohort mode:
+
+* Registration is counted in ``REGISTRATION_SHARDS`` sharded counters under
+  ``lawsuit_registration``; the waiting room reads those few counters instead
+  of downloading the whole ``lawsuit_players`` tree on every poll.
+* Roles, guilt draws and pairings for the whole class are computed once by
+  whichever client wins the ``lawsuit_pairing`` claim, and written in batched
+  multi-path updates. Each student then only reads their own player node.
+* The admin activity monitor and the PDF results table are paginated.
+
+Throughput targets for 5,000 players (checked by ``load_test.py`` against
+the in-memory stand-in in ``memory_db``):
+
+* Registration: at most 3 writes per join and no full-tree reads.
+* Waiting-room poll: one read of at most ``REGISTRATION_SHARDS`` counters
+  (< 1 KB) regardless of class size.
+* Pairing: the whole class in at most ceil(N / 2 / PAIRING_BATCH_SIZE) + 1
+  writes and under 2 s of CPU.
+* Admin refresh (new events and one monitor page, no full-tree reads):
+  under 1 s; the admin's periodic sweep over both trees: under 2 s.
+"""
+import random
+import time
+import uuid
+import zlib
+
+import game_events
+from equilibrium import DEFAULT_PRIOR
+from game_records import Guilt, Match, Player, Role, label, numbered_key
+
+LARGE_COHORT_THRESHOLD = 100
+MAX_PLAYERS = 5000
+
+REGISTRATION_PATH = "lawsuit_registration"
+REGISTRATION_SHARDS = 16
+PAIRING_PATH = "lawsuit_pairing"
+PAIRING_LOCK_TIMEOUT = 30  # seconds before a stalled pairing claim can be taken over
+PAIRING_BATCH_SIZE = 500  # matches per multi-path update
+
+MONITOR_PAGE_SIZE = 50
+PDF_ROWS_PER_PAGE = 40
+
+
+def is_large_cohort(expected_players):
+    return expected_players > LARGE_COHORT_THRESHOLD
+
+
+def registration_shard(name):
+    return numbered_key("s", zlib.crc32(name.encode("utf-8")) % REGISTRATION_SHARDS)
+
+
+def register_player(database, name, now=None):
+    """Write a new player's node, log the join and bump the registration counter.
+
+    Returns the new ``Player``.
+    """
+    player = Player(name, time.time() if now is None else now)
+    database.reference("/").update(registration_update(player))
+    count_registration(database, name)
+    return player
+
+
+def registration_update(player):
+    """Multi-path update creating a new player's node and logging the join."""
+    return {
+        f"lawsuit_players/{player.name}": player.to_wire(),
+        **game_events.event_update(game_events.JOIN, player=player.name, ts=player.joined_at),
+    }
+
+
+def count_registration(database, name, delta=1):
+    """Add ``delta`` to the registration counter shard owned by ``name``."""
+    add_registrations(database, registration_shard(name), delta)
+
+
+def add_registrations(database, shard, delta, token=None):
+    """Add ``delta`` to one registration counter shard (a batch of joins counts once per shard).
+
+    A shard remembers the ``token`` of its last increment, so retrying one
+    whose acknowledgement was lost does not count the batch twice.
+    """
+    def add(current):
+        if isinstance(current, dict):
+            count, last = current.get("n") or 0, current.get("last")
+        else:
+            count, last = current or 0, None  # plain counters from older games
+        if token is not None and token == last:
+            return current
+        return {"n": max(0, count + delta), "last": token}
+
+    database.reference(f"{REGISTRATION_PATH}/{shard}").transaction(add)
+
+
+def _shard_count(value):
+    if isinstance(value, dict):
+        value = value.get("n")
+    return value if isinstance(value, int) else 0
+
+
+def registered_count(database):
+    shards = database.reference(REGISTRATION_PATH).get() or {}
+    if not isinstance(shards, dict):
+        return 0
+    return sum(_shard_count(value) for value in shards.values())
+
+
+def claim_pairing(database, owner, token=None, now=None):
+    """Try to become the client that pairs the whole class.
+
+    ``token`` identifies the claimant (a new one per call if not given); a
+    client passes the same token again to recognise a fresh claim as its own
+    on a rerun or a retry after a lost acknowledgement. ``owner`` is only
+    recorded for the admin. Returns "claimed", "in_progress" (someone else
+    holds a fresh claim) or "done" (the class has already been paired).
+    """
+    now = time.time() if now is None else now
+    token = token or uuid.uuid4().hex
+
+    def take(current):
+        if isinstance(current, dict) and (current.get("done") or now - current.get("t", 0) < PAIRING_LOCK_TIMEOUT):
+            return current
+        return {"owner": owner, "token": token, "t": now}
+
+    result = database.reference(PAIRING_PATH).transaction(take) or {}
+    if result.get("done"):
+        return "done"
+    # Two tabs (or a stale one) may use the same player name, so only the token says whose claim it is
+    return "claimed" if result.get("token") == token else "in_progress"
+
+
+def pair_all(database, players, expected_players, rng=random, guilt_prior=DEFAULT_PRIOR):
+    """Assign roles to everyone still unassigned and pair the whole class.
+
+    ``players`` is a parsed {name: Player} snapshot. The first
+    ``expected_players`` players by join time take part; roles already handed
+    out are kept, the rest fill the eBay quota first (with the ``guilt_prior``
+    draw) and then AT&T. Unmatched eBay and AT&T players are zipped together
+    and written ``PAIRING_BATCH_SIZE`` matches at a time. Returns the number
+    of matches created.
+    """
+    roster = class_roster(players, expected_players)
+    updates = assign_roles(roster, expected_players, rng, guilt_prior)
+
+    waiting_ebay = [p for p in roster if p.role == Role.EBAY and not p.match_id]
+    waiting_att = [p for p in roster if p.role == Role.ATT and not p.match_id]
+
+    now = time.time()
+    created = 0
+    for ebay_player, att_player in zip(waiting_ebay, waiting_att):
+        match_id = f"{ebay_player.name}_vs_{att_player.name}"
+        updates.update(match_update(Match(match_id, ebay_player.name, att_player.name, ebay_player.guilt, now)))
+        created += 1
+        if created % PAIRING_BATCH_SIZE == 0:
+            database.reference("/").update(updates)
+            updates = {}
+
+    updates[PAIRING_PATH] = {"done": True, "t": now, "matches": created}
+    database.reference("/").update(updates)
+    return created
+
+
+def class_roster(players, expected_players):
+    """The first ``expected_players`` players by join time."""
+    return sorted(players.values(), key=lambda p: (p.joined_at or 0, p.name))[:expected_players]
+
+
+def assign_roles(roster, expected_players, rng=random, guilt_prior=DEFAULT_PRIOR):
+    """Give every unassigned roster player a role (eBay quota first); returns the updates."""
+    ebay_quota = expected_players // 2
+    ebay_count = len([p for p in roster if p.role == Role.EBAY])
+
+    updates = {}
+    for player in roster:
+        if player.role is not None:
+            continue
+        if ebay_count < ebay_quota:
+            player.role = Role.EBAY
+            player.guilt = Guilt.GUILTY if rng.random() < guilt_prior else Guilt.INNOCENT
+            ebay_count += 1
+        else:
+            player.role = Role.ATT
+        updates.update(role_update(player))
+    return updates
+
+
+def role_update(player):
+    """Multi-path update storing ``player``'s role (and guilt draw) and logging it."""
+    updates = {f"lawsuit_players/{player.name}/r": int(player.role)}
+    if player.guilt is not None:
+        updates[f"lawsuit_players/{player.name}/g"] = int(player.guilt)
+    updates.update(game_events.event_update(game_events.ROLE_ASSIGNED, player=player.name,
+                                            role=label(player.role), guilt_status=label(player.guilt)))
+    return updates
+
+
+def match_update(match):
+    """Multi-path update creating ``match`` and linking both players to it.
+
+    Matches of later rounds (``round_no`` > 1) are only created; players are
+    linked to them when they get there (see ``rounds``).
+    """
+    updates = {f"lawsuit_matches/{match.match_id}": match.to_wire()}
+    if match.round_no is None or match.round_no == 1:
+        updates[f"lawsuit_players/{match.ebay_player}/m"] = match.match_id
+        updates[f"lawsuit_players/{match.att_player}/m"] = match.match_id
+    event_fields = {"round": match.round_no} if match.round_no is not None else {}
+    updates.update(game_events.event_update(game_events.MATCHED, match_id=match.match_id,
+                                            ebay_player=match.ebay_player, att_player=match.att_player,
+                                            ebay_guilt=label(match.guilt), ts=match.created_at, **event_fields))
+    return updates
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def paginate(items, page, page_size):
+    """Slice out 1-based ``page`` of ``items``."""
+    start = (page - 1) * page_size
+    return items[start:start + page_size]
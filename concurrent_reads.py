@@ -0,0 +1,54 @@
+"""Shared, bounded thread pool for issuing independent database reads together.
+
+Each Firebase read is a blocking HTTP round trip. Reads that don't depend on
+each other are submitted to one process-wide pool so a rerun waits for the
+slowest of them instead of their sum. The pool is created once per server
+process and shared by every session, so the number of reader threads stays
+at ``MAX_WORKERS`` however many sessions refresh at once; when more reads
+are in flight they queue for a free worker.
+
+A ``gather`` issued from inside a pooled call runs its calls inline, so a
+nested read never waits on workers that are all busy waiting for it.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 16  # room for one admin refresh (7 reads) plus a few student reruns
+THREAD_PREFIX = "db-read"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix=THREAD_PREFIX)
+
+
+def _run_inline(calls):
+    results, errors = [], []
+    for call in calls:
+        try:
+            results.append(call())
+            errors.append(None)
+        except Exception as e:
+            results.append(None)
+            errors.append(e)
+    return results, errors
+
+
+def gather(*calls):
+    """Run zero-argument callables concurrently and return their results in order.
+
+    If any call raises, the first exception (in argument order) is re-raised
+    after all calls have finished.
+    """
+    if len(calls) <= 1 or threading.current_thread().name.startswith(THREAD_PREFIX):
+        results, errors = _run_inline(calls)
+    else:
+        futures = [_executor.submit(call) for call in calls]
+        errors = [future.exception() for future in futures]
+        results = [None if error else future.result() for future, error in zip(futures, errors)]
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
+
+
+def fetch_all(database, *paths):
+    """Read several paths concurrently; values come back in the order given."""
+    return gather(*(database.reference(path).get for path in paths))
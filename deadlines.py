@@ -0,0 +1,218 @@
+"""Per-step decision deadlines with default moves applied on expiry.
+
+The admin sets a time limit for eBay's offer and for AT&T's response (0
+means no limit) and what happens when it runs out: a fixed move or a
+random draw among the moves the player was allowed to make. Deadlines
+are stored under ``lawsuit_deadlines``:
+
+    {"offer_seconds": 60, "response_seconds": 45,
+     "offer_default": "Stingy", "response_default": "Random"}
+
+There is no game server, so any client that sees an overdue step enforces
+it: the player's own screen when its countdown runs out, the partner's
+screen while it waits, and the admin's periodic sweep. ``enforce`` writes the
+default inside a transaction on the match node, so only the first
+enforcer records a move, and a move that landed meanwhile is kept. Others
+wait ``GRACE`` seconds past the deadline before enforcing, so a click
+made just before the deadline can still land. Defaulted moves are flagged
+in the match (``od`` / ``rd``) and in the event log (``timed_out``), so
+the decision-time analytics in ``latency`` can tell them apart.
+
+The player's own move is conditional too (``submit_move``): it is queued in
+the write-behind queue but written by a transaction that only lands while
+the step is still pending, and its event is logged only if it landed. So
+whichever of the player's click and a default gets there first is the one
+move on record, in the match, the event log and the outcome counters.
+"""
+import random
+import time
+
+import game_events
+import outcome_tally
+import write_behind
+from game_records import Guilt, Offer, Response, completion_fields, label, offer_fields, parse_code, parse_match
+
+DEADLINES_PATH = "lawsuit_deadlines"
+OFFER = "offer"
+RESPONSE = "response"
+RANDOM = "Random"
+GRACE = 5  # seconds other clients wait past a deadline before forcing the default
+
+DEFAULT_SETTINGS = {
+    "offer_seconds": 0,  # 0 = no deadline
+    "response_seconds": 0,
+    "offer_default": "Stingy",
+    "response_default": "Accept",
+}
+OFFER_DEFAULTS = ["Stingy", "Generous", RANDOM]
+RESPONSE_DEFAULTS = ["Accept", "Reject", RANDOM]
+
+
+def load_settings(database):
+    raw = database.reference(DEADLINES_PATH).get()
+    return {**DEFAULT_SETTINGS, **(raw if isinstance(raw, dict) else {})}
+
+
+def pending_step(match):
+    """The step the match is waiting on (OFFER / RESPONSE), or None once complete."""
+    if match.offer is None:
+        return OFFER
+    if match.response is None:
+        return RESPONSE
+    return None
+
+
+def deadline(match, settings):
+    """When the pending step runs out, or None if it has no limit."""
+    step = pending_step(match)
+    if step == OFFER and settings["offer_seconds"] and match.created_at:
+        return match.created_at + settings["offer_seconds"]
+    if step == RESPONSE and settings["response_seconds"] and match.offer_at:
+        return match.offer_at + settings["response_seconds"]
+    return None
+
+
+def is_overdue(match, settings, now=None, grace=0):
+    limit = deadline(match, settings)
+    return limit is not None and (time.time() if now is None else now) > limit + grace
+
+
+def offer_move(match, stingy_chance, rng=random):
+    """eBay's offer within the rules: Stingy with ``stingy_chance`` when guilty."""
+    if match.guilt != Guilt.GUILTY:
+        return Offer.STINGY  # innocent eBay may only offer Stingy
+    return Offer.STINGY if rng.random() < stingy_chance else Offer.GENEROUS
+
+
+def response_move(match, accept_chance, rng=random):
+    """AT&T's response within the rules: accepts a Stingy offer with ``accept_chance``."""
+    if match.offer == Offer.GENEROUS:
+        return Response.ACCEPT  # generous offers are always accepted
+    return Response.ACCEPT if rng.random() < accept_chance else Response.REJECT
+
+
+def _chance(choice, move):
+    """Probability a default set to ``choice`` picks ``move``."""
+    return 0.5 if choice == RANDOM else float(parse_code(type(move), choice) == move)
+
+
+def default_offer(match, settings, rng=random):
+    return offer_move(match, _chance(settings["offer_default"], Offer.STINGY), rng)
+
+
+def default_response(match, settings, rng=random):
+    return response_move(match, _chance(settings["response_default"], Response.ACCEPT), rng)
+
+
+def move_fields(match, step, move, now, payoff_table=None, timed_out=False):
+    """Partial match update for ``move`` on the pending ``step`` of ``match``."""
+    if step == OFFER:
+        return offer_fields(move, now, timed_out=timed_out)
+    # The response completes the match, so its payoffs are fixed with it
+    return completion_fields(match, move, now, payoff_table, timed_out=timed_out)
+
+
+def submit_move(write_queue, match, step, move, now, payoff_table=None, after=None):
+    """Queue a player's own ``move``, to land only if ``step`` is still pending.
+
+    The match fields and the event are fixed now, so retries write the same
+    data. ``after(moved)`` runs with the updated match once the move has
+    landed, and not at all if another move for the step got there first.
+    Returns the updated match, for the player's own screen.
+    """
+    fields = move_fields(match, step, move, now, payoff_table)
+    moved = parse_match(match.match_id, {**match.to_wire(), **fields})
+    if step == OFFER:
+        update = game_events.move_update(match.match_id, fields, game_events.OFFER, player=match.ebay_player,
+                                         offer=label(move), ts=now)
+    else:
+        ebay_payoff, att_payoff = moved.final_payoffs
+        update = game_events.move_update(match.match_id, fields, game_events.RESPONSE, player=match.att_player,
+                                         response=label(move), ebay_payoff=ebay_payoff, att_payoff=att_payoff,
+                                         ts=now)
+    write_queue.submit(f"{step}:{match.match_id}:{match.created_at}", update,
+                       after=(lambda: after(moved)) if after is not None else None,
+                       apply=lambda: write_move(write_queue.database, match.match_id, step, update))
+    return moved
+
+
+def write_move(database, match_id, step, update):
+    """Write a move built by ``submit_move``; False if another move for ``step`` landed first.
+
+    The match fields go in a transaction that only writes while the step is
+    pending, or when they are already there (a retry after a lost
+    acknowledgement). The event is logged, under its fixed key, only then.
+    """
+    prefix = f"lawsuit_matches/{match_id}/"
+    fields = {path[len(prefix):]: value for path, value in update.items() if path.startswith(prefix)}
+    events = {path: value for path, value in update.items() if not path.startswith(prefix)}
+    written = {}
+
+    def apply(current):
+        latest = parse_match(match_id, current)
+        already = latest is not None and all(current.get(key) == value for key, value in fields.items())
+        written["ok"] = latest is not None and (pending_step(latest) == step or already)
+        return {**current, **fields} if written["ok"] else current
+
+    database.reference(f"lawsuit_matches/{match_id}").transaction(apply)
+    if not written.get("ok"):
+        return False
+    database.reference("/").update(events)
+    return True
+
+
+def enforce(database, match, settings, now=None, grace=GRACE, rng=random, payoff_table=None):
+    """Apply the default move if the pending step is overdue.
+
+    Returns the step that was defaulted, or None if nothing was due or
+    another client (or the player) got there first. A defaulted response
+    completes the match, so it is also counted in ``outcome_tally``.
+    """
+    now = time.time() if now is None else now
+    if not is_overdue(match, settings, now, grace):
+        return None
+    step = pending_step(match)
+    move = default_offer(match, settings, rng) if step == OFFER else default_response(match, settings, rng)
+    return apply_move(database, match, step, move, now, payoff_table, timed_out=True)
+
+
+def apply_move(database, match, step, move, now, payoff_table=None, timed_out=False, **event_fields):
+    """Make ``move`` for the pending ``step`` on someone's behalf (a default, or a bot's move).
+
+    Written in a transaction on the match node, so it only lands if the step
+    is still pending. Returns ``step``, or None if a move was made first. A
+    response that can't be counted right away is counted in the background.
+    """
+    applied = {}
+
+    def apply(current):
+        latest = parse_match(match.match_id, current)
+        applied["ok"] = latest is not None and pending_step(latest) == step
+        if not applied["ok"]:
+            return current
+        fields = move_fields(latest, step, move, now, payoff_table, timed_out=timed_out)
+        applied["match"] = parse_match(match.match_id, {**current, **fields})
+        return {**current, **fields}
+
+    database.reference(f"lawsuit_matches/{match.match_id}").transaction(apply)
+    if not applied.get("ok"):
+        return None
+
+    if timed_out:
+        event_fields["timed_out"] = True
+    if step == OFFER:
+        game_events.log_event(database, game_events.OFFER, match_id=match.match_id, player=match.ebay_player,
+                              offer=label(move), ts=now, **event_fields)
+    else:
+        ebay_payoff, att_payoff = applied["match"].final_payoffs
+        game_events.log_event(database, game_events.RESPONSE, match_id=match.match_id, player=match.att_player,
+                              response=label(move), ebay_payoff=ebay_payoff, att_payoff=att_payoff, ts=now,
+                              **event_fields)
+        completed = applied["match"]
+        try:
+            outcome_tally.record(database, completed, payoff_table)
+        except Exception:
+            # The move is in either way; the write-behind writer keeps retrying the count
+            write_behind.queue_for(database).submit(f"count:{completed.match_id}:{completed.response_at}", {},
+                                                    after=lambda: outcome_tally.record(database, completed, payoff_table))
+    return step
@@ -0,0 +1,172 @@
+"""Game parameters and the perfect Bayesian equilibrium they imply.
+
+The guilt prior and the payoff matrix used to be hard-coded, together with
+the theory numbers shown on the dashboards (40% / ~43% / 12.5%). They now
+live in ``GameParameters``, which the admin can edit (stored under
+``lawsuit_parameters``), and ``solve`` derives the theory numbers for
+whatever parameters are active.
+
+The game keeps its fixed rules: an innocent eBay must offer Stingy and a
+Generous offer is always accepted. So the only strategic choices are the
+guilty eBay's probability ``s`` of offering Stingy and AT&T's probability
+``a`` of accepting a Stingy offer. ``solve`` looks for the semi-separating
+equilibrium first. In it, ``a`` makes a guilty eBay indifferent between
+the offers, and ``s`` makes AT&T's posterior P(Guilty | Stingy) leave it
+indifferent between accepting and rejecting. If the payoffs rule that
+out, it falls back to pooling (``s = 1``) or separating (``s = 0``)
+equilibria.
+
+``GameParameters`` is frozen and hashable, so ``solve`` is memoized per
+parameter set; ``sweep`` and ``prior_curve`` batch many solves for theory
+curves.
+"""
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from game_records import PAYOFFS, Guilt, Offer, Response, label
+
+PARAMETERS_PATH = "lawsuit_parameters"
+DEFAULT_PRIOR = 0.25
+
+G, I = Guilt.GUILTY, Guilt.INNOCENT
+GENEROUS, STINGY = Offer.GENEROUS, Offer.STINGY
+ACCEPT, REJECT = Response.ACCEPT, Response.REJECT
+
+# Outcomes that can actually happen under the game's rules
+OUTCOMES = [(G, GENEROUS, ACCEPT), (G, STINGY, ACCEPT), (G, STINGY, REJECT), (I, STINGY, ACCEPT), (I, STINGY, REJECT)]
+
+
+def outcome_key(outcome):
+    """Storage key for an outcome, e.g. "Guilty-Stingy-Reject"."""
+    return "-".join(label(code) for code in outcome)
+
+
+@dataclass(frozen=True, slots=True)
+class GameParameters:
+    guilt_prior: float = DEFAULT_PRIOR
+    payoffs: tuple = tuple(sorted(PAYOFFS.items()))  # ((guilt, offer, response), (eBay, AT&T)) pairs
+
+    def table(self):
+        """Payoff lookup: (guilt, offer, response) -> (eBay payoff, AT&T payoff)."""
+        return dict(self.payoffs)
+
+    def with_prior(self, guilt_prior):
+        return replace(self, guilt_prior=guilt_prior)
+
+    def with_payoff(self, outcome, ebay, att):
+        table = self.table()
+        table[outcome] = (ebay, att)
+        return replace(self, payoffs=tuple(sorted(table.items())))
+
+    def to_wire(self):
+        table = self.table()
+        return {"prior": self.guilt_prior,
+                "payoffs": {outcome_key(outcome): list(table[outcome]) for outcome in OUTCOMES}}
+
+    @classmethod
+    def from_wire(cls, raw):
+        params = cls()
+        if not isinstance(raw, dict):
+            return params
+        if isinstance(raw.get("prior"), (int, float)):
+            params = params.with_prior(float(raw["prior"]))
+        stored = raw.get("payoffs") if isinstance(raw.get("payoffs"), dict) else {}
+        for outcome in OUTCOMES:
+            value = stored.get(outcome_key(outcome))
+            if isinstance(value, list) and len(value) == 2:
+                params = params.with_payoff(outcome, value[0], value[1])
+        return params
+
+
+def load_parameters(database):
+    return GameParameters.from_wire(database.reference(PARAMETERS_PATH).get())
+
+
+def save_parameters(database, params):
+    database.reference(PARAMETERS_PATH).set(params.to_wire())
+
+
+@dataclass(frozen=True, slots=True)
+class Equilibrium:
+    kind: str  # "semi-separating", "pooling" or "separating"
+    guilty_stingy: float  # P(guilty eBay offers Stingy)
+    innocent_stingy: float  # always 1 under the game's rules
+    accept_stingy: float  # P(AT&T accepts a Stingy offer)
+    posterior: float  # P(Guilty | Stingy offer)
+    guilty_payoff: float  # expected payoffs in equilibrium
+    innocent_payoff: float
+    ebay_payoff: float
+    att_payoff: float
+
+
+def _clamp(value):
+    return min(1.0, max(0.0, value))
+
+
+@lru_cache(maxsize=4096)
+def solve(params=GameParameters()):
+    """Perfect Bayesian equilibrium for ``params`` (memoized per parameter set)."""
+    p = params.guilt_prior
+    u = params.table()
+    guilty_generous = u[(G, GENEROUS, ACCEPT)][0]
+    guilty_accept, guilty_reject = u[(G, STINGY, ACCEPT)][0], u[(G, STINGY, REJECT)][0]
+    # AT&T's gain from accepting rather than rejecting a Stingy offer, by eBay's type
+    gain_guilty = u[(G, STINGY, ACCEPT)][1] - u[(G, STINGY, REJECT)][1]
+    gain_innocent = u[(I, STINGY, ACCEPT)][1] - u[(I, STINGY, REJECT)][1]
+
+    def posterior(s):
+        stingy = p * s + (1 - p)
+        return p * s / stingy if stingy else p
+
+    def accept_value(q):
+        return q * gain_guilty + (1 - q) * gain_innocent
+
+    def best_accept(q):
+        value = accept_value(q)
+        return 1.0 if value > 0 else 0.0 if value < 0 else None  # None = indifferent
+
+    def build(kind, s, a):
+        q = posterior(s)
+        guilty = s * (a * guilty_accept + (1 - a) * guilty_reject) + (1 - s) * guilty_generous
+        innocent = a * u[(I, STINGY, ACCEPT)][0] + (1 - a) * u[(I, STINGY, REJECT)][0]
+        att_guilty = (s * (a * u[(G, STINGY, ACCEPT)][1] + (1 - a) * u[(G, STINGY, REJECT)][1])
+                      + (1 - s) * u[(G, GENEROUS, ACCEPT)][1])
+        att_innocent = a * u[(I, STINGY, ACCEPT)][1] + (1 - a) * u[(I, STINGY, REJECT)][1]
+        return Equilibrium(kind, s, 1.0, a, q, guilty, innocent,
+                           p * guilty + (1 - p) * innocent, p * att_guilty + (1 - p) * att_innocent)
+
+    # Semi-separating: both players mix
+    if guilty_accept != guilty_reject and gain_guilty != gain_innocent and 0 < p < 1:
+        a = (guilty_generous - guilty_reject) / (guilty_accept - guilty_reject)
+        q = gain_innocent / (gain_innocent - gain_guilty)
+        if 0 < a < 1 and 0 < q < p:
+            return build("semi-separating", q * (1 - p) / (p * (1 - q)), a)
+
+    # Pooling on Stingy: AT&T's posterior is the prior
+    a = best_accept(p)
+    for candidate in ([a] if a is not None else [1.0, 0.0]):
+        if candidate * guilty_accept + (1 - candidate) * guilty_reject >= guilty_generous:
+            return build("pooling", 1.0, candidate)
+
+    # Separating: guilty offers Generous, so Stingy reveals innocence
+    a = best_accept(0.0)
+    return build("separating", 0.0, _clamp(a if a is not None else 1.0))
+
+
+def sweep(param_sets):
+    """Solve a batch of parameter sets (each one memoized)."""
+    return [solve(params) for params in param_sets]
+
+
+def prior_curve(params, priors=None):
+    """Theory numbers across guilt priors, as rows ready for a DataFrame/chart."""
+    priors = priors if priors is not None else [step / 20 for step in range(1, 20)]
+    rows = []
+    for prior, eq in zip(priors, sweep(params.with_prior(prior) for prior in priors)):
+        rows.append({
+            "P(Guilty)": prior,
+            "Guilty choose Stingy": eq.guilty_stingy,
+            "AT&T accept Stingy": eq.accept_stingy,
+            "P(Guilty | Stingy)": eq.posterior,
+        })
+    return rows
@@ -0,0 +1,201 @@
+"""Latency and fault injection around a ``firebase_admin.db``-like database.
+
+    database = FaultyDatabase(MemoryDatabase(), FaultProfile(latency=0.5, error_rate=0.05))
+
+Every reference and query call (get/set/update/delete/push/transaction)
+goes through the wrapper, which can:
+
+* delay it by a lognormal draw with median ``latency`` seconds and spread
+  ``latency_sigma`` (0 = always exactly ``latency``),
+* fail it with ``InjectedFault`` before it reaches the database
+  (``error_rate``),
+* let a write land and fail it anyway, as when the response is lost
+  (``lost_ack_rate``). Multi-path updates are atomic in Firebase, so this
+  is the partial failure clients really see. Retries, claims and counters
+  have to cope with it.
+
+Each call's time in milliseconds, injected delay included, goes into a
+``latency.QuantileSketch`` per operation. ``report()`` gives counts,
+injected errors and tail latencies. Profiles can be written as specs like
+``"latency=0.5,sigma=0.6,errors=0.05,lost=0.01,seed=1"`` (see ``parse_profile``)
+for ``load_test.py --faults`` or the app's ``fault_injection`` secret (for
+rehearsing a class against a degraded network).
+"""
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+import latency
+
+WRITES = {"set", "update", "delete", "push", "transaction"}
+
+
+class InjectedFault(ConnectionError):
+    """A failure injected by ``FaultyDatabase`` (the write may still have landed)."""
+
+
+@dataclass(frozen=True, slots=True)
+class FaultProfile:
+    latency: float = 0.0  # median seconds added per call
+    latency_sigma: float = 0.0
+    error_rate: float = 0.0  # calls failed before reaching the database
+    lost_ack_rate: float = 0.0  # writes applied but reported as failed
+    seed: int = None
+
+
+SPEC_KEYS = {"latency": "latency", "sigma": "latency_sigma", "errors": "error_rate", "lost": "lost_ack_rate",
+             "seed": "seed"}
+
+
+def parse_profile(spec):
+    """``FaultProfile`` from ``"latency=0.5,errors=0.05,..."``; raises ValueError on unknown keys."""
+    fields = {}
+    for part in filter(None, (part.strip() for part in (spec or "").split(","))):
+        key, _, value = part.partition("=")
+        if key not in SPEC_KEYS:
+            raise ValueError(f"unknown fault setting {key!r} (use {', '.join(SPEC_KEYS)})")
+        fields[SPEC_KEYS[key]] = int(value) if key == "seed" else float(value)
+    return FaultProfile(**fields)
+
+
+class FaultyDatabase:
+    def __init__(self, database, profile=FaultProfile(), sleep=time.sleep):
+        self.database = database
+        self.profile = profile
+        self.sleep = sleep
+        self.faults = Counter()  # operation -> injected failures
+        self.timings = {}  # operation -> QuantileSketch of call times (ms)
+        self._rng = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # stats, reset_stats, dump... of the wrapped database
+        return getattr(self.database, name)
+
+    def reference(self, path="/"):
+        return FaultyReference(self, self.database.reference(path))
+
+    def _draw(self, operation):
+        """(delay, fail before, lose the acknowledgement) for one call."""
+        profile = self.profile
+        with self._lock:
+            delay = profile.latency
+            if profile.latency and profile.latency_sigma:
+                delay = self._rng.lognormvariate(0, profile.latency_sigma) * profile.latency
+            fail = self._rng.random() < profile.error_rate
+            lose = operation in WRITES and self._rng.random() < profile.lost_ack_rate
+        return delay, fail, lose
+
+    def call(self, operation, action):
+        start = time.perf_counter()
+        delay, fail, lose = self._draw(operation)
+        try:
+            if delay:
+                self.sleep(delay)
+            if fail:
+                self._fault(operation)
+                raise InjectedFault(f"injected {operation} failure")
+            result = action()
+            if lose:
+                self._fault(operation)
+                raise InjectedFault(f"injected lost {operation} acknowledgement (the write landed)")
+            return result
+        finally:
+            with self._lock:
+                self.timings.setdefault(operation, latency.QuantileSketch()).add((time.perf_counter() - start) * 1000)
+
+    def _fault(self, operation):
+        with self._lock:
+            self.faults[operation] += 1
+
+    def report(self):
+        """One row per operation: calls, injected faults and call-time quantiles (ms)."""
+        with self._lock:
+            return [{
+                "Operation": operation,
+                "Calls": sketch.count,
+                "Injected faults": self.faults[operation],
+                "p50 (ms)": round(sketch.quantile(0.5), 2),
+                "p99 (ms)": round(sketch.quantile(0.99), 2),
+                "Max (ms)": round(sketch.max, 2),
+            } for operation, sketch in sorted(self.timings.items())]
+
+
+class FaultyReference:
+    def __init__(self, faulty, ref):
+        self._faulty = faulty
+        self._ref = ref
+
+    @property
+    def key(self):
+        return self._ref.key
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    @property
+    def parent(self):
+        parent = self._ref.parent
+        return FaultyReference(self._faulty, parent) if parent is not None else None
+
+    def child(self, path):
+        return FaultyReference(self._faulty, self._ref.child(path))
+
+    def get(self, *args, **kwargs):
+        return self._faulty.call("get", lambda: self._ref.get(*args, **kwargs))
+
+    def set(self, value):
+        return self._faulty.call("set", lambda: self._ref.set(value))
+
+    def update(self, value):
+        return self._faulty.call("update", lambda: self._ref.update(value))
+
+    def delete(self):
+        return self._faulty.call("delete", self._ref.delete)
+
+    def push(self, value=""):
+        return FaultyReference(self._faulty, self._faulty.call("push", lambda: self._ref.push(value)))
+
+    def transaction(self, transaction_update):
+        return self._faulty.call("transaction", lambda: self._ref.transaction(transaction_update))
+
+    def order_by_key(self):
+        return FaultyQuery(self._faulty, self._ref.order_by_key())
+
+    def order_by_child(self, path):
+        return FaultyQuery(self._faulty, self._ref.order_by_child(path))
+
+
+class FaultyQuery:
+    def __init__(self, faulty, query):
+        self._faulty = faulty
+        self._query = query
+
+    def __getattr__(self, name):
+        # limit_to_first, start_at, equal_to...: build on the wrapped query and keep wrapping it
+        method = getattr(self._query, name)
+
+        def chained(*args, **kwargs):
+            self._query = method(*args, **kwargs)
+            return self
+
+        return chained
+
+    def get(self):
+        return self._faulty.call("query", self._query.get)
+
+
+_wrapped = {}
+_wrapped_lock = threading.Lock()
+
+
+def wrap(database, spec):
+    """Process-wide ``FaultyDatabase`` around ``database`` for ``spec`` (the same object on every call)."""
+    with _wrapped_lock:
+        key = (id(database), spec)
+        if key not in _wrapped:
+            _wrapped[key] = FaultyDatabase(database, parse_profile(spec))
+        return _wrapped[key]
@@ -0,0 +1,255 @@
+"""Append-only event log for the lawsuit game.
+
+Every action (join, role assignment, matching, offer, response, leaving,
+reset) is appended under ``lawsuit_events``. The ``lawsuit_players`` /
+``lawsuit_matches`` trees are kept for fast reads, but they can always be
+rebuilt by folding the log with ``fold_events``.
+"""
+import itertools
+import random
+import time
+
+from game_records import (Guilt, Match, Offer, Player, Response, Role, numbered_key, offer_fields, parse_code,
+                          parse_player, response_fields, result_fields)
+
+EVENTS_PATH = "lawsuit_events"
+GAME_PATH = "lawsuit_game"  # key of the last reset event (or restore), so sessions can tell one game from the next
+GAME_START_PATH = "lawsuit_game_start"  # key of the reset event the current game's part of the log starts after
+
+# Event kinds
+JOIN = "join"
+ROLE_ASSIGNED = "role_assigned"
+MATCHED = "matched"
+OFFER = "offer"
+RESPONSE = "response"
+LEFT = "left"  # player reaped for missing heartbeats; see presence.py
+REPLACED = "replaced"  # a bot plays on for a player who left mid-game; see bots.py
+ADVANCED = "advanced"  # player moved on to their next scheduled round; see rounds.py
+CONFIGURE = "configure"
+RESET = "reset"
+
+
+_sequence = itertools.count()
+
+
+def new_event_id(ts=None):
+    """Return a key that sorts in time order.
+
+    Microsecond timestamp, then a per-process sequence number (keeps events
+    from one batch in order) and a random suffix (keeps processes apart).
+    """
+    ts = time.time() if ts is None else ts
+    return f"{int(ts * 1_000_000):017d}-{next(_sequence) % 100_000_000:08d}-{random.getrandbits(24):06x}"
+
+
+def make_event(kind, **fields):
+    """Build an event record and its key without writing anything."""
+    ts = fields.pop("ts", None) or time.time()
+    event = {"kind": kind, "ts": ts}
+    event.update(fields)
+    return new_event_id(ts), event
+
+
+def event_update(kind, **fields):
+    """Event as a multi-path update entry, to be written together with the state change."""
+    key, event = make_event(kind, **fields)
+    return {f"{EVENTS_PATH}/{key}": event}
+
+
+def move_update(match_id, fields, kind, **event_fields):
+    """A player's move on a match (``offer_fields``/``response_fields``...) and its event, as one multi-path update."""
+    update = {f"lawsuit_matches/{match_id}/{key}": value for key, value in fields.items()}
+    update.update(event_update(kind, match_id=match_id, **event_fields))
+    return update
+
+
+def reset_update(ts=None):
+    """Reset event as a multi-path update that also starts a new game id."""
+    key, event = make_event(RESET, ts=ts)
+    return {f"{EVENTS_PATH}/{key}": event, GAME_PATH: key, GAME_START_PATH: key}
+
+
+def last_reset_key(events):
+    """Key of the latest ``reset`` in a raw ``lawsuit_events`` snapshot, or None."""
+    return max((key for key, event in sorted_events(events) if event.get("kind") == RESET), default=None)
+
+
+def log_event(database, kind, **fields):
+    """Append one event to the log and return it."""
+    key, event = make_event(kind, **fields)
+    database.reference(f"{EVENTS_PATH}/{key}").set(event)
+    return event
+
+
+def empty_state():
+    return {"players": {}, "matches": {}, "expected_players": 0}
+
+
+def apply_event(state, event):
+    """Apply a single event to ``state`` in place, mirroring the live writes.
+
+    Players and matches come out in the compact wire schema of
+    ``game_records``, so a fold compares equal to the live trees.
+    """
+    kind = event.get("kind")
+    players = state["players"]
+    matches = state["matches"]
+
+    if kind == JOIN:
+        players[event["player"]] = Player(event["player"], event["ts"]).to_wire()
+    elif kind == ROLE_ASSIGNED:
+        player = parse_player(event["player"], players.get(event["player"])) or Player(event["player"], event["ts"])
+        player.role = parse_code(Role, event["role"])
+        player.guilt = parse_code(Guilt, event.get("guilt_status"))
+        players[event["player"]] = player.to_wire()
+    elif kind == MATCHED:
+        round_no = event.get("round")
+        matches[event["match_id"]] = Match(
+            event["match_id"], event["ebay_player"], event["att_player"],
+            parse_code(Guilt, event.get("ebay_guilt")),
+            event["ts"] if round_no is None or round_no == 1 else None, round_no=round_no
+        ).to_wire()
+        for name in (event["ebay_player"], event["att_player"]):
+            player = players.setdefault(name, {})
+            if player.pop("x", None):  # back in the game after their partner left
+                state["expected_players"] += 1
+            if round_no is None or round_no == 1:
+                player["m"] = event["match_id"]
+            if round_no is not None:
+                player.setdefault("s", {})[numbered_key("r", round_no)] = event["match_id"]
+    elif kind == ADVANCED:
+        players.setdefault(event["player"], {})["m"] = event["match_id"]
+        match = matches.setdefault(event["match_id"], {})
+        match["t"] = min(match.get("t", event["ts"]), event["ts"])  # the first arrival starts it
+    elif kind == OFFER:
+        matches.setdefault(event["match_id"], {}).update(
+            offer_fields(parse_code(Offer, event["offer"]), event["ts"], event.get("timed_out", False)))
+    elif kind == RESPONSE:
+        fields = response_fields(parse_code(Response, event["response"]), event["ts"], event.get("timed_out", False))
+        if "ebay_payoff" in event:
+            fields.update(result_fields(event["ebay_payoff"], event["att_payoff"]))
+        matches.setdefault(event["match_id"], {}).update(fields)
+    elif kind == LEFT:
+        players.pop(event["player"], None)
+        if event.get("match_id"):
+            matches.pop(event["match_id"], None)
+            if event.get("partner") in players:
+                players[event["partner"]].pop("m", None)
+                if event.get("partner_left"):
+                    players[event["partner"]]["x"] = 1
+        for match_id in event.get("dropped") or {}:
+            matches.pop(match_id, None)
+        shrink = int(event.get("shrink", True)) + int(bool(event.get("partner_left")))
+        state["expected_players"] = max(0, state["expected_players"] - shrink)
+    elif kind == CONFIGURE:
+        state["expected_players"] = event["expected_players"]
+    elif kind == RESET:
+        players.clear()
+        matches.clear()
+        state["expected_players"] = 0
+    return state
+
+
+def sorted_events(events):
+    """Normalise a raw ``lawsuit_events`` snapshot into (key, event) pairs in log order."""
+    if not isinstance(events, dict):
+        return []
+    return [(key, events[key]) for key in sorted(events) if isinstance(events[key], dict)]
+
+
+def fold_events(events, state=None):
+    """Rebuild players/matches/expected count by folding a whole log."""
+    state = state if state is not None else empty_state()
+    for _, event in sorted_events(events):
+        apply_event(state, event)
+    return state
+
+
+def split_games(events):
+    """(key, event) pairs in log order, one list per game; each ``reset`` starts a new game."""
+    games = [[]]
+    for key, event in sorted_events(events):
+        if event.get("kind") == RESET:
+            games.append([])
+        else:
+            games[-1].append((key, event))
+    return [game for game in games if game]
+
+
+def game_start(database):
+    """Cursor where the current game's events start (its reset event), or None for the first game."""
+    return database.reference(GAME_START_PATH).get()
+
+
+def load_events(database):
+    return database.reference(EVENTS_PATH).get() or {}
+
+
+def recent_events(database, limit=20):
+    """Most recent ``limit`` events, newest last."""
+    raw = database.reference(EVENTS_PATH).order_by_key().limit_to_last(limit).get() or {}
+    return sorted_events(dict(raw))
+
+
+class FoldingHandler:
+    """Mixin for analytics fed one event at a time through ``apply(event)``.
+
+    ``handle`` is the ``EventConsumer``/``replay`` handler: it folds the event
+    into the game state, then passes it to ``apply``.
+    """
+
+    def handle(self, state, event):
+        apply_event(state, event)
+        self.apply(event)
+        return state
+
+
+class EventConsumer:
+    """Incremental reader that only fetches and folds events it hasn't seen.
+
+    Keep one around (e.g. in ``st.session_state``) and call ``poll()`` on each
+    refresh; ``state`` is then always the fold of the log up to ``cursor``.
+    Pass ``cursor=game_start(database)`` to skip the events of earlier games:
+    folding from the current game's reset gives the same state as folding
+    the whole log.
+    """
+
+    def __init__(self, database, handler=apply_event, state=None, cursor=None):
+        self.database = database
+        self.handler = handler
+        self.state = state if state is not None else empty_state()
+        self.cursor = cursor
+
+    def poll(self):
+        """Fold any new events and return how many were applied."""
+        query = self.database.reference(EVENTS_PATH).order_by_key()
+        if self.cursor is not None:
+            query = query.start_at(self.cursor)
+        new_events = sorted_events(dict(query.get() or {}))
+
+        applied = 0
+        for key, event in new_events:
+            if key == self.cursor:  # start_at is inclusive
+                continue
+            self.handler(self.state, event)
+            self.cursor = key
+            applied += 1
+        return applied
+
+
+def replay(events, speed=10.0, handler=apply_event, sleep=time.sleep):
+    """Re-run a recorded class, yielding (event, state) after each step.
+
+    Gaps between events are divided by ``speed``; pass ``speed=None`` to
+    replay as fast as possible.
+    """
+    state = empty_state()
+    previous_ts = None
+    for _, event in sorted_events(events):
+        if speed and previous_ts is not None:
+            gap = event["ts"] - previous_ts
+            if gap > 0:
+                sleep(gap / speed)
+        previous_ts = event["ts"]
+        handler(state, event)
+        yield event, state
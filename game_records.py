@@ -0,0 +1,321 @@
+"""Typed player/match records and the compact wire schema used in Firebase.
+
+Player and match nodes are stored as small versioned dicts with short keys
+and small-int codes, e.g. ``{"v": 1, "t": 1712.0, "r": 0, "g": 1}``. Raw
+snapshots are parsed once per fetch with ``parse_players``/``parse_matches``;
+the rest of the app works with ``Player``/``Match`` objects only.
+Legacy string-valued nodes (``"role": "eBay"``, ``"guilt_status": ...``) are
+still understood on read and can be rewritten with ``migrate``.
+
+The response that completes a match also fixes its payoffs (``pe``/``pa``),
+so ``Match.result`` - everything the Step 5 reveal shows - comes from the
+record alone and stays as it was if the payoffs are changed later.
+"""
+from dataclasses import dataclass
+from enum import IntEnum
+
+SCHEMA_VERSION = 1
+
+
+class Role(IntEnum):
+    EBAY = 0
+    ATT = 1
+
+
+class Guilt(IntEnum):
+    INNOCENT = 0
+    GUILTY = 1
+
+
+class Offer(IntEnum):
+    GENEROUS = 0
+    STINGY = 1
+
+
+class Response(IntEnum):
+    ACCEPT = 0
+    REJECT = 1
+
+
+# Display strings, indexed by code
+LABELS = {
+    Role: ("eBay", "AT&T"),
+    Guilt: ("Innocent", "Guilty"),
+    Offer: ("Generous", "Stingy"),
+    Response: ("Accept", "Reject"),
+}
+
+
+def label(code):
+    """Display string for an enum code ("Guilty", "Stingy", ...); None stays None."""
+    if code is None:
+        return None
+    return LABELS[type(code)][code]
+
+
+def parse_code(enum_cls, value):
+    """Accept either a wire int or a legacy display string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        labels = LABELS[enum_cls]
+        return enum_cls(labels.index(value)) if value in labels else None
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return None
+
+
+def card_color(guilt):
+    if guilt is None:
+        return None
+    return "🔴 Red Card (Guilty)" if guilt == Guilt.GUILTY else "🔵 Blue Card (Innocent)"
+
+
+# Payoff matrix: (guilt, offer, response) -> (eBay payoff, AT&T payoff)
+PAYOFFS = {
+    (Guilt.GUILTY, Offer.GENEROUS, Response.ACCEPT): (-200, 200),
+    (Guilt.GUILTY, Offer.STINGY, Response.ACCEPT): (-20, 20),
+    (Guilt.GUILTY, Offer.STINGY, Response.REJECT): (-320, 300),
+    (Guilt.INNOCENT, Offer.GENEROUS, Response.ACCEPT): (0, 0),  # Shouldn't happen
+    (Guilt.INNOCENT, Offer.STINGY, Response.ACCEPT): (-20, 20),
+    (Guilt.INNOCENT, Offer.STINGY, Response.REJECT): (0, -20),
+}
+
+
+def payoffs(guilt, offer, response, table=None):
+    """(eBay, AT&T) payoffs; ``table`` overrides the default matrix (see ``equilibrium``)."""
+    return (PAYOFFS if table is None else table).get((guilt, offer, response), (0, 0))
+
+
+# Step 5 outcome text: (response, guilt) -> lines; "{offer}" is filled with the offer's label
+OUTCOME_TEXT = {
+    (Response.REJECT, Guilt.GUILTY): ("⚖️ **Outcome**: Went to court! Both sides paid legal fees.",
+                                      "🔍 **Court Result**: eBay was found guilty and paid damages plus legal costs"),
+    (Response.REJECT, Guilt.INNOCENT): ("⚖️ **Outcome**: Went to court! Both sides paid legal fees.",
+                                        "🔍 **Court Result**: eBay was found innocent - AT&T paid all legal costs!"),
+    (Response.ACCEPT, Guilt.GUILTY): ("🤝 **Outcome**: Settled out of court - no legal fees!",
+                                      "💸 **Settlement**: AT&T accepted the {offer} offer"),
+    (Response.ACCEPT, Guilt.INNOCENT): ("🤝 **Outcome**: Settled out of court - no legal fees!",
+                                        "💸 **Settlement**: AT&T accepted the {offer} offer"),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class MatchResult:
+    """What the Step 5 reveal shows for a completed match."""
+    guilt: Guilt
+    offer: Offer
+    response: Response
+    ebay_payoff: int
+    att_payoff: int
+
+    @property
+    def narrative(self):
+        offer = (label(self.offer) or "").lower()
+        return [line.format(offer=offer) for line in OUTCOME_TEXT.get((self.response, self.guilt), ())]
+
+
+@dataclass(slots=True)
+class Player:
+    name: str
+    joined_at: float = None
+    role: Role = None
+    guilt: Guilt = None
+    match_id: str = None  # current match
+    schedule: tuple = ()  # match id per round, in multi-round sessions
+    partner_left: bool = False  # partner left mid-match; waiting to be paired again (see presence.reap)
+
+    @property
+    def card_color(self):
+        return card_color(self.guilt)
+
+    def to_wire(self):
+        wire = {"v": SCHEMA_VERSION, "t": self.joined_at}
+        if self.role is not None:
+            wire["r"] = int(self.role)
+        if self.guilt is not None:
+            wire["g"] = int(self.guilt)
+        if self.match_id is not None:
+            wire["m"] = self.match_id
+        if self.schedule:
+            wire["s"] = schedule_wire(self.schedule)
+        if self.partner_left:
+            wire["x"] = 1
+        return wire
+
+    @classmethod
+    def from_wire(cls, name, raw):
+        if "v" in raw:
+            return cls(name, raw.get("t"), parse_code(Role, raw.get("r")), parse_code(Guilt, raw.get("g")),
+                       raw.get("m"), parse_schedule(raw.get("s")), bool(raw.get("x")))
+        # Legacy schema
+        return cls(name, raw.get("timestamp"),
+                   parse_code(Role, raw.get("role")), parse_code(Guilt, raw.get("guilt_status")))
+
+
+@dataclass(slots=True)
+class Match:
+    match_id: str
+    ebay_player: str
+    att_player: str
+    guilt: Guilt = None
+    created_at: float = None
+    offer: Offer = None
+    offer_at: float = None
+    response: Response = None
+    response_at: float = None
+    offer_timed_out: bool = False  # move was a default applied at the deadline
+    response_timed_out: bool = False
+    round_no: int = None  # set in multi-round sessions
+    final_payoffs: tuple = None  # (eBay, AT&T), fixed when the response completes the match
+
+    @property
+    def is_complete(self):
+        return self.offer is not None and self.response is not None
+
+    @property
+    def offer_delay(self):
+        """Seconds eBay took to make the offer (None until it is made)."""
+        if self.offer_at is None or self.created_at is None:
+            return None
+        return self.offer_at - self.created_at
+
+    @property
+    def response_delay(self):
+        """Seconds AT&T took to respond after the offer (None until answered)."""
+        if self.response_at is None or self.offer_at is None:
+            return None
+        return self.response_at - self.offer_at
+
+    def involves(self, name):
+        return name == self.ebay_player or name == self.att_player
+
+    def payoffs(self, table=None):
+        return payoffs(self.guilt, self.offer, self.response, table)
+
+    def result(self, table=None):
+        """``MatchResult`` once complete; payoffs as fixed at completion (from ``table`` for older records)."""
+        if not self.is_complete:
+            return None
+        ebay_payoff, att_payoff = self.final_payoffs or self.payoffs(table)
+        return MatchResult(self.guilt, self.offer, self.response, ebay_payoff, att_payoff)
+
+    def to_wire(self):
+        wire = {"v": SCHEMA_VERSION, "e": self.ebay_player, "a": self.att_player}
+        if self.created_at is not None:  # later rounds start when the players get there
+            wire["t"] = self.created_at
+        if self.guilt is not None:
+            wire["g"] = int(self.guilt)
+        if self.round_no is not None:
+            wire["n"] = self.round_no
+        if self.offer is not None:
+            wire.update(offer_fields(self.offer, self.offer_at, self.offer_timed_out))
+        if self.response is not None:
+            wire.update(response_fields(self.response, self.response_at, self.response_timed_out))
+        if self.final_payoffs is not None:
+            wire.update(result_fields(*self.final_payoffs))
+        return wire
+
+    @classmethod
+    def from_wire(cls, match_id, raw):
+        if "v" in raw:
+            return cls(match_id, raw.get("e"), raw.get("a"), parse_code(Guilt, raw.get("g")), raw.get("t"),
+                       parse_code(Offer, raw.get("o")), raw.get("ot"),
+                       parse_code(Response, raw.get("r")), raw.get("rt"),
+                       bool(raw.get("od")), bool(raw.get("rd")), raw.get("n"),
+                       (raw["pe"], raw["pa"]) if "pe" in raw and "pa" in raw else None)
+        # Legacy schema
+        return cls(match_id, raw.get("ebay_player"), raw.get("att_player"),
+                   parse_code(Guilt, raw.get("ebay_guilt")), raw.get("timestamp"),
+                   parse_code(Offer, raw.get("ebay_response")), raw.get("ebay_timestamp"),
+                   parse_code(Response, raw.get("att_response")), raw.get("att_timestamp"))
+
+
+def numbered_key(prefix, number):
+    """Key for a numbered child node, e.g. ``numbered_key("r", 2) == "r2"``.
+
+    Firebase stores a node whose keys are all small integers as an array and
+    reads it back as a list, so numbered children (rounds, shards, sketch
+    buckets) always get a letter prefix.
+    """
+    return f"{prefix}{number}"
+
+
+def schedule_wire(schedule):
+    return {numbered_key("r", round_no): match_id for round_no, match_id in enumerate(schedule, start=1)}
+
+
+def parse_schedule(raw):
+    """Match ids by round from a stored ``{"r1": ..., "r2": ...}`` schedule."""
+    if not isinstance(raw, dict):
+        return ()
+    keys = [numbered_key("r", round_no) for round_no in range(1, len(raw) + 1)]
+    return tuple(raw[key] for key in keys if key in raw)
+
+
+def offer_fields(offer, ts, timed_out=False):
+    """Partial match update recording eBay's offer."""
+    fields = {"o": int(offer), "ot": ts}
+    if timed_out:
+        fields["od"] = 1
+    return fields
+
+
+def response_fields(response, ts, timed_out=False):
+    """Partial match update recording AT&T's response."""
+    fields = {"r": int(response), "rt": ts}
+    if timed_out:
+        fields["rd"] = 1
+    return fields
+
+
+def result_fields(ebay_payoff, att_payoff):
+    """Partial match update fixing the payoffs, written together with the completing response."""
+    return {"pe": ebay_payoff, "pa": att_payoff}
+
+
+def completion_fields(match, response, ts, table=None, timed_out=False):
+    """``response_fields`` plus ``result_fields`` for the response that completes ``match``."""
+    return {**response_fields(response, ts, timed_out),
+            **result_fields(*payoffs(match.guilt, match.offer, response, table))}
+
+
+def parse_players(raw):
+    """Parse a ``lawsuit_players`` snapshot into {name: Player}, dropping junk entries."""
+    if not isinstance(raw, dict):
+        return {}
+    return {name: Player.from_wire(name, data) for name, data in raw.items() if isinstance(data, dict)}
+
+
+def parse_player(name, raw):
+    return Player.from_wire(name, raw) if isinstance(raw, dict) else None
+
+
+def parse_matches(raw):
+    """Parse a ``lawsuit_matches`` snapshot into {match_id: Match}, dropping junk entries."""
+    if not isinstance(raw, dict):
+        return {}
+    return {match_id: Match.from_wire(match_id, data) for match_id, data in raw.items() if isinstance(data, dict)}
+
+
+def parse_match(match_id, raw):
+    return Match.from_wire(match_id, raw) if isinstance(raw, dict) else None
+
+
+def migrate(database):
+    """Rewrite legacy string-valued player/match nodes in the compact schema.
+
+    Runs as a single multi-path update; returns the number of nodes rewritten.
+    """
+    updates = {}
+    for tree, parse_one in (("lawsuit_players", Player.from_wire), ("lawsuit_matches", Match.from_wire)):
+        raw = database.reference(tree).get() or {}
+        if not isinstance(raw, dict):
+            continue
+        for key, data in raw.items():
+            if isinstance(data, dict) and data.get("v") != SCHEMA_VERSION:
+                updates[f"{tree}/{key}"] = parse_one(key, data).to_wire()
+    if updates:
+        database.reference("/").update(updates)
+    return len(updates)
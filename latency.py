@@ -0,0 +1,204 @@
+"""Streaming decision-time analytics from the move timestamps.
+
+Every match records when it started, when eBay's offer came in and when
+AT&T's response came in (``created_at`` / ``offer_at`` / ``response_at``,
+and the ``ts`` of the matching events). ``LatencyStats`` folds the event
+log as it arrives into one ``QuantileSketch`` per measure:
+
+* time to offer: match start to the offer,
+* time to respond: offer to the response,
+* match duration: match start to the response (class time per match).
+
+Defaults applied at a deadline are counted under "Timed out" and left out
+of the offer/response sketches, since they only measure the deadline. They
+still count towards the match duration. Per-match state is kept only while
+a match is in progress.
+
+A sketch counts values in logarithmic buckets, so every quantile is within
+``RELATIVE_ACCURACY`` of the true value. Its size grows with the spread of
+the times (a few hundred buckets at most), not with the number of matches, and
+sketches from several games can be merged.
+"""
+import math
+from collections import Counter
+
+import game_events
+from game_records import numbered_key
+
+RELATIVE_ACCURACY = 0.02
+MIN_SECONDS = 0.01  # anything faster goes in the zero bucket
+
+TO_OFFER = "Time to offer"
+TO_RESPOND = "Time to respond"
+DURATION = "Match duration"
+MEASURES = [TO_OFFER, TO_RESPOND, DURATION]
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class QuantileSketch:
+    def __init__(self):
+        self.buckets = Counter()  # bucket index -> count
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        seconds = max(0.0, seconds)
+        if seconds < MIN_SECONDS:
+            self.zero += 1
+        else:
+            self.buckets[math.ceil(math.log(seconds) / _LOG_GAMMA)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    @staticmethod
+    def _value(index):
+        return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+    def _values(self):
+        """(representative value, count) in increasing order."""
+        if self.zero:
+            yield 0.0, self.zero
+        for index in sorted(self.buckets):
+            yield self._value(index), self.buckets[index]
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in self._values():
+            seen += count
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def histogram(self, bins=10):
+        """(start, end, count) for ``bins`` equal-width bins from 0 to the slowest time."""
+        if not self.count:
+            return []
+        width = max(self.max, MIN_SECONDS) / bins
+        counts = [0] * bins
+        for value, count in self._values():
+            counts[min(bins - 1, int(min(value, self.max) / width))] += count
+        return [(i * width, (i + 1) * width, n) for i, n in enumerate(counts)]
+
+    def to_wire(self):
+        return {"n": self.count, "sum": self.total, "min": self.min, "max": self.max, "zero": self.zero,
+                "b": {numbered_key("b", index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_wire(cls, raw):
+        sketch = cls()
+        if isinstance(raw, dict):
+            sketch.count, sketch.total = raw.get("n") or 0, raw.get("sum") or 0.0
+            sketch.min, sketch.max, sketch.zero = raw.get("min"), raw.get("max"), raw.get("zero") or 0
+            sketch.buckets = Counter({int(key[1:]): count for key, count in (raw.get("b") or {}).items()})
+        return sketch
+
+
+class LatencyStats(game_events.FoldingHandler):
+    """Decision-time sketches, updated one event at a time."""
+
+    def __init__(self):
+        self.sketches = {measure: QuantileSketch() for measure in MEASURES}
+        self.timed_out = Counter()
+        self._started = {}  # match id -> start, while in progress
+        self._offered = {}  # match id -> offer time, until the response
+
+    def apply(self, event):
+        kind = event.get("kind")
+        match_id = event.get("match_id")
+        ts = event.get("ts")
+        if kind == game_events.MATCHED and event.get("round") in (None, 1):
+            self._started[match_id] = ts
+        elif kind == game_events.ADVANCED and match_id not in self._started:
+            # Later rounds start when the first player gets there
+            self._started[match_id] = ts
+        elif kind == game_events.OFFER:
+            self._offered[match_id] = ts
+            self._add(TO_OFFER, self._started.get(match_id), ts, event.get("timed_out"))
+        elif kind == game_events.RESPONSE:
+            self._add(TO_RESPOND, self._offered.pop(match_id, None), ts, event.get("timed_out"))
+            self._add(DURATION, self._started.pop(match_id, None), ts)
+        elif kind == game_events.LEFT:
+            for dropped in [match_id, *(event.get("dropped") or {})]:
+                self._started.pop(dropped, None)
+                self._offered.pop(dropped, None)
+        elif kind == game_events.RESET:
+            self.sketches = {measure: QuantileSketch() for measure in MEASURES}
+            self.timed_out.clear()
+            self._started.clear()
+            self._offered.clear()
+
+    def add_match(self, match):
+        """Add a match from a snapshot (exports without an event log)."""
+        if match.offer_at is not None:
+            self._add_delay(TO_OFFER, match.offer_delay, match.offer_timed_out)
+        if match.response_at is not None:
+            self._add_delay(TO_RESPOND, match.response_delay, match.response_timed_out)
+            if match.offer_delay is not None and match.response_delay is not None:
+                self._add_delay(DURATION, match.offer_delay + match.response_delay)
+
+    def _add(self, measure, start, end, timed_out=False):
+        self._add_delay(measure, end - start if start is not None and end is not None else None, timed_out)
+
+    def _add_delay(self, measure, seconds, timed_out=False):
+        if timed_out:
+            self.timed_out[measure] += 1
+        elif seconds is not None:
+            self.sketches[measure].add(seconds)
+
+    def rows(self):
+        """Summary table, one row per measure."""
+        def seconds(value):
+            return round(value, 1) if value is not None else None
+
+        rows = []
+        for measure in MEASURES:
+            sketch = self.sketches[measure]
+            rows.append({
+                "Measure": measure,
+                "Count": sketch.count + self.timed_out[measure],
+                "Median (s)": seconds(sketch.quantile(0.5)),
+                "p90 (s)": seconds(sketch.quantile(0.9)),
+                "p99 (s)": seconds(sketch.quantile(0.99)),
+                "Mean (s)": seconds(sketch.mean),
+                "Slowest (s)": seconds(sketch.max),
+                "Timed out": self.timed_out[measure],
+            })
+        return rows
+
+    def histogram_rows(self, bins=10):
+        """Long-format histogram rows for every measure, for charts and exports."""
+        return [{"Measure": measure, "From (s)": round(start, 1), "To (s)": round(end, 1), "Matches": count}
+                for measure in MEASURES for start, end, count in self.sketches[measure].histogram(bins)]
+
+
+def from_matches(matches):
+    """``LatencyStats`` of a {match id: Match} snapshot."""
+    stats = LatencyStats()
+    for match in matches.values():
+        stats.add_match(match)
+    return stats
@@ -0,0 +1,246 @@
+"""Large-cohort load test against the in-memory Firebase stand-in.
+
+    python load_test.py --players 5000
+    python load_test.py --players 500 --faults "latency=0.002,sigma=1,errors=0.05,lost=0.02,seed=1"
+
+Drives the registration, waiting-room, pairing, move and admin-refresh code
+paths used by the app in large-cohort mode and checks them against the
+throughput targets documented in ``cohort``. Exits non-zero if any target is
+missed.
+
+With ``--faults`` every database call goes through ``faulty_db`` and a
+failed step is retried the way a student's rerun would retry it. The
+throughput targets are then only reported (``----``), the correctness
+checks must still pass, and the call latencies per operation are printed.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+import admission
+import cohort
+import deadlines
+import faulty_db
+import game_events
+import latency
+import outcome_tally
+import shared_cache
+from activity import ActivityTable
+from concurrent_reads import fetch_all
+from game_records import Guilt, Offer, Player, Response, Role, parse_matches, parse_players
+from memory_db import MemoryDatabase
+from write_behind import WriteQueue
+
+
+def measure(database, action):
+    database.reset_stats()
+    start = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - start, dict(database.stats)
+
+
+def writes(stats):
+    return stats.get("set", 0) + stats.get("update", 0) + stats.get("transaction", 0) + stats.get("delete", 0)
+
+
+def retry(action, attempts=20):
+    """``action()``, called again after an injected fault (as the student's next rerun would)."""
+    for attempt in range(attempts):
+        try:
+            return action()
+        except faulty_db.InjectedFault:
+            if attempt == attempts - 1:
+                raise
+
+
+def run(players, seed=0, faults=None):
+    rng = random.Random(seed)
+    database = MemoryDatabase({"lawsuit_expected_players": players})
+    if faults:
+        database = faulty_db.FaultyDatabase(database, faulty_db.parse_profile(faults))
+    names = [f"student{i:05d}" for i in range(players)]
+    results = []
+
+    def check(label, ok, detail, target=False):
+        # Throughput targets don't apply while faults are injected
+        results.append((label, None if target and faults else ok, detail))
+
+    # Registration burst: everyone joins at once through the admission queue
+    join_queue = admission.JoinQueue(database, interval=0.05)
+
+    def burst():
+        positions = [join_queue.admit(Player(name, time.time())) for name in names]
+        assert join_queue.flush(timeout=60)
+        return positions
+
+    positions, elapsed, stats = measure(database, burst)
+    per_join = writes(stats) / players
+    # At most one batch (one update and a transaction per shard) per interval, whatever the class size
+    max_writes = (math.floor(elapsed / join_queue.interval) + 1) * (1 + cohort.REGISTRATION_SHARDS)
+    check("registration writes/join <= 3", per_join <= 3, f"{per_join:.2f} writes, {players / elapsed:,.0f} joins/s",
+          target=True)
+    check(f"registration writes <= {max_writes}", writes(stats) <= max_writes,
+          f"{writes(stats)} writes in {elapsed:.2f} s", target=True)
+    check("registration full-tree reads == 0", stats.get("get", 0) == 0, f"{stats.get('get', 0)} reads", target=True)
+    check("every join got a queue position", None not in positions, f"last position {max(positions)}")
+
+    # Waiting-room poll
+    count, _, stats = measure(database, lambda: retry(lambda: cohort.registered_count(database)))
+    check("gate poll sees everyone", count == players, f"{count}/{players}")
+    check("gate poll < 1 KB", stats.get("get", 0) == 1 and stats.get("bytes_read", 0) < 1024,
+          f"{stats.get('bytes_read', 0)} bytes", target=True)
+
+    # Batched pairing (claimed by one client)
+    def pair():
+        assert cohort.claim_pairing(database, names[0]) == "claimed"
+        return cohort.pair_all(database, parse_players(database.reference("lawsuit_players").get()), players, rng)
+
+    def pair_until_done():
+        # A rerun after a failed batch pairs whoever is still unmatched
+        created = 0
+        for _ in range(20):
+            try:
+                created += pair()
+                break
+            except faulty_db.InjectedFault:
+                pass
+        return created
+
+    created, elapsed, stats = measure(database, pair_until_done)
+    max_writes = math.ceil(players / 2 / cohort.PAIRING_BATCH_SIZE) + 1
+    matched = parse_players(retry(database.reference("lawsuit_players").get))
+    check("pairing creates N/2 matches", len({p.match_id for p in matched.values() if p.match_id}) == players // 2,
+          f"{created} matches")
+    check(f"pairing writes <= {max_writes}", stats.get("update", 0) <= max_writes, f"{stats.get('update', 0)} updates",
+          target=True)
+    check("pairing < 2 s", elapsed < 2, f"{elapsed:.2f} s", target=True)
+    check("late claimers see 'done'", retry(lambda: cohort.claim_pairing(database, names[-1])) == "done", "")
+
+    # Every student plays their move, reading only their own nodes and writing through the write-behind queue
+    write_queue = WriteQueue(database)
+
+    def own_player(name):
+        return parse_players({name: retry(database.reference(f"lawsuit_players/{name}").get)})[name]
+
+    def own_match(player):
+        return parse_matches({player.match_id: retry(
+            database.reference(f"lawsuit_matches/{player.match_id}").get)})[player.match_id]
+
+    def play():
+        for name in names:
+            player = own_player(name)
+            if player.role == Role.EBAY:
+                # Innocent eBay players may only offer Stingy
+                offer = Offer.GENEROUS if player.guilt == Guilt.GUILTY and rng.random() < 0.5 else Offer.STINGY
+                deadlines.submit_move(write_queue, own_match(player), deadlines.OFFER, offer, time.time())
+        assert write_queue.flush(timeout=120)
+        for name in names:
+            player = own_player(name)
+            if player.role == Role.ATT:
+                match = own_match(player)
+                # Generous offers are always accepted
+                response = (Response.REJECT if match.offer == Offer.STINGY and rng.random() < 0.5
+                            else Response.ACCEPT)
+                deadlines.submit_move(write_queue, match, deadlines.RESPONSE, response, time.time(),
+                                      after=lambda completed: outcome_tally.record(database, completed))
+        assert write_queue.flush(timeout=120)
+
+    _, elapsed, stats = measure(database, play)
+    check("moves", True, f"{players / elapsed:,.0f} players/s, {stats.get('bytes_read', 0) / players:.0f} bytes read/player")
+
+    # Admin refresh: new events and one filtered monitor page; the player and match trees are only
+    # read by the admin's periodic sweep (measured separately below)
+    table = ActivityTable()
+    consumer = game_events.EventConsumer(database, handler=table.handle)
+    _, elapsed, _ = measure(database, lambda: retry(consumer.poll))
+    check("activity table initial fold < 2 s", elapsed < 2, f"{elapsed:.2f} s", target=True)
+
+    def admin_refresh():
+        retry(consumer.poll)
+        return cohort.paginate(table.filter(role=Role.EBAY), 1, cohort.MONITOR_PAGE_SIZE)
+
+    page, elapsed, stats = measure(database, admin_refresh)
+    check("monitor page is full", len(page) == min(cohort.MONITOR_PAGE_SIZE, players // 2), f"{len(page)} rows")
+    check("admin refresh < 1 s", elapsed < 1, f"{elapsed:.2f} s, {stats.get('bytes_read', 0) / 1024:.0f} KB read",
+          target=True)
+
+    def admin_sweep():
+        players_raw, matches_raw = fetch_all(database, "lawsuit_players", "lawsuit_matches")
+        return parse_players(players_raw), parse_matches(matches_raw)
+
+    (_, all_matches), elapsed, stats = measure(database, lambda: retry(admin_sweep))
+    completed = len([m for m in all_matches.values() if m.is_complete])
+    check("all matches completed", completed == players // 2, f"{completed} completed")
+    check("admin sweep < 2 s", elapsed < 2, f"{elapsed:.2f} s, {stats.get('bytes_read', 0) / 1024:.0f} KB read",
+          target=True)
+
+    # Decision-time sketches stream from the event log and agree with the snapshot
+    timings = latency.LatencyStats()
+    _, elapsed, _ = measure(database, lambda: retry(game_events.EventConsumer(database, handler=timings.handle).poll))
+    snapshot = latency.from_matches(all_matches)
+    check("decision-time sketches match matches",
+          [row["Count"] for row in timings.rows()] == [row["Count"] for row in snapshot.rows()]
+          and timings.rows()[0]["Median (s)"] == snapshot.rows()[0]["Median (s)"],
+          f"{elapsed:.2f} s to fold, {sum(len(s.buckets) for s in timings.sketches.values())} buckets")
+
+    # Analytics only need the fixed-size counters
+    tally, elapsed, stats = measure(database, lambda: retry(lambda: outcome_tally.load(database)))
+    completed = sum(match.is_complete for match in all_matches.values())
+    check("outcome counters match matches",
+          tally == outcome_tally.from_matches(all_matches.values()) and tally.completed == completed,
+          f"{tally.completed}/{completed} counted")
+    check("analytics read < 1 KB", stats.get("bytes_read", 0) < 1024, f"{stats.get('bytes_read', 0)} bytes",
+          target=True)
+
+    # Several app replicas polling through one shared cache read Firebase once per version
+    client = shared_cache.LocalRedis()
+    replicas = [shared_cache.SharedCache(client) for _ in range(4)]
+
+    def poll_replicas():
+        for i in range(players):
+            cache = replicas[i % len(replicas)]
+            version = cache.version(database)
+            retry(lambda: cache.get_or_compute("expected_players", version,
+                                               database.reference("lawsuit_expected_players").get))
+            retry(lambda: cache.get_or_compute("tally", version, lambda: outcome_tally.load(database)))
+
+    _, elapsed, stats = measure(database, poll_replicas)
+    reads = stats.get("get", 0) + stats.get("query", 0)
+    max_reads = 3 * math.ceil(elapsed / shared_cache.VERSION_TTL + 1)
+    check(f"replica polls read Firebase <= {max_reads}", reads <= max_reads, f"{reads} reads for {players} polls",
+          target=True)
+    retry(lambda: database.reference("lawsuit_expected_players").set(players + 2))
+    replicas[0].bump()
+    seen = retry(lambda: replicas[1].get_or_compute("expected_players", replicas[1].version(database),
+                                                    database.reference("lawsuit_expected_players").get))
+    check("bump invalidates every replica", seen == players + 2, f"{seen}")
+    retry(lambda: database.reference("lawsuit_expected_players").set(players))
+
+    # The event log folds back to the same state
+    state = game_events.fold_events(retry(database.reference(game_events.EVENTS_PATH).get))
+    check("event log fold matches state", state["matches"] == retry(database.reference("lawsuit_matches").get)
+          and state["players"] == retry(database.reference("lawsuit_players").get), "")
+    return results, database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=cohort.MAX_PLAYERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--faults", help='fault profile, e.g. "latency=0.01,errors=0.05,lost=0.01" (see faulty_db)')
+    args = parser.parse_args(argv)
+
+    results, database = run(args.players, args.seed, args.faults)
+    for label, ok, detail in results:
+        print(f"{'----' if ok is None else 'PASS' if ok else 'FAIL'}  {label:<40} {detail}")
+    if args.faults:
+        print()
+        for row in database.report():
+            print("  ".join(f"{key}: {value}" for key, value in row.items()))
+    return 0 if all(ok is not False for _, ok, _ in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
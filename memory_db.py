@@ -0,0 +1,218 @@
+"""In-process stand-in for ``firebase_admin.db`` used by load tests and scripts.
+
+``MemoryDatabase().reference(path)`` returns objects with the same methods the
+app uses on real references (get/set/update/delete/push/transaction/child and
+ordered queries). Every call is counted in ``stats`` together with the JSON
+bytes moved, so scripts can report round trips and payload sizes. The app
+itself runs against one when its ``database_url`` secret is a
+``memory://<name>`` URL (see ``connect``).
+"""
+import copy
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+def _split(path):
+    return [part for part in str(path).strip("/").split("/") if part]
+
+
+def _size(value):
+    return len(json.dumps(value, separators=(",", ":"), default=str)) if value is not None else 0
+
+
+def _normalise(value):
+    """Firebase drops nulls and empty objects; do the same."""
+    if isinstance(value, dict):
+        cleaned = {str(k): _normalise(v) for k, v in value.items()}
+        cleaned = {k: v for k, v in cleaned.items() if v is not None}
+        return cleaned or None
+    if isinstance(value, (list, tuple)):
+        return _normalise({str(i): v for i, v in enumerate(value)})
+    return value
+
+
+class MemoryDatabase:
+    def __init__(self, data=None):
+        self.root = _normalise(copy.deepcopy(data)) or {}
+        self.stats = Counter()
+        self.lock = threading.RLock()
+
+    def reference(self, path="/"):
+        return MemoryReference(self, _split(path))
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    def dump(self):
+        with self.lock:
+            return copy.deepcopy(self.root)
+
+    # Internal tree helpers (callers hold the lock)
+    def _read(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def _write(self, parts, value):
+        value = _normalise(copy.deepcopy(value))
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        trail = [self.root]
+        node = self.root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[part] = {}
+            node = child
+            trail.append(node)
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        # Prune parents left empty by a delete
+        for depth in range(len(trail) - 1, 0, -1):
+            if trail[depth]:
+                break
+            trail[depth - 1].pop(parts[depth - 1], None)
+
+
+class MemoryReference:
+    def __init__(self, database, parts):
+        self._db = database
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    @property
+    def parent(self):
+        return MemoryReference(self._db, self._parts[:-1]) if self._parts else None
+
+    def child(self, path):
+        return MemoryReference(self._db, self._parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        with self._db.lock:
+            value = self._db._read(self._parts)
+        if shallow and isinstance(value, dict):
+            value = {k: True for k in value}
+        self._db.stats["get"] += 1
+        self._db.stats["bytes_read"] += _size(value)
+        return (value, str(hash(json.dumps(value, sort_keys=True, default=str)))) if etag else value
+
+    def set(self, value):
+        with self._db.lock:
+            self._db._write(self._parts, value)
+        self._db.stats["set"] += 1
+        self._db.stats["bytes_written"] += _size(value)
+
+    def update(self, value):
+        with self._db.lock:
+            for path, child_value in value.items():
+                self._db._write(self._parts + _split(path), child_value)
+        self._db.stats["update"] += 1
+        self._db.stats["bytes_written"] += _size(value)
+
+    def delete(self):
+        with self._db.lock:
+            self._db._write(self._parts, None)
+        self._db.stats["delete"] += 1
+
+    def push(self, value=""):
+        key = f"{time.time_ns():020d}"
+        ref = self.child(key)
+        ref.set(value)
+        return ref
+
+    def transaction(self, transaction_update):
+        with self._db.lock:
+            current = self._db._read(self._parts)
+            new_value = transaction_update(current)
+            self._db._write(self._parts, new_value)
+        self._db.stats["transaction"] += 1
+        self._db.stats["bytes_read"] += _size(current)
+        self._db.stats["bytes_written"] += _size(new_value)
+        return new_value
+
+    def order_by_key(self):
+        return MemoryQuery(self, None)
+
+    def order_by_child(self, path):
+        return MemoryQuery(self, path)
+
+
+class MemoryQuery:
+    def __init__(self, ref, order_by):
+        self._ref = ref
+        self._order_by = order_by
+        self._first = self._last = None
+        self._start = self._equal = None
+
+    def limit_to_first(self, limit):
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self._last = limit
+        return self
+
+    def start_at(self, start):
+        self._start = start
+        return self
+
+    def equal_to(self, value):
+        self._equal = value
+        return self
+
+    def _sort_value(self, key, value):
+        if self._order_by is None:
+            return key
+        return value.get(self._order_by) if isinstance(value, dict) else None
+
+    def get(self):
+        database = self._ref._db
+        with database.lock:
+            data = database._read(self._ref._parts)
+        data = data if isinstance(data, dict) else {}
+
+        entries = [(self._sort_value(k, v), k, v) for k, v in data.items()]
+        entries = [e for e in entries if e[0] is not None or self._order_by is None]
+        entries.sort(key=lambda e: (e[0], e[1]))
+        if self._start is not None:
+            entries = [e for e in entries if e[0] >= self._start]
+        if self._equal is not None:
+            entries = [e for e in entries if e[0] == self._equal]
+        if self._first is not None:
+            entries = entries[:self._first]
+        if self._last is not None:
+            entries = entries[-self._last:]
+
+        result = OrderedDict((k, v) for _, k, v in entries)
+        database.stats["query"] += 1
+        database.stats["bytes_read"] += _size(result)
+        return result
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def connect(url):
+    """Process-wide ``MemoryDatabase`` for a ``memory://<name>`` URL (created empty on first use)."""
+    with _databases_lock:
+        if url not in _databases:
+            _databases[url] = MemoryDatabase()
+        return _databases[url]
@@ -0,0 +1,178 @@
+"""Live outcome counters, updated once per completed match.
+
+Instead of downloading and scanning ``lawsuit_matches`` on every refresh,
+the dashboards read one small node:
+
+    lawsuit_outcomes = {"Guilty-Generous-Accept": 3, "Guilty-Stingy-Accept": 1, ...,
+                        "ebay_payoff": -1460, "att_payoff": 1320}
+
+It holds the guilt x offer x response contingency table (the five
+outcomes the rules allow) and payoff sums at the payoffs in force when
+each match completed. Every class metric, the Pooling/Separating split
+and every summary chart derive from it.
+
+Whoever completes a match records it: the AT&T player once their response
+lands (a write-behind follow-up), or the client that applies a default
+response (``deadlines.enforce``). ``record`` first claims the match under
+``lawsuit_outcomes_counted``, then increments the counters in a
+transaction and finally marks the claim done, so a match is counted
+exactly once even if two clients race or a follow-up is retried. Every
+step carries a token derived from the match id and response time: an
+open claim accepts its own token and the counters keep the tokens of
+their last ``RECENT_KEPT`` increments, so a write that landed but whose
+acknowledgement was lost is neither dropped nor counted twice when it is
+retried before ``RECENT_KEPT`` other matches are counted. A claim left
+open by a client that gave up between the steps is finished by ``settle``
+(run by the admin's periodic sweep). ``rebuild`` recounts from the matches, e.g.
+for games played before the counters existed.
+"""
+import time
+import zlib
+from dataclasses import dataclass, replace
+
+import equilibrium
+from game_records import Guilt, Offer, Response, parse_match
+
+OUTCOMES_PATH = "lawsuit_outcomes"
+COUNTED_PATH = "lawsuit_outcomes_counted"  # match id -> True once counted ({"k": token} while being counted)
+RECENT_KEPT = 32  # tokens of the latest increments kept in the counters
+RECORD_ATTEMPTS = 6
+RETRY_DELAY = 0.05  # seconds, doubled per attempt
+
+
+@dataclass(frozen=True, slots=True)
+class OutcomeTally:
+    counts: tuple = (0,) * len(equilibrium.OUTCOMES)  # in equilibrium.OUTCOMES order
+    ebay_payoff: float = 0  # payoff sums over completed matches
+    att_payoff: float = 0
+
+    def count(self, guilt=None, offer=None, response=None):
+        """Completed matches with the given guilt/offer/response (None = any)."""
+        return sum(n for (g, o, r), n in zip(equilibrium.OUTCOMES, self.counts)
+                   if guilt in (None, g) and offer in (None, o) and response in (None, r))
+
+    @property
+    def completed(self):
+        return sum(self.counts)
+
+    @property
+    def guilty(self):
+        return self.count(Guilt.GUILTY)
+
+    @property
+    def innocent(self):
+        return self.count(Guilt.INNOCENT)
+
+    @property
+    def stingy(self):
+        return self.count(offer=Offer.STINGY)
+
+    @property
+    def stingy_accepted(self):
+        return self.count(offer=Offer.STINGY, response=Response.ACCEPT)
+
+    @property
+    def pooling(self):
+        """Guilty eBay players who offered Stingy like the innocent ones."""
+        return self.count(Guilt.GUILTY, Offer.STINGY)
+
+    @property
+    def separating(self):
+        return self.completed - self.pooling
+
+    def add(self, match, payoff_table=None):
+        outcome = (match.guilt, match.offer, match.response)
+        if outcome not in equilibrium.OUTCOMES:
+            return self
+        counts = list(self.counts)
+        counts[equilibrium.OUTCOMES.index(outcome)] += 1
+        result = match.result(payoff_table)  # the table only prices records older than their pe/pa
+        return replace(self, counts=tuple(counts), ebay_payoff=self.ebay_payoff + result.ebay_payoff,
+                       att_payoff=self.att_payoff + result.att_payoff)
+
+    def to_wire(self):
+        wire = {equilibrium.outcome_key(outcome): n for outcome, n in zip(equilibrium.OUTCOMES, self.counts)}
+        wire.update(ebay_payoff=self.ebay_payoff, att_payoff=self.att_payoff)
+        return wire
+
+    @classmethod
+    def from_wire(cls, raw):
+        if not isinstance(raw, dict):
+            return cls()
+        return cls(tuple(int(raw.get(equilibrium.outcome_key(outcome)) or 0) for outcome in equilibrium.OUTCOMES),
+                   raw.get("ebay_payoff") or 0, raw.get("att_payoff") or 0)
+
+
+def from_matches(matches, payoff_table=None):
+    tally = OutcomeTally()
+    for match in matches:
+        if match.is_complete:
+            tally = tally.add(match, payoff_table)
+    return tally
+
+
+def load(database):
+    return OutcomeTally.from_wire(database.reference(OUTCOMES_PATH).get())
+
+
+def record(database, match, payoff_table=None):
+    """Count the completed ``match`` once; False if it was already counted (or is not complete)."""
+    if not match.is_complete:
+        return False
+    # The same completion always gets the same token, however often or by whom it is recorded
+    token = f"{zlib.crc32(f'{match.match_id}:{match.response_at}'.encode()):08x}"
+    claimed = {}
+
+    def claim(current):
+        claimed["ok"] = current is None or isinstance(current, dict) and current.get("k") == token
+        return {"k": token} if claimed["ok"] else current
+
+    def count(current):
+        # One space-separated string rather than a list (see game_records.numbered_key)
+        recent = str(current.get("recent") or "").split() if isinstance(current, dict) else []
+        if token in recent:
+            return current
+        wire = OutcomeTally.from_wire(current).add(match, payoff_table).to_wire()
+        wire["recent"] = " ".join((recent + [token])[-RECENT_KEPT:])
+        return wire
+
+    _retry(lambda: database.reference(f"{COUNTED_PATH}/{match.match_id}").transaction(claim))
+    if not claimed.get("ok"):
+        return False
+    _retry(lambda: database.reference(OUTCOMES_PATH).transaction(count))
+    _retry(lambda: database.reference(f"{COUNTED_PATH}/{match.match_id}").set(True))
+    return True
+
+
+def settle(database, payoff_table=None):
+    """Finish recording matches whose claim was left open; returns how many were closed."""
+    open_claims = database.reference(COUNTED_PATH).order_by_child("k").start_at("").get() or {}
+    settled = 0
+    for match_id in open_claims:
+        match = parse_match(match_id, database.reference(f"lawsuit_matches/{match_id}").get())
+        if match is None:
+            database.reference(f"{COUNTED_PATH}/{match_id}").delete()  # deleted since, e.g. by a reap
+        elif record(database, match, payoff_table):
+            settled += 1
+    return settled
+
+
+def _retry(action):
+    for attempt in range(RECORD_ATTEMPTS):
+        try:
+            return action()
+        except Exception:
+            if attempt == RECORD_ATTEMPTS - 1:
+                raise
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+
+def rebuild(database, matches, payoff_table=None):
+    """Recount from scratch from {match id: Match}; returns the new tally."""
+    completed = [match for match in matches.values() if match.is_complete]
+    tally = from_matches(completed, payoff_table)
+    database.reference("/").update({
+        OUTCOMES_PATH: tally.to_wire(),
+        COUNTED_PATH: {match.match_id: True for match in completed} or None,
+    })
+    return tally
@@ -0,0 +1,197 @@
+"""Presence heartbeats and reaping of players who have left.
+
+Every open student tab writes its clock to ``lawsuit_presence/<name>`` at
+most once per ``HEARTBEAT_INTERVAL`` (from a timed fragment, so heartbeats
+continue while the student is reading or deciding). A player who is still
+needed - not yet paired, or paired with a move still to make - and has not
+been seen for ``PRESENCE_TTL`` seconds is reaped:
+
+* their player node and presence entry are removed,
+* an unfinished match they were in is deleted. Their partner is paired at
+  once with a player of the other role whose partner also left, if one is
+  waiting; otherwise the partner waits with ``partner_left`` set for the
+  next one (in multi-round sessions the partner skips the round instead,
+  and the leaver's later rounds are deleted too),
+* their registration counter shard goes down by one and, once the game has
+  started (the class is full or they already had a role), so does the
+  expected player count - by two when their partner is left waiting, so it
+  stays even and the admin's "all matches completed" check stays reachable;
+  someone leaving the waiting room just frees their seat,
+* a ``left`` event is logged.
+
+With bot players enabled (see ``bots``), a player who leaves mid-game is
+handed to a bot instead, so their partner keeps the match. Bots send no
+heartbeats and are never reaped.
+
+Sweeps are run by the admin panel once per ``HEARTBEAT_INTERVAL`` and by
+students who are waiting on someone. Several clients may sweep at once; removing the player node is a
+transaction, and only the client that actually removed it applies the rest.
+"""
+import time
+
+import bots
+import cohort
+import game_events
+from concurrent_reads import gather
+from game_records import Match, Role, parse_player
+
+PRESENCE_PATH = "lawsuit_presence"
+HEARTBEAT_INTERVAL = 10  # seconds between heartbeats from an open tab
+PRESENCE_TTL = 60  # seconds without a heartbeat before a needed player is reaped
+
+
+def heartbeat(database, name, now=None):
+    database.reference(f"{PRESENCE_PATH}/{name}").set(time.time() if now is None else now)
+
+
+def last_seen(presence, player):
+    """Latest heartbeat (or the join time, for players who never sent one)."""
+    seen = (presence or {}).get(player.name)
+    return max(seen if isinstance(seen, (int, float)) else 0, player.joined_at or 0)
+
+
+def is_needed(player, match):
+    """True while the game is still waiting on ``player`` to do something."""
+    if match is None:
+        return True
+    if match.ebay_player == player.name:
+        return match.offer is None
+    return match.response is None
+
+
+def is_gone(presence, player, now=None, ttl=PRESENCE_TTL):
+    now = time.time() if now is None else now
+    return now - last_seen(presence, player) > ttl
+
+
+def abandoned(players, matches, presence, now=None, ttl=PRESENCE_TTL, bot_settings=None):
+    """Players (parsed ``Player`` records) who are still needed but have gone silent."""
+    now = time.time() if now is None else now
+    gone = []
+    for player in players.values():
+        if bot_settings and bots.is_bot(bot_settings, player.name):
+            continue
+        match = matches.get(player.match_id) if player.match_id else None
+        if is_needed(player, match) and is_gone(presence, player, now, ttl):
+            gone.append(player)
+    return gone
+
+
+def rematch(database, partner, match):
+    """New match for ``partner``, whose partner in ``match`` left, with a player of the other role
+    who is waiting after their own partner left; None if nobody is waiting.
+
+    The waiting player is claimed in a transaction on their node, so two reaps
+    never pair the same player.
+    """
+    partner_is_ebay = match.ebay_player == partner
+    waiting = database.reference("lawsuit_players").order_by_child("x").equal_to(1).get() or {}
+    for name, raw in waiting.items():
+        candidate = parse_player(name, raw)
+        if candidate is None or candidate.match_id or candidate.role != (Role.ATT if partner_is_ebay else Role.EBAY):
+            continue
+        if partner_is_ebay:
+            new_match = Match(f"{partner}_vs_{name}", partner, name, match.guilt, time.time())
+        else:
+            new_match = Match(f"{name}_vs_{partner}", name, partner, candidate.guilt, time.time())
+        claimed = {}
+
+        def claim(current):
+            claimed["ok"] = isinstance(current, dict) and current.get("x") == 1 and not current.get("m")
+            if not claimed["ok"]:
+                return current
+            return {**{key: value for key, value in current.items() if key != "x"}, "m": new_match.match_id}
+
+        database.reference(f"lawsuit_players/{name}").transaction(claim)
+        if claimed.get("ok"):
+            return new_match
+    return None
+
+
+def reap(database, player, match=None, shrink=True):
+    """Remove ``player`` and re-pair their partner; False if another client got there first.
+
+    ``shrink`` also lowers the expected player count by one (never for a
+    player who was already waiting after their own partner left, since they
+    no longer count). A partner left mid-match in a single-round game is
+    paired with a player of the other role in the same situation when there
+    is one. Otherwise they wait with ``partner_left`` set and stop counting
+    too, so the expected count stays even and the class can finish without
+    them; the next such player of the other role is paired with them.
+    """
+    shrink = shrink and not player.partner_left
+    removed = {}
+
+    def drop(current):
+        # Only remove the record we judged stale, not a fresh re-registration
+        removed["ok"] = isinstance(current, dict) and parse_player(player.name, current).joined_at == player.joined_at
+        return None if removed["ok"] else current
+
+    database.reference(f"lawsuit_players/{player.name}").transaction(drop)
+    if not removed.get("ok"):
+        return False
+
+    updates = {f"{PRESENCE_PATH}/{player.name}": None}
+    event_fields = {"player": player.name, "shrink": shrink}
+    expected_change = -int(shrink)
+    if match is not None and not match.is_complete:
+        updates[f"lawsuit_matches/{match.match_id}"] = None
+        event_fields["match_id"] = match.match_id
+        partner = match.att_player if match.ebay_player == player.name else match.ebay_player
+        # In a multi-round session the partner just skips this round (see rounds.py)
+        new_match = rematch(database, partner, match) if match.round_no is None else None
+        if new_match is not None:
+            updates.update(cohort.match_update(new_match))
+            expected_change += 1  # the waiting player counts again
+        else:
+            updates[f"lawsuit_players/{partner}/m"] = None
+            event_fields["partner"] = partner
+            if match.round_no is None:
+                updates[f"lawsuit_players/{partner}/x"] = 1
+                event_fields["partner_left"] = True
+                expected_change -= 1
+    if player.match_id in player.schedule:
+        # Their later scheduled rounds will not be played either; partners skip them
+        later = player.schedule[player.schedule.index(player.match_id) + 1:]
+        updates.update({f"lawsuit_matches/{match_id}": None for match_id in later})
+        if later:
+            event_fields["dropped"] = {match_id: True for match_id in later}
+    updates.update(game_events.event_update(game_events.LEFT, **event_fields))
+    database.reference("/").update(updates)
+
+    if expected_change:
+        database.reference("lawsuit_expected_players").transaction(
+            lambda current: max(0, (current or 0) + expected_change))
+    cohort.count_registration(database, player.name, -1)
+    return True
+
+
+def replace_or_reap(database, player, match, shrink=True, bot_settings=None):
+    """Hand a player who left mid-game to a bot when bots are enabled, otherwise reap them."""
+    if bot_settings and bot_settings["enabled"] and match is not None and not match.is_complete:
+        return bots.take_over(database, player)
+    return reap(database, player, match, shrink)
+
+
+def sweep(database, players, matches, presence, expected_players, now=None, ttl=PRESENCE_TTL, bot_settings=None):
+    """Reap (or hand to a bot) every abandoned player; returns the names this call dealt with."""
+    class_full = len(players) >= expected_players
+    reaped = []
+    for player in abandoned(players, matches, presence, now, ttl, bot_settings):
+        match = matches.get(player.match_id) if player.match_id else None
+        if replace_or_reap(database, player, match, class_full or player.role is not None, bot_settings):
+            reaped.append(player.name)
+    return reaped
+
+
+def reap_partner_if_gone(database, match, name, now=None, ttl=PRESENCE_TTL, bot_settings=None):
+    """Reap (or hand to a bot) ``name``'s partner in ``match`` if it is their move and they have gone silent."""
+    partner_name = match.att_player if match.ebay_player == name else match.ebay_player
+    if bot_settings and bots.is_bot(bot_settings, partner_name):
+        return False
+    partner_raw, seen = gather(database.reference(f"lawsuit_players/{partner_name}").get,
+                               database.reference(f"{PRESENCE_PATH}/{partner_name}").get)
+    partner = parse_player(partner_name, partner_raw)
+    if partner and is_needed(partner, match) and is_gone({partner_name: seen}, partner, now, ttl):
+        return replace_or_reap(database, partner, match, bot_settings=bot_settings)
+    return False
@@ -0,0 +1,375 @@
+"""Report and analytics generation without Streamlit.
+
+The admin's PDF export and the end-of-term reporting share this code. It
+only needs parsed matches and the game parameters, so reports can be built
+from the live database, from a JSON export, or from an archived event log:
+
+    python reports.py history.json.gz --out reports/ --format pdf csv parquet
+    python reports.py --firebase-credentials key.json --database-url https://... --out reports/
+
+Sources:
+
+* an event log, as downloaded from the admin's Event Log panel, read from
+  ``lawsuit_events`` or inside a whole-database export, is split into one
+  session per game at every ``reset`` event, so a whole term's history
+  comes out as many sessions,
+* a snapshot with matches but no event log
+  (``{"lawsuit_matches": ..., "lawsuit_parameters": ...}``) is one session,
+* files ending in ``.gz`` are decompressed first.
+
+Event logs do not record the guilt prior. Their sessions use the
+parameters stored next to them (Firebase) or the defaults. Payoffs are the
+ones fixed when each match completed; only older records without them are
+priced from those parameters.
+
+Every session gets ``<session>.pdf``, ``.csv`` / ``.parquet`` (Parquet
+needs pyarrow), ``<session>-latency.csv`` decision-time histograms (with
+CSV) and ``<session>.json`` summary statistics, including decision-time
+quantiles (see ``latency``). ``summary.csv`` has one row per session. Sessions are rendered in parallel, one per worker
+process (``--workers``, all cores by default).
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+
+import matplotlib
+import pandas as pd
+
+import cohort
+import equilibrium
+import game_events
+import latency
+from class_stats import outcome_counts
+from game_records import Guilt, Offer, Response, label, parse_matches
+
+FORMATS = ["pdf", "csv", "parquet"]
+
+
+@dataclass(slots=True)
+class Session:
+    name: str
+    matches: dict  # match id -> Match
+    params: equilibrium.GameParameters
+    players: int = 0
+
+
+def match_results(all_matches, payoff_table=None):
+    """Flatten completed matches into report rows."""
+    results_data = []
+    for match_id, match in all_matches.items():
+        if match.is_complete:
+            result = match.result(payoff_table)  # payoffs as fixed at completion
+            results_data.append({
+                "Match_ID": match_id,
+                "eBay_Player": match.ebay_player,
+                "ATT_Player": match.att_player,
+                "eBay_Status": label(match.guilt),
+                "Offer": label(match.offer),
+                "Response": label(match.response),
+                "eBay_Payoff": result.ebay_payoff,
+                "ATT_Payoff": result.att_payoff
+            })
+    return results_data
+
+
+def pdf_report(all_matches, params):
+    """Comprehensive PDF report (charts and a paginated results table) as bytes."""
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        results_data = match_results(all_matches, params.table())
+
+        if results_data:
+            # Create summary page
+            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
+            fig.suptitle('AT&T vs eBay Lawsuit Game - Complete Results', fontsize=20, fontweight='bold')
+
+            # Collect data for charts
+            ebay_offers = [r["Offer"] for r in results_data]
+            att_responses = [r["Response"] for r in results_data]
+            guilt_statuses = [r["eBay_Status"] for r in results_data]
+
+            # Chart 1: eBay Offers
+            offer_counts = pd.Series(ebay_offers).value_counts(normalize=True) * 100
+            ax1.bar(offer_counts.index, offer_counts.values, color=['#e74c3c', '#3498db'], alpha=0.8)
+            ax1.set_title('eBay Settlement Offers', fontweight='bold')
+            ax1.set_ylabel('Percentage (%)')
+            for i, v in enumerate(offer_counts.values):
+                ax1.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
+            ax1.grid(True, alpha=0.3)
+
+            # Chart 2: AT&T Responses
+            response_counts = pd.Series(att_responses).value_counts(normalize=True) * 100
+            ax2.bar(response_counts.index, response_counts.values, color=['#3498db', '#e74c3c'], alpha=0.8)
+            ax2.set_title('AT&T Responses', fontweight='bold')
+            ax2.set_ylabel('Percentage (%)')
+            for i, v in enumerate(response_counts.values):
+                ax2.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
+            ax2.grid(True, alpha=0.3)
+
+            # Chart 3: Guilt Distribution
+            guilt_counts = pd.Series(guilt_statuses).value_counts(normalize=True) * 100
+            ax3.bar(guilt_counts.index, guilt_counts.values, color=['#e74c3c', '#2ecc71'], alpha=0.8)
+            ax3.set_title('eBay Guilt Distribution', fontweight='bold')
+            ax3.set_ylabel('Percentage (%)')
+            for i, v in enumerate(guilt_counts.values):
+                ax3.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
+            ax3.grid(True, alpha=0.3)
+
+            # Chart 4: Strategy Analysis
+            strategies = []
+            for r in results_data:
+                if r["eBay_Status"] == "Innocent" and r["Offer"] == "Stingy":
+                    strategies.append("Separating")
+                elif r["eBay_Status"] == "Guilty" and r["Offer"] == "Generous":
+                    strategies.append("Separating")
+                else:
+                    strategies.append("Pooling")
+
+            if strategies:
+                strategy_counts = pd.Series(strategies).value_counts(normalize=True) * 100
+                ax4.bar(strategy_counts.index, strategy_counts.values, color=['#9b59b6', '#f39c12'], alpha=0.8)
+                ax4.set_title('eBay Strategy Analysis', fontweight='bold')
+                ax4.set_ylabel('Percentage (%)')
+                for i, v in enumerate(strategy_counts.values):
+                    ax4.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
+                ax4.grid(True, alpha=0.3)
+
+            plt.tight_layout()
+            pdf.savefig(fig, bbox_inches='tight', dpi=300)
+            plt.close(fig)
+
+            # Decision times: histograms and quantiles per measure
+            latency_page(pdf, latency.from_matches(all_matches))
+
+            # Create detailed results table pages (fixed number of rows per page)
+            table_header = ["Match ID", "eBay Player", "AT&T Player", "eBay Status", "Offer", "Response", "eBay Payoff", "AT&T Payoff"]
+            table_rows = [[
+                r["Match_ID"], r["eBay_Player"], r["ATT_Player"],
+                r["eBay_Status"], r["Offer"], r["Response"],
+                str(r["eBay_Payoff"]), str(r["ATT_Payoff"])
+            ] for r in results_data]
+            total_pages = cohort.page_count(len(table_rows), cohort.PDF_ROWS_PER_PAGE)
+
+            for page in range(1, total_pages + 1):
+                fig, ax = plt.subplots(figsize=(16, 10))
+                ax.axis('tight')
+                ax.axis('off')
+
+                page_rows = cohort.paginate(table_rows, page, cohort.PDF_ROWS_PER_PAGE)
+                table = ax.table(cellText=page_rows, colLabels=table_header,
+                               cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
+                table.auto_set_font_size(False)
+                table.set_fontsize(9)
+                table.scale(1, 2)
+
+                # Style the table
+                for i in range(len(table_header)):
+                    table[(0, i)].set_facecolor('#4472C4')
+                    table[(0, i)].set_text_props(weight='bold', color='white')
+
+                title = 'Detailed Game Results'
+                if total_pages > 1:
+                    title += f' (page {page} of {total_pages})'
+                ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+                # Lower resolution keeps multi-page reports for big classes small
+                pdf.savefig(fig, bbox_inches='tight', dpi=300 if total_pages == 1 else 150)
+                plt.close(fig)
+
+    return buffer.getvalue()
+
+
+def latency_page(pdf, latency_stats):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(16, 10))
+    grid = fig.add_gridspec(2, len(latency.MEASURES), height_ratios=[3, 1])
+    fig.suptitle('Decision Times', fontsize=20, fontweight='bold')
+    for i, measure in enumerate(latency.MEASURES):
+        ax = fig.add_subplot(grid[0, i])
+        bins = latency_stats.sketches[measure].histogram()
+        ax.bar([start for start, _, _ in bins], [count for _, _, count in bins],
+               width=[end - start for start, end, _ in bins], align='edge', color='#3498db', alpha=0.8)
+        ax.set_title(measure, fontweight='bold')
+        ax.set_xlabel('Seconds')
+        ax.set_ylabel('Matches')
+        ax.grid(True, alpha=0.3)
+
+    rows = latency_stats.rows()
+    header = list(rows[0])
+    table_ax = fig.add_subplot(grid[1, :])
+    table_ax.axis('off')
+    table = table_ax.table(cellText=[["" if row[key] is None else str(row[key]) for key in header] for row in rows],
+                           colLabels=header, cellLoc='center', loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1, 1.8)
+    for i in range(len(header)):
+        table[(0, i)].set_facecolor('#4472C4')
+        table[(0, i)].set_text_props(weight='bold', color='white')
+
+    plt.tight_layout()
+    pdf.savefig(fig, bbox_inches='tight', dpi=150)
+    plt.close(fig)
+
+
+def summary_stats(all_matches, params):
+    """Class results next to the theory, as one flat dict."""
+    completed = [match for match in all_matches.values() if match.is_complete]
+    guilty = [match for match in completed if match.guilt == Guilt.GUILTY]
+    stingy = [match for match in completed if match.offer == Offer.STINGY]
+    results = [match.result(params.table()) for match in completed]
+    theory = equilibrium.solve(params)
+
+    def share(part, whole):
+        return len(part) / len(whole) if whole else None
+
+    decision_times = {}
+    for row in latency.from_matches(all_matches).rows():
+        decision_times.update({f"{row['Measure']}: median (s)": row["Median (s)"],
+                               f"{row['Measure']}: p90 (s)": row["p90 (s)"],
+                               f"{row['Measure']}: timed out": row["Timed out"]})
+
+    return {
+        "Matches": len(all_matches),
+        "Completed": len(completed),
+        "Guilt prior": params.guilt_prior,
+        "Outcome counts": dict(zip((equilibrium.outcome_key(o) for o in equilibrium.OUTCOMES),
+                                   outcome_counts(completed))),
+        "Guilty choose Stingy": share([m for m in guilty if m.offer == Offer.STINGY], guilty),
+        "AT&T accept Stingy": share([m for m in stingy if m.response == Response.ACCEPT], stingy),
+        "P(Guilty | Stingy)": share([m for m in stingy if m.guilt == Guilt.GUILTY], stingy),
+        "Mean eBay payoff": sum(r.ebay_payoff for r in results) / len(results) if results else None,
+        "Mean AT&T payoff": sum(r.att_payoff for r in results) / len(results) if results else None,
+        "Theory": theory.kind,
+        "Theory: Guilty choose Stingy": theory.guilty_stingy,
+        "Theory: AT&T accept Stingy": theory.accept_stingy,
+        "Theory: P(Guilty | Stingy)": theory.posterior,
+        **decision_times,
+    }
+
+
+def sessions_from_events(events, params, prefix="session"):
+    """One ``Session`` per game in an event log (a ``reset`` ends each game)."""
+    sessions = []
+    for events_in_game in game_events.split_games(events):
+        state = game_events.fold_events(dict(events_in_game))
+        if not state["matches"]:
+            continue
+        started = datetime.fromtimestamp(events_in_game[0][1]["ts"]).strftime("%Y%m%d-%H%M%S")
+        sessions.append(Session(f"{prefix}-{started}", parse_matches(state["matches"]), params, len(state["players"])))
+    return sessions
+
+
+def sessions_from_snapshot(raw, prefix="session"):
+    """Sessions in a JSON export: a database snapshot or an event log."""
+    if isinstance(raw, dict) and game_events.EVENTS_PATH in raw:
+        # A whole-database export: its event log has every game, not just the current one
+        return sessions_from_events(raw[game_events.EVENTS_PATH],
+                                    equilibrium.GameParameters.from_wire(raw.get(equilibrium.PARAMETERS_PATH)), prefix)
+    if isinstance(raw, dict) and "lawsuit_matches" in raw:
+        return [Session(prefix, parse_matches(raw.get("lawsuit_matches")),
+                        equilibrium.GameParameters.from_wire(raw.get(equilibrium.PARAMETERS_PATH)),
+                        len(raw.get("lawsuit_players") or {}))]
+    return sessions_from_events(raw, equilibrium.GameParameters(), prefix)
+
+
+def load_file(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        raw = json.load(f)
+    prefix = os.path.basename(path).split(".")[0]
+    return sessions_from_snapshot(raw, prefix)
+
+
+def load_firebase(credentials_path, database_url):
+    """Every game in the live database's event log."""
+    import firebase_admin
+    from firebase_admin import credentials, db
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path), {"databaseURL": database_url})
+    params = equilibrium.load_parameters(db)
+    return sessions_from_events(game_events.load_events(db), params, "firebase")
+
+
+def write_session(session, out_dir, formats=FORMATS):
+    """Write one session's reports; returns its summary row (runs in a worker process)."""
+    matplotlib.use("Agg")
+    summary = {"Session": session.name, "Players": session.players, **summary_stats(session.matches, session.params)}
+    base = os.path.join(out_dir, session.name)
+
+    if "pdf" in formats:
+        with open(f"{base}.pdf", "wb") as f:
+            f.write(pdf_report(session.matches, session.params))
+    results = pd.DataFrame(match_results(session.matches, session.params.table()))
+    if "csv" in formats:
+        results.to_csv(f"{base}.csv", index=False)
+        pd.DataFrame(latency.from_matches(session.matches).histogram_rows()).to_csv(f"{base}-latency.csv", index=False)
+    if "parquet" in formats:
+        try:
+            results.to_parquet(f"{base}.parquet", index=False)
+        except ImportError:
+            summary["Warning"] = "Parquet skipped (install pyarrow)"
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def write_reports(sessions, out_dir, formats=FORMATS, workers=None):
+    """Render every session in parallel and write ``summary.csv``; returns the summary rows."""
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(write_session, sessions, [out_dir] * len(sessions), [formats] * len(sessions)))
+    summary = pd.DataFrame(rows)
+    if "Outcome counts" in summary:
+        summary = summary.drop(columns="Outcome counts").join(pd.DataFrame(list(summary["Outcome counts"])))
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="*", help="JSON exports or archived event logs (.json / .json.gz)")
+    parser.add_argument("--firebase-credentials", help="service account key file, to read the live database")
+    parser.add_argument("--database-url", help="Firebase Realtime Database URL")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    sessions = []
+    for path in args.sources:
+        sessions.extend(load_file(path))
+    if args.firebase_credentials:
+        if not args.database_url:
+            parser.error("--database-url is required with --firebase-credentials")
+        sessions.extend(load_firebase(args.firebase_credentials, args.database_url))
+    if not sessions:
+        parser.error("no sessions with matches found")
+
+    seen = {}
+    for session in sessions:
+        # Games started in the same second (or the same export passed twice) need distinct files
+        seen[session.name] = seen.get(session.name, 0) + 1
+        if seen[session.name] > 1:
+            session.name = f"{session.name}-{seen[session.name]}"
+
+    rows = write_reports(sessions, args.out, args.format, args.workers)
+    for row in rows:
+        print(f"{row['Session']}: {row['Completed']} completed matches"
+              + (f" - {row['Warning']}" if "Warning" in row else ""))
+    print(f"Wrote {len(rows)} session report(s) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Per-screen rerun budgets for ``streamlit_app.py``, checked headlessly.
+
+    python rerun_budgets.py
+    python rerun_budgets.py --players 6 200 --chart-backend matplotlib
+
+Seeds synthetic classes of each size into in-process ``memory_db``
+databases (the app's ``database_url`` secret set to ``memory://...``) and
+drives the app with Streamlit's ``AppTest`` through every screen: waiting
+room, eBay move, AT&T move, Step 5 results, Step 6 summary and the admin
+panel while the game is live and once it has finished. Each screen is
+loaded once to warm up the session, then rerun once more, and that rerun is
+measured against ``BUDGETS``:
+
+* database round trips and bytes read (from ``MemoryDatabase.stats``),
+* wall time, not counting the app's own pauses before an automatic rerun
+  (``time.sleep`` in the script thread returns at once and ``st.rerun``
+  ends the run),
+* matplotlib figures created.
+
+Exits non-zero if any budget is exceeded, so a new read on one of the
+inline read paths shows up as a failed line here. ``tests/test_rerun_budgets.py``
+runs the same checks for every default class size and both chart backends.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import matplotlib.figure
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+import charts
+import cohort
+import game_events
+import memory_db
+import outcome_tally
+import presence
+from game_records import Guilt, Offer, Player, Response, completion_fields, offer_fields, parse_matches, parse_players
+
+APP = "streamlit_app.py"
+ADMIN_PASSWORD = "admin123"
+DEFAULT_SIZES = [6, 60, 600]  # the last one runs in large-cohort mode
+
+
+SECONDS_PER_FIGURE = 0.5  # extra wall time allowed per matplotlib figure drawn
+
+
+@dataclass(frozen=True, slots=True)
+class Budget:
+    round_trips: int
+    bytes_fixed: int  # bytes read regardless of class size...
+    bytes_per_player: int = 0  # ...plus this much per player
+    seconds: float = 1.0  # plus SECONDS_PER_FIGURE for each figure drawn
+    figures: int = 0  # matplotlib figures (with the matplotlib chart backend)
+
+    def max_bytes(self, players):
+        return self.bytes_fixed + self.bytes_per_player * players
+
+    def max_seconds(self, figures):
+        return self.seconds + SECONDS_PER_FIGURE * figures
+
+
+# Measured with 6, 60 and 600 players plus headroom; a new full read on a student screen
+# or on an admin refresh between sweeps goes over
+BUDGETS = {
+    "waiting room": Budget(round_trips=8, bytes_fixed=1_000),
+    "eBay move": Budget(round_trips=10, bytes_fixed=2_000),
+    "AT&T move": Budget(round_trips=10, bytes_fixed=2_000),
+    "Step 5": Budget(round_trips=8, bytes_fixed=1_000),
+    "Step 6": Budget(round_trips=8, bytes_fixed=1_000, figures=8),
+    "admin live": Budget(round_trips=14, bytes_fixed=8_000, seconds=1.5, figures=6),
+    "admin finished": Budget(round_trips=14, bytes_fixed=8_000, seconds=1.5, figures=10),
+}
+
+
+class Meter:
+    """What one rerun costs: pauses skipped, reruns turned into stops, figures counted."""
+
+    def __init__(self):
+        self.figures = 0
+
+    def install(self):
+        meter = self
+        real_sleep = time.sleep
+        real_init = matplotlib.figure.Figure.__init__
+
+        def sleep(seconds):
+            # The app pausing before its next automatic rerun returns at once
+            if not threading.current_thread().name.startswith("ScriptRunner"):
+                real_sleep(seconds)
+
+        def figure_init(self, *args, **kwargs):
+            meter.figures += 1
+            real_init(self, *args, **kwargs)
+
+        time.sleep = sleep
+        matplotlib.figure.Figure.__init__ = figure_init
+        streamlit.rerun = lambda *args, **kwargs: streamlit.stop()
+
+    def reset(self):
+        self.figures = 0
+
+
+def register(database, names, now):
+    """Join ``names`` with fresh heartbeats, so no sweep reaps them mid-measurement."""
+    updates = {}
+    for i, name in enumerate(names):
+        updates.update(cohort.registration_update(Player(name, now + i * 0.001)))
+        updates[f"{presence.PRESENCE_PATH}/{name}"] = time.time()
+    database.reference("/").update(updates)
+    for name in names:
+        cohort.count_registration(database, name)
+
+
+def seed_waiting(database, players):
+    """Everyone but one has joined."""
+    database.reference("lawsuit_expected_players").set(players)
+    register(database, [f"student{i:04d}" for i in range(players - 1)], time.time() - 30)
+
+
+def seed_class(database, players, offered, completed):
+    """A paired class whose first ``offered`` matches have an offer and first ``completed`` a response."""
+    names = [f"student{i:04d}" for i in range(players)]
+    now = time.time() - 30
+    database.reference("lawsuit_expected_players").set(players)
+    register(database, names, now)
+    cohort.claim_pairing(database, names[0])
+    cohort.pair_all(database, parse_players(database.reference("lawsuit_players").get()), players)
+
+    matches = sorted(parse_matches(database.reference("lawsuit_matches").get()).values(), key=lambda m: m.match_id)
+    updates = {}
+    offers = {}
+    for i, match in enumerate(matches[:offered]):
+        # Only guilty eBay players may offer Generous
+        offer = offers[match.match_id] = Offer.GENEROUS if match.guilt == Guilt.GUILTY and i % 3 == 0 else Offer.STINGY
+        fields = offer_fields(offer, now + 10)
+        updates.update({f"lawsuit_matches/{match.match_id}/{key}": value for key, value in fields.items()})
+        updates.update(game_events.event_update(game_events.OFFER, match_id=match.match_id, player=match.ebay_player,
+                                                offer=offer.name.title(), ts=now + 10))
+    database.reference("/").update(updates)
+    for i, match in enumerate(matches[:completed]):
+        offer = offers[match.match_id]
+        response = Response.REJECT if i % 2 and offer == Offer.STINGY else Response.ACCEPT
+        fields = completion_fields(replace(match, offer=offer), response, now + 20)
+        database.reference("/").update({
+            **{f"lawsuit_matches/{match.match_id}/{key}": value for key, value in fields.items()},
+            **game_events.event_update(game_events.RESPONSE, match_id=match.match_id, player=match.att_player,
+                                       response=response.name.title(), ebay_payoff=fields["pe"],
+                                       att_payoff=fields["pa"], ts=now + 20)})
+    # Counters from the stored matches (offers are the ones just written)
+    outcome_tally.rebuild(database, parse_matches(database.reference("lawsuit_matches").get()))
+    return parse_matches(database.reference("lawsuit_matches").get())
+
+
+def open_screen(url, chart_backend, name=None):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["firebase_key"] = "{}"
+    at.secrets["database_url"] = url
+    at.secrets["chart_backend"] = chart_backend
+    at.run()
+    if name is None:
+        at.text_input[0].input(ADMIN_PASSWORD).run()
+    else:
+        at.text_input[1].input(name).run()
+    if at.exception:
+        raise RuntimeError(f"{url} as {name or 'admin'}: {at.exception[0].value}")
+    return at
+
+
+def shows(at, text):
+    elements = [*at.header, *at.subheader, *at.info]
+    return any(text in element.value for element in elements)
+
+
+def measure(url, meter, chart_backend, name=None):
+    """Cost of one warm rerun of the screen ``name`` (None = admin) sees."""
+    at = open_screen(url, chart_backend, name)
+    database = memory_db.connect(url)
+    database.reset_stats()
+    meter.reset()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{url} as {name or 'admin'}: {at.exception[0].value}")
+    stats = dict(database.stats)
+    round_trips = sum(stats.get(op, 0) for op in ("get", "query", "set", "update", "transaction", "delete", "push"))
+    return at, {"round_trips": round_trips, "bytes": stats.get("bytes_read", 0), "seconds": elapsed,
+                "figures": meter.figures}
+
+
+def screens(players, tag):
+    """(screen, database url, player name or None for admin, text the screen must show) for one class size."""
+    waiting = f"memory://{tag}-{players}-waiting"
+    live = f"memory://{tag}-{players}-live"
+    finished = f"memory://{tag}-{players}-finished"
+
+    seed_waiting(memory_db.connect(waiting), players)
+    n_matches = players // 2
+    live_matches = seed_class(memory_db.connect(live), players, offered=n_matches * 2 // 3,
+                              completed=n_matches // 3)
+    finished_matches = seed_class(memory_db.connect(finished), players, offered=n_matches, completed=n_matches)
+
+    unoffered = next(m for m in live_matches.values() if m.offer is None)
+    offered = next(m for m in live_matches.values() if m.offer is not None and m.response is None)
+    done = next(m for m in live_matches.values() if m.is_complete)
+    return [
+        ("waiting room", waiting, "student0000", "Waiting for more players"),
+        ("eBay move", live, unoffered.ebay_player, "Step 3: eBay's Move"),
+        ("AT&T move", live, offered.att_player, "Step 4: AT&T's Response"),
+        ("Step 5", live, done.ebay_player, "Step 5: Results"),
+        ("Step 6", finished, next(iter(finished_matches.values())).att_player, "Step 6: Summary Analysis"),
+        ("admin live", live, None, "Live Game Statistics"),
+        ("admin finished", finished, None, "Admin View: Summary Analysis"),
+    ]
+
+
+def run(sizes, chart_backend=charts.NATIVE):
+    meter = Meter()
+    meter.install()
+    results = []
+    for players in sizes:
+        for screen, url, name, marker in screens(players, f"budgets-{chart_backend}"):
+            budget = BUDGETS[screen]
+            at, cost = measure(url, meter, chart_backend, name)
+            max_bytes = budget.max_bytes(players)
+            problems = []
+            if not shows(at, marker):
+                problems.append(f"did not reach the screen ({marker!r})")
+            if cost["round_trips"] > budget.round_trips:
+                problems.append(f"round trips > {budget.round_trips}")
+            if cost["bytes"] > max_bytes:
+                problems.append(f"bytes > {max_bytes:,}")
+            max_seconds = budget.max_seconds(cost["figures"])
+            if cost["seconds"] > max_seconds:
+                problems.append(f"time > {max_seconds:.1f} s")
+            if cost["figures"] > budget.figures:
+                problems.append(f"figures > {budget.figures}")
+            results.append((f"{screen} ({players} players)", not problems,
+                            f"{cost['round_trips']} round trips, {cost['bytes']:,} bytes, {cost['seconds']:.2f} s, "
+                            f"{cost['figures']} figures" + (f" - {'; '.join(problems)}" if problems else "")))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--chart-backend", choices=charts.BACKENDS, default=charts.NATIVE)
+    args = parser.parse_args(argv)
+    # The app's deprecation notices (once per element) and seeding outside a script run
+    for name in ("streamlit.deprecation_util", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).disabled = True
+
+    results = run(args.players, args.chart_backend)
+    for label, ok, detail in results:
+        print(f"{'PASS' if ok else 'FAIL'}  {label:<32} {detail}")
+    return 0 if all(ok for _, ok, _ in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Multi-round sessions with a precomputed rematching schedule.
+
+With ``rounds`` > 1 (set by the admin under ``lawsuit_rounds``) every
+player plays several matches, each against a new partner. Nothing is
+matched per round. Once the class is full, the client that wins the
+``lawsuit_pairing`` claim (see ``cohort.claim_pairing``) assigns roles and
+writes every round's matches in batched multi-path updates:
+
+* Round r pairs eBay player i with AT&T player (i + r) mod n (a stranger
+  design), so nobody meets the same partner twice until the rounds
+  outnumber the pairs.
+* With ``swap_roles``, the two groups swap roles on every other round.
+* Nature draws guilt afresh for every match after the first round.
+
+Each player node gets its schedule ("s": {"r1": match id, ...}) and
+"m" pointing at its current match. Moving on to the next round only
+re-points "m" and logs an ``advanced`` event. Later-round matches are
+created without a start time; the first partner to get there stamps it,
+and it never moves after that, so the decision times and deadlines count
+from then and an offer never predates its match's start.
+
+``RoundStats`` folds the event log into per-round aggregates, so the
+learning curves update from each new event and never rescan the matches.
+"""
+import random
+import time
+from collections import Counter
+
+import cohort
+import game_events
+from equilibrium import DEFAULT_PRIOR
+from game_records import Guilt, Match, Offer, Response, Role, parse_code, schedule_wire
+
+ROUNDS_PATH = "lawsuit_rounds"
+MAX_ROUNDS = 10
+DEFAULT_SETTINGS = {"rounds": 1, "swap_roles": False}
+
+
+def load_settings(database):
+    raw = database.reference(ROUNDS_PATH).get()
+    return {**DEFAULT_SETTINGS, **(raw if isinstance(raw, dict) else {})}
+
+
+def is_multi_round(settings):
+    return settings["rounds"] > 1
+
+
+def expected_matches(expected_players, settings):
+    return expected_players // 2 * settings["rounds"]
+
+
+def round_match_id(ebay_player, att_player, round_no):
+    return f"{ebay_player}_vs_{att_player}_r{round_no}"
+
+
+def build_schedule(ebay_players, att_players, rounds, swap_roles=False):
+    """Pairings per round as lists of (eBay name, AT&T name)."""
+    pairs = min(len(ebay_players), len(att_players))
+    schedule = []
+    for r in range(rounds):
+        pairings = []
+        for i in range(pairs):
+            ebay, att = ebay_players[i], att_players[(i + r) % pairs]
+            pairings.append((att, ebay) if swap_roles and r % 2 == 1 else (ebay, att))
+        schedule.append(pairings)
+    return schedule
+
+
+def schedule_all(database, players, expected_players, settings, rng=random, guilt_prior=DEFAULT_PRIOR):
+    """Assign roles and write every round's matches for the whole class.
+
+    ``players`` is a parsed {name: Player} snapshot. Matches are written
+    ``cohort.PAIRING_BATCH_SIZE`` at a time; returns the number created.
+    """
+    roster = cohort.class_roster(players, expected_players)
+    updates = cohort.assign_roles(roster, expected_players, rng, guilt_prior)
+    by_name = {player.name: player for player in roster}
+
+    ebay_names = [p.name for p in roster if p.role == Role.EBAY]
+    att_names = [p.name for p in roster if p.role == Role.ATT]
+    schedules = {name: [] for name in ebay_names + att_names}
+
+    now = time.time()
+    created = 0
+    for r, pairings in enumerate(build_schedule(ebay_names, att_names, settings["rounds"], settings["swap_roles"])):
+        for ebay, att in pairings:
+            if r == 0:
+                guilt = by_name[ebay].guilt  # the round-1 draw made with the role
+            else:
+                guilt = Guilt.GUILTY if rng.random() < guilt_prior else Guilt.INNOCENT
+            match = Match(round_match_id(ebay, att, r + 1), ebay, att, guilt, now if r == 0 else None,
+                          round_no=r + 1)
+            updates.update(cohort.match_update(match))
+            schedules[ebay].append(match.match_id)
+            schedules[att].append(match.match_id)
+            created += 1
+            if created % cohort.PAIRING_BATCH_SIZE == 0:
+                database.reference("/").update(updates)
+                updates = {}
+
+    for name, schedule in schedules.items():
+        if schedule:
+            updates[f"lawsuit_players/{name}/s"] = schedule_wire(schedule)
+    updates[cohort.PAIRING_PATH] = {"done": True, "t": now, "matches": created}
+    database.reference("/").update(updates)
+    return created
+
+
+def advance_update(name, match_id, round_no, now=None):
+    """Multi-path update moving ``name`` on to their match for ``round_no`` (the start is stamped by ``advance``)."""
+    now = time.time() if now is None else now
+    return {
+        f"lawsuit_players/{name}/m": match_id,
+        **game_events.event_update(game_events.ADVANCED, player=name, match_id=match_id, round=round_no, ts=now),
+    }
+
+
+def advance(database, names, match_id, round_no, now=None):
+    """Move ``names`` on to their match for ``round_no`` and stamp its start if nobody has yet.
+
+    The start is the earliest arrival, kept in a transaction, so whichever
+    order the partners' writes land in it matches the folded log.
+    """
+    now = time.time() if now is None else now
+    updates = {}
+    for name in names:
+        updates.update(advance_update(name, match_id, round_no, now))
+    database.reference("/").update(updates)
+    database.reference(f"lawsuit_matches/{match_id}/t").transaction(
+        lambda current: now if current is None else min(current, now))
+
+
+class RoundStats(game_events.FoldingHandler):
+    """Per-round outcome counts, updated one event at a time."""
+
+    def __init__(self):
+        self.rounds = {}  # round -> Counter
+        self._matches = {}  # match id -> [round, guilt, offer]
+
+    def apply(self, event):
+        kind = event.get("kind")
+        if kind == game_events.MATCHED:
+            self._matches[event["match_id"]] = [event.get("round") or 1,
+                                                parse_code(Guilt, event.get("ebay_guilt")), None]
+        elif kind == game_events.OFFER and event.get("match_id") in self._matches:
+            self._matches[event["match_id"]][2] = parse_code(Offer, event["offer"])
+        elif kind == game_events.RESPONSE and event.get("match_id") in self._matches:
+            # Count a match once it is complete, so matches removed unfinished never show up
+            round_no, guilt, offer = self._matches[event["match_id"]]
+            counts = self.rounds.setdefault(round_no, Counter())
+            counts["completed"] += 1
+            if guilt == Guilt.GUILTY:
+                counts["guilty"] += 1
+                counts["guilty_stingy"] += offer == Offer.STINGY
+            if offer == Offer.STINGY:
+                counts["stingy"] += 1
+                counts["stingy_accepted"] += parse_code(Response, event["response"]) == Response.ACCEPT
+        elif kind == game_events.RESET:
+            self.rounds.clear()
+            self._matches.clear()
+
+    def rows(self):
+        """Learning-curve rows, one per round that has completed matches."""
+        rows = []
+        for round_no in sorted(self.rounds):
+            counts = self.rounds[round_no]
+            rows.append({
+                "Round": round_no,
+                "Completed": counts["completed"],
+                "Guilty choose Stingy (%)": counts["guilty_stingy"] / counts["guilty"] * 100 if counts["guilty"] else None,
+                "AT&T accept Stingy (%)": counts["stingy_accepted"] / counts["stingy"] * 100 if counts["stingy"] else None,
+            })
+        return rows
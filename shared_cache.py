@@ -0,0 +1,167 @@
+"""Optional cache shared by every app replica (Redis or a local stand-in).
+
+When a large lecture is served by several Streamlit processes behind a
+load balancer, each process would otherwise poll Firebase for the same
+configuration, counters and snapshots, and re-render the same charts and
+PDFs. Setting the ``cache_url`` secret puts one shared tier in front of
+those reads:
+
+* ``redis://host:6379/0`` uses a Redis server (needs the ``redis``
+  package);
+* ``local://`` uses ``LocalRedis``, an in-process stand-in with the same
+  commands, for single-process runs, scripts and the load test.
+
+Entries are keyed by the game version: the key of the newest event in
+``lawsuit_events`` plus a generation counter that ``bump`` increments for
+writes that don't log an event (settings, the outcome counters). Nothing
+is ever deleted to invalidate; a new version simply misses, and old
+entries expire. The version itself is re-read from Firebase at most once
+per ``VERSION_TTL`` by all replicas together, so adding replicas adds
+sessions, not database load.
+
+Values are pickled, so anything the app computes (parsed records, PDF or
+PNG bytes) can be stored. Without ``cache_url``, ``SharedCache(None)``
+simply calls through.
+"""
+import pickle
+import threading
+import time
+
+import game_events
+
+PREFIX = "lawsuit"
+VERSION_TTL = 1.0  # seconds a cached newest-event key is trusted
+ENTRY_TTL = 300  # seconds an entry outlives its version
+LOCK_TTL = 10  # seconds one replica may hold a recompute lock
+LOCK_WAIT = 2.0  # seconds other replicas wait for it before computing themselves
+
+
+class LocalRedis:
+    """In-process stand-in for the few Redis commands ``SharedCache`` uses."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires at or None)
+        self._lock = threading.Lock()
+        self.stats = {"get": 0, "set": 0, "hits": 0}
+
+    def _live(self, key):
+        value, expires = self._data.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            self.stats["get"] += 1
+            value = self._live(key)
+            self.stats["hits"] += value is not None
+            return value
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self.stats["set"] += 1
+            self._data[key] = (value if isinstance(value, bytes) else str(value).encode(),
+                               time.time() + ex if ex else None)
+            return True
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+class SharedCache:
+    def __init__(self, client, prefix=PREFIX, version_ttl=VERSION_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.version_ttl = version_ttl
+
+    @property
+    def enabled(self):
+        return self.client is not None
+
+    def _key(self, *parts):
+        return ":".join((self.prefix, *map(str, parts)))
+
+    def version(self, database):
+        """Current game version, or None without a cache (nothing to key on)."""
+        if self.client is None:
+            return None
+        try:
+            generation, newest = self.client.mget([self._key("generation"), self._key("newest_event")])
+            if newest is None:
+                latest = database.reference(game_events.EVENTS_PATH).order_by_key().limit_to_last(1).get() or {}
+                newest = (next(iter(latest), None) or "-").encode()
+                self.client.set(self._key("newest_event"), newest, ex=self.version_ttl)
+        except Exception:  # cache down: read straight from the database
+            return None
+        return f"{int(generation or 0)}.{newest.decode()}"
+
+    def bump(self):
+        """Invalidate everything after a write that logs no event."""
+        if self.client is not None:
+            self.client.incr(self._key("generation"))
+            self.client.delete(self._key("newest_event"))
+
+    def get_or_compute(self, name, version, compute, ttl=ENTRY_TTL):
+        """``compute()`` once per ``version`` across all replicas; later callers get the stored value.
+
+        One replica recomputes a missing entry while the others wait up to
+        ``LOCK_WAIT`` for it. If the cache fails, the value is just computed.
+        """
+        if self.client is None or version is None:
+            return compute()
+        key = self._key(name, version)
+        try:
+            raw = self.client.get(key)
+            if raw is None and not self.client.set(self._key("lock", name, version), b"1", ex=LOCK_TTL, nx=True):
+                deadline = time.time() + LOCK_WAIT
+                while raw is None and time.time() < deadline:
+                    time.sleep(0.05)
+                    raw = self.client.get(key)
+            if raw is not None:
+                return pickle.loads(raw)
+        except Exception:  # cache down or entry unreadable: fall back to the database
+            return compute()
+
+        value = compute()
+        try:
+            self.client.set(key, pickle.dumps(value), ex=ttl)
+        except Exception:
+            pass
+        return value
+
+
+_local = LocalRedis()
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def connect(url):
+    """Process-wide ``SharedCache`` for ``url`` (see the module docstring); calls through if unset."""
+    with _caches_lock:
+        if url not in _caches:
+            if not url:
+                client = None
+            elif url.startswith("local://"):
+                client = _local
+            else:
+                try:
+                    import redis
+                except ImportError:  # optional dependency
+                    client = None
+                else:
+                    client = redis.Redis.from_url(url, socket_timeout=0.5)
+            _caches[url] = SharedCache(client)
+        return _caches[url]
@@ -0,0 +1,112 @@
+"""Checkpoint and restore of the whole game state as a local snapshot file.
+
+A snapshot holds every path that makes up a game (``GAME_PATHS``): players,
+matches, expected count, registration counters, pairing claim, outcome
+counters, the event log and the admin's settings (deadlines, parameters,
+rounds and bots). ``checkpoint`` reads them concurrently, one read per
+path. ``restore`` writes them back in a single multi-path update, which
+replaces each path whole and deletes the ones the snapshot does not have.
+Both touch each node once, so they take time linear in the size of the
+game. The update is atomic, so clients see the old game or the restored
+one, never a mix.
+
+Files are the records in their compact wire form as gzipped JSON:
+
+    {"version": 1, "taken_at": 1718000000.0, "paths": {"lawsuit_players": {...}, ...}}
+
+Presence is not saved. Restoring gives every restored player a fresh
+heartbeat, so a sweep does not reap them before they reconnect. It also
+starts a new game id (``game_events.GAME_PATH``), so open sessions drop
+what they remembered about the previous game, and points event consumers
+at the restored game's part of the log (``game_events.GAME_START_PATH``).
+Decision deadlines still count from the recorded move times.
+"""
+import gzip
+import json
+import time
+
+import bots
+import cohort
+import deadlines
+import equilibrium
+import game_events
+import outcome_tally
+import presence
+import rounds
+from concurrent_reads import fetch_all
+
+FORMAT_VERSION = 1
+GAME_PATHS = [
+    "lawsuit_players",
+    "lawsuit_matches",
+    "lawsuit_expected_players",
+    cohort.REGISTRATION_PATH,
+    cohort.PAIRING_PATH,
+    outcome_tally.OUTCOMES_PATH,
+    outcome_tally.COUNTED_PATH,
+    game_events.EVENTS_PATH,
+    deadlines.DEADLINES_PATH,
+    equilibrium.PARAMETERS_PATH,
+    rounds.ROUNDS_PATH,
+    bots.BOTS_PATH,
+]
+
+
+def checkpoint(database, now=None):
+    """Snapshot of the current game as a dict (see ``dumps`` to store it)."""
+    values = fetch_all(database, *GAME_PATHS)
+    return {
+        "version": FORMAT_VERSION,
+        "taken_at": time.time() if now is None else now,
+        "paths": {path: value for path, value in zip(GAME_PATHS, values) if value is not None},
+    }
+
+
+def restore_update(snapshot, now=None):
+    """Multi-path update that replaces the current game with ``snapshot``."""
+    now = time.time() if now is None else now
+    paths = snapshot["paths"]
+    updates = {path: paths.get(path) for path in GAME_PATHS}
+    updates[presence.PRESENCE_PATH] = {name: now for name in paths.get("lawsuit_players") or {}} or None
+    updates[game_events.GAME_PATH] = game_events.new_event_id(now)
+    updates[game_events.GAME_START_PATH] = game_events.last_reset_key(paths.get(game_events.EVENTS_PATH))
+    return updates
+
+
+def restore(database, snapshot, now=None):
+    """Replace the current game with ``snapshot`` in one write; returns its ``summary``."""
+    database.reference("/").update(restore_update(snapshot, now))
+    return summary(snapshot)
+
+
+def summary(snapshot):
+    """Counts to show before and after a restore."""
+    paths = snapshot["paths"]
+    return {
+        "taken_at": snapshot.get("taken_at"),
+        "players": len(paths.get("lawsuit_players") or {}),
+        "matches": len(paths.get("lawsuit_matches") or {}),
+        "expected_players": paths.get("lawsuit_expected_players") or 0,
+        "events": len(paths.get(game_events.EVENTS_PATH) or {}),
+    }
+
+
+def dumps(snapshot):
+    return gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode())
+
+
+def loads(data):
+    """Snapshot from file bytes; raises ValueError if they are not a snapshot this version can read."""
+    try:
+        snapshot = json.loads(gzip.decompress(data))
+    except (OSError, EOFError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"not a game snapshot: {e}") from e
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get("paths"), dict):
+        raise ValueError("not a game snapshot")
+    if snapshot.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot version {snapshot.get('version')!r}")
+    unknown = set(snapshot["paths"]) - set(GAME_PATHS)
+    if unknown:
+        raise ValueError(f"unexpected paths in snapshot: {', '.join(sorted(unknown))}")
+    return snapshot
+
@@ -4,9 +4,35 @@ from firebase_admin import credentials, db
 import json
 import time
 import random
+import uuid
 import pandas as pd
 import matplotlib.pyplot as plt
+from dataclasses import replace
 from datetime import datetime
+import admission
+import bots
+import charts
+import class_stats
+import cohort
+import deadlines
+import equilibrium
+import faulty_db
+import game_events
+import latency
+import memory_db
+import outcome_tally
+import presence
+import reports
+import rounds
+import shared_cache
+import simulation
+import snapshots
+from activity import STATUSES, ActivityTable
+from concurrent_reads import fetch_all, gather
+from write_batch import WriteBatch
+from write_behind import queue_for
+from game_records import (Guilt, Match, Offer, Player, Response, Role, label, migrate, parse_code, parse_match,
+                          parse_matches, parse_player, parse_players)
 
 st.set_page_config(page_title="⚖️ eBay vs AT&T Classroom Game")
 
@@ -17,19 +43,34 @@ try:
     firebase_key = st.secrets["firebase_key"]
     database_url = st.secrets["database_url"]
     
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(json.loads(firebase_key))
-        firebase_admin.initialize_app(cred, {
-            'databaseURL': database_url
-        })
+    if database_url.startswith("memory://"):
+        # In-process stand-in, nothing is saved (scripted runs such as rerun_budgets.py)
+        database = memory_db.connect(database_url)
+    else:
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(json.loads(firebase_key))
+            firebase_admin.initialize_app(cred, {
+                'databaseURL': database_url
+            })
+        database = db
 except KeyError:
     st.error("🔥 Firebase secrets not configured.")
     st.stop()
 
-# Enhanced chart function
-def plot_enhanced_percentage_bar(choices, labels, title, player_type):
-    if len(choices) > 0:
-        counts = pd.Series(choices).value_counts(normalize=True).reindex(labels, fill_value=0) * 100
+# Rehearse a class against a slow or failing network; see faulty_db.py
+if st.secrets.get("fault_injection"):
+    database = faulty_db.wrap(database, st.secrets["fault_injection"])
+
+# Enhanced chart function, from {label: count} (native charts only need the percentages; see charts.py)
+def plot_enhanced_percentage_bar(choice_counts, labels, title, player_type):
+    total = sum(choice_counts.get(label, 0) for label in labels)
+    if total > 0 and charts.backend() == charts.NATIVE:
+        colors_scheme = ['#e74c3c', '#3498db'] if player_type == "eBay" else ['#3498db', '#e74c3c']
+        charts.show_percentage_bar(labels, [choice_counts.get(label, 0) / total * 100 for label in labels],
+                                   colors_scheme, title, subtitle=charts.generated_note(total),
+                                   chart_backend=charts.NATIVE)
+    elif total > 0:
+        counts = pd.Series([choice_counts.get(label, 0) for label in labels], index=labels) / total * 100
         
         # Create figure with enhanced styling
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -59,7 +100,7 @@ def plot_enhanced_percentage_bar(choices, labels, title, player_type):
                    f'{height:.1f}%', ha='center', va='bottom', fontsize=12, fontweight='bold')
         
         # Add sample size info
-        ax.text(0.02, 0.98, f"Sample size: {len(choices)} participants", 
+        ax.text(0.02, 0.98, f"Sample size: {total} participants", 
                transform=ax.transAxes, fontsize=10, verticalalignment='top', alpha=0.7,
                bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8))
         
@@ -70,154 +111,209 @@ def plot_enhanced_percentage_bar(choices, labels, title, player_type):
         
         plt.tight_layout()
         st.pyplot(fig)
+        plt.close(fig)
     else:
         st.warning(f"⚠ No data available for {title}")
 
-# PDF generation function for admin
-def create_pdf_report():
-    """Create a comprehensive PDF report using matplotlib figures"""
-    from matplotlib.backends.backend_pdf import PdfPages
-    import tempfile
+# Class metrics with exact/bootstrap intervals and a test against the theory
+def show_class_stats(game_params, tally):
+    def interval(bounds):
+        return f"{bounds[0]:.0%} - {bounds[1]:.0%}" if bounds[0] is not None else "N/A"
     
-    # Create temporary PDF file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+    rows = class_stats.class_report(tally.counts, game_params)  # cached per outcome counts
+    st.markdown("**📐 How sure can we be?**")
+    st.dataframe(pd.DataFrame([{
+        "Metric": row["Metric"],
+        "Your Class": f"{row['Class']:.1%}" if row["Class"] is not None else "N/A",
+        "Theory": f"{row['Theory']:.1%}",
+        "Sample": row["n"],
+        "95% Exact CI": interval(row["Exact CI"]),
+        "95% Bootstrap CI": interval(row["Bootstrap CI"]),
+        "p-value": f"{row['p-value']:.3f}" if row["p-value"] is not None else "",
+        "Verdict": row["Verdict"],
+    } for row in rows]), use_container_width=True, hide_index=True)
+
+# Where a class of this size lands by chance if everyone plays the theory (Monte Carlo)
+def show_simulated_range(game_params, tally):
+    n_matches = tally.completed
+    if n_matches <= 0:
+        return
+    sim = simulation.simulate_classes(game_params, n_matches, seed=0)
+    guilty_stingy_pct = tally.pooling / tally.guilty * 100 if tally.guilty else None
+    accept_stingy_pct = tally.stingy_accepted / tally.stingy * 100 if tally.stingy else None
     
-    with PdfPages(temp_file.name) as pdf:
-        # Get all completed matches
-        all_matches = db.reference("lawsuit_matches").get() or {}
-        results_data = []
-        
-        for match_id, match_data in all_matches.items():
-            if "ebay_response" in match_data and "att_response" in match_data:
-                guilt = match_data["ebay_guilt"]
-                offer = match_data["ebay_response"]
-                response = match_data["att_response"]
-                
-                # Calculate payoffs with correct values
-                if guilt == "Guilty":
-                    if offer == "Generous" and response == "Accept":
-                        ebay_payoff, att_payoff = -200, 200
-                    elif offer == "Stingy" and response == "Accept":
-                        ebay_payoff, att_payoff = -20, 20
-                    else:  # Stingy + Reject (Trial)
-                        ebay_payoff, att_payoff = -320, 300
-                else:  # Innocent
-                    if offer == "Generous" and response == "Accept":
-                        ebay_payoff, att_payoff = 0, 0  # Shouldn't happen
-                    elif offer == "Stingy" and response == "Accept":
-                        ebay_payoff, att_payoff = -20, 20
-                    else:  # Stingy + Reject (Trial)
-                        ebay_payoff, att_payoff = 0, -20
-                
-                results_data.append({
-                    "Match_ID": match_id,
-                    "eBay_Player": match_data["ebay_player"],
-                    "ATT_Player": match_data["att_player"],
-                    "eBay_Status": guilt,
-                    "Offer": offer,
-                    "Response": response,
-                    "eBay_Payoff": ebay_payoff,
-                    "ATT_Payoff": att_payoff
-                })
-        
-        if results_data:
-            # Create summary page
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-            fig.suptitle('AT&T vs eBay Lawsuit Game - Complete Results', fontsize=20, fontweight='bold')
-            
-            # Collect data for charts
-            ebay_offers = [r["Offer"] for r in results_data]
-            att_responses = [r["Response"] for r in results_data]
-            guilt_statuses = [r["eBay_Status"] for r in results_data]
-            
-            # Chart 1: eBay Offers
-            offer_counts = pd.Series(ebay_offers).value_counts(normalize=True) * 100
-            ax1.bar(offer_counts.index, offer_counts.values, color=['#e74c3c', '#3498db'], alpha=0.8)
-            ax1.set_title('eBay Settlement Offers', fontweight='bold')
-            ax1.set_ylabel('Percentage (%)')
-            for i, v in enumerate(offer_counts.values):
-                ax1.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
-            ax1.grid(True, alpha=0.3)
-            
-            # Chart 2: AT&T Responses
-            response_counts = pd.Series(att_responses).value_counts(normalize=True) * 100
-            ax2.bar(response_counts.index, response_counts.values, color=['#3498db', '#e74c3c'], alpha=0.8)
-            ax2.set_title('AT&T Responses', fontweight='bold')
-            ax2.set_ylabel('Percentage (%)')
-            for i, v in enumerate(response_counts.values):
-                ax2.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
-            ax2.grid(True, alpha=0.3)
-            
-            # Chart 3: Guilt Distribution
-            guilt_counts = pd.Series(guilt_statuses).value_counts(normalize=True) * 100
-            ax3.bar(guilt_counts.index, guilt_counts.values, color=['#e74c3c', '#2ecc71'], alpha=0.8)
-            ax3.set_title('eBay Guilt Distribution', fontweight='bold')
-            ax3.set_ylabel('Percentage (%)')
-            for i, v in enumerate(guilt_counts.values):
-                ax3.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
-            ax3.grid(True, alpha=0.3)
-            
-            # Chart 4: Strategy Analysis
-            strategies = []
-            for r in results_data:
-                if r["eBay_Status"] == "Innocent" and r["Offer"] == "Stingy":
-                    strategies.append("Separating")
-                elif r["eBay_Status"] == "Guilty" and r["Offer"] == "Generous":
-                    strategies.append("Separating")
-                else:
-                    strategies.append("Pooling")
-            
-            if strategies:
-                strategy_counts = pd.Series(strategies).value_counts(normalize=True) * 100
-                ax4.bar(strategy_counts.index, strategy_counts.values, color=['#9b59b6', '#f39c12'], alpha=0.8)
-                ax4.set_title('eBay Strategy Analysis', fontweight='bold')
-                ax4.set_ylabel('Percentage (%)')
-                for i, v in enumerate(strategy_counts.values):
-                    ax4.text(i, v + 1, f'{v:.1f}%', ha='center', fontweight='bold')
-                ax4.grid(True, alpha=0.3)
-            
-            plt.tight_layout()
-            pdf.savefig(fig, bbox_inches='tight', dpi=300)
-            plt.close(fig)
-            
-            # Create detailed results table page
-            fig, ax = plt.subplots(figsize=(16, 10))
-            ax.axis('tight')
-            ax.axis('off')
+    charts.show_distributions([
+        (sim.guilty_stingy_pct, sim.band(sim.guilty_stingy_pct), guilty_stingy_pct, "Guilty eBay Choose Stingy (%)"),
+        (sim.accept_stingy_pct, sim.band(sim.accept_stingy_pct), accept_stingy_pct, "AT&T Accept Stingy (%)"),
+    ], f"Simulated classes with {n_matches} matches playing the equilibrium")
+    st.caption(f"Based on {len(sim.ebay_payoff):,} simulated classes using the game's prior and payoffs.")
+
+# Who a Stingy offer most likely comes from, read off the solved posterior (the prior and payoffs are configurable)
+def stingy_source_note(theory):
+    if theory.posterior < 0.5:
+        return (f"Most stingy offers come from innocent eBay players (who must offer Stingy) - "
+                f"only {theory.posterior:.0%} come from guilty ones.")
+    if theory.posterior > 0.5:
+        return f"Most stingy offers come from guilty eBay players - {theory.posterior:.0%} of them with this prior and these payoffs."
+    return "A stingy offer is as likely to come from a guilty as from an innocent eBay player."
+
+# Step 6 summary (class results vs theory), shared by the AT&T results page, the final student view and the admin
+def show_summary_analysis(game_params, tally):
+    st.subheader("🎯 Key Strategic Analysis")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        # % of guilty vs innocent choosing Stingy
+        if tally.guilty and tally.innocent:
+            guilty_stingy_pct = tally.pooling / tally.guilty * 100
+            innocent_stingy_pct = tally.count(Guilt.INNOCENT, Offer.STINGY) / tally.innocent * 100
             
-            # Create table data
-            table_data = [["Match ID", "eBay Player", "AT&T Player", "eBay Status", "Offer", "Response", "eBay Payoff", "AT&T Payoff"]]
-            for r in results_data:
-                table_data.append([
-                    r["Match_ID"], r["eBay_Player"], r["ATT_Player"],
-                    r["eBay_Status"], r["Offer"], r["Response"],
-                    str(r["eBay_Payoff"]), str(r["ATT_Payoff"])
-                ])
+            categories = ['Guilty eBay', 'Innocent eBay']
+            percentages = [guilty_stingy_pct, innocent_stingy_pct]
+            colors = ['#e74c3c', '#2ecc71']
             
-            table = ax.table(cellText=table_data[1:], colLabels=table_data[0],
-                           cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
-            table.auto_set_font_size(False)
-            table.set_fontsize(9)
-            table.scale(1, 2)
+            charts.show_percentage_bar(categories, percentages, colors, "% Choosing Stingy Offer by eBay Type")
+        else:
+            st.info("Need both guilty and innocent players to show this analysis")
+    
+    with col2:
+        # % of AT&T accepting stingy offers
+        if tally.stingy:
+            accept_pct = tally.stingy_accepted / tally.stingy * 100
             
-            # Style the table
-            for i in range(len(table_data[0])):
-                table[(0, i)].set_facecolor('#4472C4')
-                table[(0, i)].set_text_props(weight='bold', color='white')
+            categories = ['Accept', 'Reject']
+            percentages_vals = [accept_pct, 100 - accept_pct]
+            colors = ['#3498db', '#e74c3c']
             
-            ax.set_title('Detailed Game Results', fontsize=16, fontweight='bold', pad=20)
-            pdf.savefig(fig, bbox_inches='tight', dpi=300)
-            plt.close(fig)
+            charts.show_percentage_bar(categories, percentages_vals, colors, "AT&T Responses to Stingy Offers")
+        else:
+            st.info("No stingy offers made yet")
+    
+    # Game Theory Analysis
+    st.subheader("🧮 Game Theory Predictions vs Your Class")
+    theory = equilibrium.solve(game_params)  # memoized per parameter set
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if tally.stingy:
+            accept_stingy_pct = tally.stingy_accepted / tally.stingy * 100
+            st.metric("AT&T Accept Stingy Offers", f"{accept_stingy_pct:.1f}%", f"Theory: {theory.accept_stingy:.0%}")
+        else:
+            st.metric("AT&T Accept Stingy Offers", "N/A", f"Theory: {theory.accept_stingy:.0%}")
     
-    # Read the PDF file content
-    with open(temp_file.name, 'rb') as f:
-        pdf_content = f.read()
+    with col2:
+        if tally.guilty:
+            guilty_stingy_pct = tally.pooling / tally.guilty * 100
+            st.metric("Guilty eBay Choose Stingy", f"{guilty_stingy_pct:.1f}%", f"Theory: {theory.guilty_stingy:.0%}")
+        else:
+            st.metric("Guilty eBay Choose Stingy", "N/A", f"Theory: {theory.guilty_stingy:.0%}")
+    
+    with col3:
+        if tally.innocent:
+            innocent_stingy_pct = tally.count(Guilt.INNOCENT, Offer.STINGY) / tally.innocent * 100
+            st.metric("Innocent eBay Choose Stingy", f"{innocent_stingy_pct:.1f}%", f"Theory: {theory.innocent_stingy:.0%}")
+        else:
+            st.metric("Innocent eBay Choose Stingy", "N/A", f"Theory: {theory.innocent_stingy:.0%}")
     
-    # Clean up temp file
-    import os
-    os.unlink(temp_file.name)
+    # Uncertainty in the class results, and the spread expected for a class this size
+    show_class_stats(game_params, tally)
+    show_simulated_range(game_params, tally)
+    
+    # Bayesian Analysis
+    st.subheader("🔍 Bayesian Analysis")
+    if tally.stingy:
+        st.info(f"""
+        **Key Insight**: When you see a **Stingy** offer, what's the probability eBay is guilty?
+        
+        **Your Class Results**: 
+        - {tally.stingy} stingy offers were made
+        - AT&T accepted {tally.stingy_accepted} of them ({tally.stingy_accepted / tally.stingy:.1%})
+        
+        **Theoretical Prediction**: 
+        - P(Guilty | Stingy Offer) ≈ {theory.posterior:.1%} 
+        - {stingy_source_note(theory)}
+        """)
+
+# Class results per round in multi-round sessions, next to the theory
+def show_learning_curve(round_stats, game_params):
+    rows = round_stats.rows()
+    if not rows:
+        return
+    theory = equilibrium.solve(game_params)
+    st.subheader("📈 Learning Curve by Round")
+    curve = pd.DataFrame(rows).set_index("Round").drop(columns="Completed")
+    curve["Theory: Guilty choose Stingy (%)"] = theory.guilty_stingy * 100
+    curve["Theory: AT&T accept Stingy (%)"] = theory.accept_stingy * 100
+    st.line_chart(curve)
+    st.caption("Completed matches per round: " + ", ".join(f"R{row['Round']}: {row['Completed']}" for row in rows))
+
+# Decision-time quantiles and histograms, streamed from the event log (see latency.py)
+def show_decision_times(latency_stats):
+    rows = latency_stats.rows()
+    if not any(row["Count"] for row in rows):
+        return
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    for column, measure in zip(st.columns(len(latency.MEASURES)), latency.MEASURES):
+        bins = latency_stats.sketches[measure].histogram()
+        if bins:
+            with column:
+                st.caption(f"{measure} (s)")
+                st.bar_chart(pd.DataFrame({"Matches": [count for _, _, count in bins]},
+                                          index=pd.Index([round(start) for start, _, _ in bins], name="From (s)")))
+
+# Actions are written in the background; see write_behind.py
+write_queue = queue_for(database)
+
+# Joins are admitted into a bounded queue and written in batches; see admission.py
+join_queue = admission.queue_for(database)
+
+# Reads and renders shared by every server replica, when a cache is configured; see shared_cache.py
+shared = shared_cache.connect(st.secrets.get("cache_url"))
+
+# Count a completed match in the live counters, then let every replica see the new counts
+def record_outcome(match, payoff_table):
+    outcome_tally.record(database, match, payoff_table)
+    shared.bump()
+
+# Live countdown for the player's own decision; reruns the page when time is up
+@st.fragment(run_every=1)
+def show_countdown(limit):
+    left = limit - time.time()
+    if left <= 0:
+        st.rerun()
+    st.warning(f"⏱️ **{int(left)} s** left to decide - a default move is made when time runs out")
+
+# Poll again shortly, first applying an overdue default move or reaping a
+# partner who has left (see deadlines.py and presence.py)
+def wait_for_partner(match, name, deadline_settings, game_params, bot_settings):
+    # A bot partner moves straight away
+    if (bots.play(database, match, bot_settings, game_params)
+            or deadlines.enforce(database, match, deadline_settings, payoff_table=game_params.table())):
+        shared.bump()
+        st.rerun()
+    limit = deadlines.deadline(match, deadline_settings)
+    if limit is not None:
+        st.caption(f"⏱️ Your partner has {max(0, int(limit - time.time()))} s left to decide")
+    now = time.time()
+    if now - st.session_state.get("partner_check", 0) >= presence.HEARTBEAT_INTERVAL:
+        st.session_state.partner_check = now
+        if presence.reap_partner_if_gone(database, match, name, now, bot_settings=bot_settings):
+            if bot_settings["enabled"]:
+                st.warning("👋 Your partner left the game. A bot will finish the match in their place...")
+            else:
+                st.warning("👋 Your partner left the game. Finding you a new partner...")
+    time.sleep(2)
+    st.rerun()
+
+# PDF generation function for admin (the report itself is built in reports.py)
+def create_pdf_report():
+    """Create a comprehensive PDF report using matplotlib figures"""
+    def build():
+        all_matches_raw, params = gather(database.reference("lawsuit_matches").get, lambda: equilibrium.load_parameters(database))
+        return reports.pdf_report(parse_matches(all_matches_raw), params)
     
-    return pdf_content
+    # Rendered once per game version, whichever replica the download comes from
+    return shared.get_or_compute("pdf", shared.version(database), build)
 
 # Admin section
 admin_password = st.text_input("Admin Password:", type="password")
@@ -225,38 +321,118 @@ admin_password = st.text_input("Admin Password:", type="password")
 if admin_password == "admin123":
     st.header("🎓 Admin Control Panel")
     
-    # Get real-time data with safe handling
-    try:
-        all_players_raw = db.reference("lawsuit_players").get()
-        all_players = all_players_raw if isinstance(all_players_raw, dict) else {}
+    # Player status table, per-round stats and decision times, kept up to date from the event log across refreshes
+    if "activity_table" not in st.session_state:
+        table = st.session_state.activity_table = ActivityTable()
+        stats = st.session_state.round_stats = rounds.RoundStats()
+        timings = st.session_state.latency_stats = latency.LatencyStats()
         
-        all_matches_raw = db.reference("lawsuit_matches").get()
-        all_matches = all_matches_raw if isinstance(all_matches_raw, dict) else {}
+        # Polled on a pool thread (see poll_activity), which can't see st.session_state - keep the objects
+        def handle_event(state, event):
+            table.handle(state, event)
+            stats.apply(event)
+            timings.apply(event)
+            return state
         
-        expected_players = db.reference("lawsuit_expected_players").get() or 0
+        st.session_state.activity_consumer = game_events.EventConsumer(database, handler=handle_event,
+                                                                       cursor=game_events.game_start(database))
+    activity_table = st.session_state.activity_table
+    round_stats = st.session_state.round_stats
+    latency_stats = st.session_state.latency_stats
+    activity_consumer = st.session_state.activity_consumer
+    
+    def poll_activity():
+        # Runs on a pool thread, so it must not touch st.* itself
+        try:
+            activity_consumer.poll()
+            return True
+        except Exception:
+            return False
+    
+    # Get real-time data with safe handling (independent reads are issued concurrently; game
+    # settings come from the shared cache when one is configured). Player and match counts come
+    # from the activity table, so a refresh never downloads the player or match trees
+    try:
+        version = shared.version(database)
+        (expected_players, deadline_settings, game_params, round_settings, tally, bot_settings, activity_ok) = gather(
+            lambda: shared.get_or_compute("expected_players", version, database.reference("lawsuit_expected_players").get),
+            lambda: shared.get_or_compute("deadlines", version, lambda: deadlines.load_settings(database)),
+            lambda: shared.get_or_compute("params", version, lambda: equilibrium.load_parameters(database)),
+            lambda: shared.get_or_compute("rounds", version, lambda: rounds.load_settings(database)),
+            lambda: shared.get_or_compute("tally", version, lambda: outcome_tally.load(database)),
+            lambda: shared.get_or_compute("bots", version, lambda: bots.load_settings(database)),
+            poll_activity
+        )
+        expected_players = expected_players or 0
     except Exception as e:
         st.error("Error connecting to database. Please refresh the page.")
-        all_players = {}
-        all_matches = {}
         expected_players = 0
+        activity_ok = False
+        deadline_settings = dict(deadlines.DEFAULT_SETTINGS)
+        game_params = equilibrium.GameParameters()
+        round_settings = dict(rounds.DEFAULT_SETTINGS)
+        tally = outcome_tally.OutcomeTally()
+        bot_settings = {**bots.DEFAULT_SETTINGS, "players": {}}
+    
+    # Once per heartbeat interval, read the player and match trees to reap players who closed their tab
+    # while the game still needs them (or hand them to bots), apply overdue default moves and finish any
+    # outcome count left half-done. Students waiting on a partner do the same for their own match
+    now = time.time()
+    if now - st.session_state.get("admin_sweep", 0) >= presence.HEARTBEAT_INTERVAL:
+        try:
+            all_players_raw, all_matches_raw, presence_raw = fetch_all(
+                database, "lawsuit_players", "lawsuit_matches", presence.PRESENCE_PATH)
+        except Exception:
+            pass  # tried again on the next refresh
+        else:
+            st.session_state.admin_sweep = now
+            all_matches = parse_matches(all_matches_raw)
+            reaped = presence.sweep(database, parse_players(all_players_raw), all_matches, presence_raw,
+                                    expected_players, bot_settings=bot_settings)
+            if reaped:
+                if bot_settings["enabled"]:
+                    st.toast(f"👋 Inactive player(s) removed or replaced by bots: {', '.join(reaped)}")
+                else:
+                    st.toast(f"👋 Removed inactive player(s): {', '.join(reaped)}")
+                shared.bump()
+                st.rerun()
+            
+            defaulted = [match.match_id for match in all_matches.values()
+                         if deadlines.enforce(database, match, deadline_settings, payoff_table=game_params.table())]
+            if outcome_tally.settle(database, game_params.table()) or defaulted:
+                shared.bump()
+            if defaulted:
+                st.toast(f"⏱️ Applied default moves in {len(defaulted)} overdue match(es)")
+                st.rerun()
+    
+    # Bots move as soon as it is their turn (here for matches no human is waiting on); only bots' matches are read
+    bot_match_ids = [match_id for match_id, pair in activity_table.matches.items()
+                     if any(bots.is_bot(bot_settings, name) for name in pair)]
+    if bot_settings["enabled"] and bot_match_ids:
+        try:
+            bot_matches = parse_matches(dict(zip(bot_match_ids, fetch_all(
+                database, *(f"lawsuit_matches/{match_id}" for match_id in bot_match_ids)))))
+        except Exception:
+            bot_matches = {}
+        bot_moves = [match.match_id for match in bot_matches.values() if bots.play(database, match, bot_settings, game_params)]
+        if bot_moves:
+            shared.bump()
+            st.rerun()
     
     # Calculate statistics
-    total_registered = len(all_players)
+    total_registered = len(activity_table.rows)
     ebay_players = []
     att_players = []
     
-    for player in all_players.values():
-        if player and isinstance(player, dict):
-            role = player.get("role")
-            if role == "eBay":
-                ebay_players.append(player)
-            elif role == "AT&T":
-                att_players.append(player)
+    for row in activity_table.rows.values():
+        if row.role == Role.EBAY:
+            ebay_players.append(row)
+        elif row.role == Role.ATT:
+            att_players.append(row)
     
-    completed_matches = 0
-    for match_data in all_matches.values():
-        if match_data and isinstance(match_data, dict) and "ebay_response" in match_data and "att_response" in match_data:
-            completed_matches += 1
+    # Every analytics number below comes from the outcome counters (see outcome_tally.py)
+    completed_matches = tally.completed
+    total_matches = rounds.expected_matches(expected_players, round_settings)
     
     # Live Statistics Dashboard
     st.subheader("📊 Live Game Statistics")
@@ -273,76 +449,61 @@ if admin_password == "admin123":
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Matches", len(all_matches))
+        st.metric("Total Matches", len(activity_table.matches))
     with col2:
         st.metric("Completed Matches", completed_matches)
     with col3:
-        guilty_count = len([p for p in ebay_players if isinstance(p, dict) and p.get("guilt_status") == "Guilty"])
+        guilty_count = len([p for p in ebay_players if p.guilt == Guilt.GUILTY])
         st.metric("Guilty eBay Players", guilty_count)
     
-    # Player activity monitor
+    # Player activity monitor (status table kept up to date from the event log)
     st.subheader("👥 Player Activity Monitor")
     
-    if all_players:
-        player_status = []
-        for name, player_data in all_players.items():
-            role = player_data.get("role", "Unknown")
-            status = "🔴 Registered"
-            activity = "Waiting for match"
-            
-            # Find player's match
-            player_match = None
-            for match_id, match_data in all_matches.items():
-                if name in [match_data.get("ebay_player"), match_data.get("att_player")]:
-                    player_match = match_data
-                    break
-            
-            if player_match:
-                if role == "eBay":
-                    if "ebay_response" in player_match:
-                        status = "🟢 Completed"
-                        activity = f"Offered: {player_match['ebay_response']}"
-                    else:
-                        status = "🟡 In Match"
-                        activity = "Making offer..."
-                elif role == "AT&T":
-                    if "att_response" in player_match:
-                        status = "🟢 Completed"
-                        activity = f"Response: {player_match['att_response']}"
-                    else:
-                        status = "🟡 In Match"
-                        activity = "Waiting for eBay offer..."
-            
-            extra_info = ""
-            if role == "eBay":
-                guilt = player_data.get("guilt_status", "Unknown")
-                extra_info = f"({guilt})"
-            
-            player_status.append({
-                "Player Name": name,
-                "Role": role,
-                "Status": status,
-                "Activity": activity,
-                "Extra Info": extra_info
-            })
+    if not activity_ok:
+        st.warning("Could not fetch new player activity - showing last known status.")
+    
+    if activity_table.rows:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            role_filter = st.selectbox("Role", ["All", "eBay", "AT&T"])
+        with col2:
+            status_filter = st.selectbox("Status", ["All"] + STATUSES)
+        with col3:
+            stuck_filter = st.number_input("Stuck in match for (s)", min_value=0, value=0, step=30,
+                                           help="Only show players in a match for at least this long (0 = off)")
+        with col4:
+            name_filter = st.text_input("Search player name")
+        
+        now = time.time()
+        monitor_rows = activity_table.filter(
+            role=parse_code(Role, role_filter) if role_filter != "All" else None,
+            status=status_filter if status_filter != "All" else None,
+            stuck_for=stuck_filter,
+            search=name_filter,
+            now=now
+        )
         
-        status_df = pd.DataFrame(player_status)
-        st.dataframe(status_df, use_container_width=True)
+        total_pages = cohort.page_count(len(monitor_rows), cohort.MONITOR_PAGE_SIZE)
+        monitor_page = 1
+        if total_pages > 1:
+            monitor_page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages,
+                                           value=1, step=1)
+        page_rows = cohort.paginate(monitor_rows, monitor_page, cohort.MONITOR_PAGE_SIZE)
+        
+        st.caption(f"Showing {len(page_rows)} of {len(monitor_rows)} matching players "
+                   f"({len(activity_table.rows)} total)")
+        if page_rows:
+            status_df = pd.DataFrame([row.as_dict(now) for row in page_rows])
+            st.dataframe(status_df, use_container_width=True)
     
     # Live analytics
     st.subheader("📈 Live Game Analytics")
     
     if completed_matches > 0:
-        # Collect data for charts
-        ebay_offers = []
-        att_responses = []
-        guilt_statuses = []
-        
-        for match_data in all_matches.values():
-            if match_data and isinstance(match_data, dict) and "ebay_response" in match_data and "att_response" in match_data:
-                ebay_offers.append(match_data["ebay_response"])
-                att_responses.append(match_data["att_response"])
-                guilt_statuses.append(match_data["ebay_guilt"])
+        # Chart data straight from the counters
+        ebay_offers = {"Generous": tally.count(offer=Offer.GENEROUS), "Stingy": tally.stingy}
+        att_responses = {"Accept": tally.count(response=Response.ACCEPT), "Reject": tally.count(response=Response.REJECT)}
+        guilt_statuses = {"Guilty": tally.guilty, "Innocent": tally.innocent}
         
         col1, col2 = st.columns(2)
         with col1:
@@ -352,46 +513,154 @@ if admin_password == "admin123":
         with col2:
             plot_enhanced_percentage_bar(att_responses, ["Accept", "Reject"], "AT&T Responses", "AT&T")
             
-            # Strategy analysis
-            strategies = []
-            for match_data in all_matches.values():
-                if match_data and isinstance(match_data, dict) and "ebay_response" in match_data and "att_response" in match_data:
-                    guilt = match_data["ebay_guilt"]
-                    offer = match_data["ebay_response"]
-                    if guilt == "Innocent" and offer == "Stingy":
-                        strategies.append("Separating")
-                    elif guilt == "Guilty" and offer == "Generous":
-                        strategies.append("Separating")
-                    else:
-                        strategies.append("Pooling")
-            
-            if strategies:
-                plot_enhanced_percentage_bar(strategies, ["Pooling", "Separating"], "eBay Strategy Analysis", "eBay")
+            # Strategy analysis (a guilty eBay offering Stingy pools with the innocent ones)
+            strategies = {"Pooling": tally.pooling, "Separating": tally.separating}
+            plot_enhanced_percentage_bar(strategies, ["Pooling", "Separating"], "eBay Strategy Analysis", "eBay")
+        
+        if rounds.is_multi_round(round_settings):
+            show_learning_curve(round_stats, game_params)
     else:
         st.info("No completed matches yet. Charts will appear when players start completing games.")
     
     # Game Configuration
     st.subheader("⚙️ Game Configuration")
-    current_expected = db.reference("lawsuit_expected_players").get() or 0
+    current_expected = expected_players
     st.write(f"Current expected players: {current_expected}")
     
     new_expected_players = st.number_input(
         "Set expected number of players:", 
         min_value=0, 
-        max_value=100, 
+        max_value=cohort.MAX_PLAYERS, 
         value=current_expected,
         step=2,
         help="Must be an even number (players are paired)"
     )
     
+    if cohort.is_large_cohort(new_expected_players):
+        st.info(f"🏟️ **Large-cohort mode**: above {cohort.LARGE_COHORT_THRESHOLD} players, registration is counted "
+                "in sharded counters and the whole class is paired in one batch once everyone has joined.")
+    
     if st.button("⚙ Update Expected Players"):
         if new_expected_players % 2 == 0:  # Must be even for pairing
-            db.reference("lawsuit_expected_players").set(new_expected_players)
+            database.reference("lawsuit_expected_players").set(new_expected_players)
+            game_events.log_event(database, game_events.CONFIGURE, expected_players=new_expected_players)
+            shared.bump()
             st.success(f"✅ Expected players set to {new_expected_players}")
             st.rerun()
         else:
             st.error("⚠ Number of players must be even (for pairing)")
     
+    # Decision deadlines (0 = no limit)
+    with st.expander("⏱️ Decision Deadlines"):
+        col1, col2 = st.columns(2)
+        with col1:
+            offer_seconds = st.number_input("eBay offer time limit (s)", min_value=0, step=15,
+                                            value=int(deadline_settings["offer_seconds"]))
+            offer_default = st.selectbox("Default offer on timeout", deadlines.OFFER_DEFAULTS,
+                                         index=deadlines.OFFER_DEFAULTS.index(deadline_settings["offer_default"]),
+                                         help="Innocent eBay players always default to Stingy")
+        with col2:
+            response_seconds = st.number_input("AT&T response time limit (s)", min_value=0, step=15,
+                                               value=int(deadline_settings["response_seconds"]))
+            response_default = st.selectbox("Default response on timeout", deadlines.RESPONSE_DEFAULTS,
+                                            index=deadlines.RESPONSE_DEFAULTS.index(deadline_settings["response_default"]),
+                                            help="Generous offers are always accepted")
+        
+        if st.button("⏱️ Save Deadlines"):
+            database.reference(deadlines.DEADLINES_PATH).set({
+                "offer_seconds": offer_seconds,
+                "response_seconds": response_seconds,
+                "offer_default": offer_default,
+                "response_default": response_default,
+            })
+            shared.bump()
+            st.success("✅ Deadlines saved")
+            st.rerun()
+        
+        # Observed decision times, to help pick the limits
+        show_decision_times(latency_stats)
+    
+    # Bot players for empty seats and players who leave mid-game
+    with st.expander("🤖 Bot Players"):
+        st.caption("Bots fill empty seats, take over players who leave mid-game and move as soon as it is their turn.")
+        bots_enabled = st.checkbox("Enable bot players", value=bool(bot_settings["enabled"]))
+        bot_strategy = st.radio("Bot strategy", bots.STRATEGIES, horizontal=True,
+                                index=bots.STRATEGIES.index(bot_settings["strategy"]))
+        if bot_strategy == bots.CUSTOM:
+            col1, col2 = st.columns(2)
+            with col1:
+                guilty_stingy = st.slider("P(guilty bot offers Stingy)", 0.0, 1.0,
+                                          float(bot_settings["guilty_stingy"]), 0.05)
+            with col2:
+                accept_stingy = st.slider("P(AT&T bot accepts Stingy)", 0.0, 1.0,
+                                          float(bot_settings["accept_stingy"]), 0.05)
+        else:
+            guilty_stingy, accept_stingy = bots.strategy({"strategy": bots.EQUILIBRIUM}, game_params)
+            st.write(f"Guilty bots offer Stingy {guilty_stingy:.0%} of the time; "
+                     f"AT&T bots accept Stingy {accept_stingy:.0%} of the time.")
+        
+        if st.button("🤖 Save Bot Settings"):
+            bots.save_settings(database, {"enabled": bots_enabled, "strategy": bot_strategy,
+                                    "guilty_stingy": guilty_stingy, "accept_stingy": accept_stingy})
+            shared.bump()
+            st.success("✅ Bot settings saved")
+            st.rerun()
+        
+        empty_seats = expected_players + expected_players % 2 - total_registered
+        st.write(f"**Bots in this game**: {len(bot_settings['players'])} · **Empty seats**: {max(0, empty_seats)}")
+        if st.button("🪑 Fill Empty Seats with Bots", disabled=not bot_settings["enabled"] or empty_seats <= 0,
+                     help="An odd class gets one more seat, so everyone has a partner"):
+            # Per-player pairing picks partners itself; bots left over are paired with each other now
+            class_paired = cohort.is_large_cohort(expected_players) or rounds.is_multi_round(round_settings)
+            added = bots.fill_seats(database, parse_players(database.reference("lawsuit_players").get()), expected_players,
+                                    pair=not class_paired, guilt_prior=game_params.guilt_prior)
+            shared.bump()
+            st.success(f"✅ Added {len(added)} bot player(s)")
+            st.rerun()
+    
+    # Guilt prior and payoffs, with the equilibrium they imply
+    with st.expander("🎲 Game Parameters & Theory"):
+        new_params = game_params.with_prior(st.slider(
+            "P(eBay is guilty)", min_value=0.05, max_value=0.95, value=float(game_params.guilt_prior), step=0.05,
+            help="Applies to roles assigned after saving"))
+        current_table = game_params.table()
+        for outcome in equilibrium.OUTCOMES:
+            ebay_value, att_value = current_table[outcome]
+            col1, col2 = st.columns(2)
+            with col1:
+                ebay_value = st.number_input(f"{equilibrium.outcome_key(outcome)}: eBay payoff", value=int(ebay_value), step=10)
+            with col2:
+                att_value = st.number_input(f"{equilibrium.outcome_key(outcome)}: AT&T payoff", value=int(att_value), step=10)
+            new_params = new_params.with_payoff(outcome, ebay_value, att_value)
+        
+        preview = equilibrium.solve(new_params)
+        st.write(f"**Equilibrium ({preview.kind})**: guilty eBay offers Stingy {preview.guilty_stingy:.1%} of the time, "
+                 f"AT&T accepts Stingy offers {preview.accept_stingy:.1%}, P(Guilty | Stingy) = {preview.posterior:.1%}")
+        st.write(f"Expected payoffs - eBay: {preview.ebay_payoff:.1f}, AT&T: {preview.att_payoff:.1f}")
+        st.line_chart(pd.DataFrame(equilibrium.prior_curve(new_params)).set_index("P(Guilty)"))
+        
+        if st.button("🎲 Save Game Parameters"):
+            equilibrium.save_parameters(database, new_params)
+            shared.bump()
+            st.success("✅ Game parameters saved")
+            st.rerun()
+    
+    # Repeated play: every round against a new partner, scheduled up front
+    with st.expander("🔁 Rounds"):
+        rounds_count = st.number_input("Rounds per player", min_value=1, max_value=rounds.MAX_ROUNDS, step=1,
+                                       value=int(round_settings["rounds"]),
+                                       help="Each round is played against a different partner")
+        swap_roles = st.checkbox("Swap eBay/AT&T roles every other round", value=bool(round_settings["swap_roles"]))
+        if rounds_count > 1 and rounds_count > expected_players // 2 > 0:
+            st.warning(f"⚠ With {expected_players // 2} pairs, partners repeat after {expected_players // 2} rounds")
+        st.caption("Applies to the next game; the schedule is drawn when the class is full.")
+        
+        if st.button("🔁 Save Rounds"):
+            database.reference(rounds.ROUNDS_PATH).set({"rounds": rounds_count, "swap_roles": swap_roles})
+            shared.bump()
+            st.success("✅ Rounds saved")
+            st.rerun()
+    
     # Data management
     st.subheader("🗂️ Data Management")
     col1, col2 = st.columns(2)
@@ -412,38 +681,8 @@ if admin_password == "admin123":
                     except Exception as e:
                         st.error(f"Error generating PDF: {str(e)}")
                         # Fallback to CSV if PDF fails
-                        results_data = []
-                        for match_id, match_data in all_matches.items():
-                            if "ebay_response" in match_data and "att_response" in match_data:
-                                guilt = match_data["ebay_guilt"]
-                                offer = match_data["ebay_response"]
-                                response = match_data["att_response"]
-                                
-                                if guilt == "Guilty":
-                                    if offer == "Generous" and response == "Accept":
-                                        ebay_payoff, att_payoff = -200, 200
-                                    elif offer == "Stingy" and response == "Accept":
-                                        ebay_payoff, att_payoff = -20, 20
-                                    else:  # Stingy + Reject (Trial)
-                                        ebay_payoff, att_payoff = -320, 300
-                                else:  # Innocent
-                                    if offer == "Generous" and response == "Accept":
-                                        ebay_payoff, att_payoff = 0, 0
-                                    elif offer == "Stingy" and response == "Accept":
-                                        ebay_payoff, att_payoff = -20, 20
-                                    else:  # Stingy + Reject (Trial)
-                                        ebay_payoff, att_payoff = 0, -20
-                                
-                                results_data.append({
-                                    "Match_ID": match_id,
-                                    "eBay_Player": match_data["ebay_player"],
-                                    "ATT_Player": match_data["att_player"],
-                                    "eBay_Status": guilt,
-                                    "Offer": offer,
-                                    "Response": response,
-                                    "eBay_Payoff": ebay_payoff,
-                                    "ATT_Payoff": att_payoff
-                                })
+                        results_data = reports.match_results(parse_matches(database.reference("lawsuit_matches").get()),
+                                                             game_params.table())
                         
                         df = pd.DataFrame(results_data)
                         csv = df.to_csv(index=False)
@@ -457,157 +696,111 @@ if admin_password == "admin123":
                 st.warning("No completed matches to export.")
     
     with col2:
+        if st.button("🔁 Migrate Legacy Records"):
+            migrated = migrate(database)
+            shared.bump()
+            st.success(f"✅ Rewrote {migrated} player/match records in the compact schema")
+        
+        if st.button("🔢 Recount Outcomes"):
+            # Rebuilds the live counters from the matches, e.g. for games played before they existed
+            recounted = outcome_tally.rebuild(database, parse_matches(database.reference("lawsuit_matches").get()),
+                                              game_params.table())
+            shared.bump()
+            st.success(f"✅ Recounted {recounted.completed} completed matches")
+        
         if st.button("🗑️ Clear All Game Data"):
-            db.reference("lawsuit_players").delete()
-            db.reference("lawsuit_matches").delete()
-            db.reference("lawsuit_expected_players").set(0)
+            database.reference("lawsuit_players").delete()
+            database.reference("lawsuit_matches").delete()
+            database.reference(cohort.REGISTRATION_PATH).delete()
+            database.reference(cohort.PAIRING_PATH).delete()
+            database.reference(outcome_tally.OUTCOMES_PATH).delete()
+            database.reference(outcome_tally.COUNTED_PATH).delete()
+            database.reference(presence.PRESENCE_PATH).delete()
+            database.reference(bots.PLAYERS_PATH).delete()
+            database.reference("lawsuit_expected_players").set(0)
+            database.reference("/").update(game_events.reset_update())
+            # Names and match ids may be reused in the next game
+            write_queue.forget()
+            join_queue.forget()
+            shared.bump()
             st.success("🧹 ALL game data cleared!")
             st.rerun()
+
+    # Save the whole game to a file and put it back later (demos, prepared scenarios, recovery)
+    with st.expander("💾 Snapshots"):
+        if st.button("📸 Take Snapshot"):
+            snapshot = snapshots.checkpoint(database)
+            saved = snapshots.summary(snapshot)
+            taken = datetime.fromtimestamp(saved["taken_at"]).strftime('%Y%m%d_%H%M%S')
+            st.download_button(
+                label=f"📥 Download Snapshot ({saved['players']} players, {saved['matches']} matches)",
+                data=snapshots.dumps(snapshot),
+                file_name=f"lawsuit_snapshot_{taken}.json.gz",
+                mime="application/gzip"
+            )
+
+        snapshot_file = st.file_uploader("Restore from snapshot file", type=["gz"])
+        if snapshot_file is not None:
+            try:
+                snapshot = snapshots.loads(snapshot_file.getvalue())
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                saved = snapshots.summary(snapshot)
+                st.caption(f"Taken {datetime.fromtimestamp(saved['taken_at']).strftime('%Y-%m-%d %H:%M:%S')}: "
+                           f"{saved['players']}/{saved['expected_players']} players, {saved['matches']} matches, "
+                           f"{saved['events']} events")
+                st.warning("⚠️ Restoring replaces ALL current game data.")
+                if st.button("♻️ Restore Snapshot"):
+                    snapshots.restore(database, snapshot)
+                    write_queue.forget()
+                    join_queue.forget()
+                    # The activity table folds the old log; rebuild it from the restored one
+                    for key in ("activity_table", "round_stats", "latency_stats", "activity_consumer"):
+                        st.session_state.pop(key, None)
+                    shared.bump()
+                    st.success(f"♻️ Restored {saved['players']} players and {saved['matches']} matches!")
+                    st.rerun()
+
+    # Event log (append-only history of every action)
+    with st.expander("🧾 Event Log"):
+        try:
+            latest_events = game_events.recent_events(database, limit=20)
+        except Exception:
+            latest_events = []
+        if latest_events:
+            st.dataframe(pd.DataFrame([
+                {"Time": datetime.fromtimestamp(event["ts"]).strftime('%H:%M:%S'),
+                 "Event": event["kind"],
+                 "Details": ", ".join(f"{k}={v}" for k, v in event.items() if k not in ("kind", "ts"))}
+                for _, event in reversed(latest_events)
+            ]), use_container_width=True)
+            if st.button("🧾 Prepare Event Log Export"):
+                st.download_button(
+                    label="📥 Download Full Event Log (JSON)",
+                    data=json.dumps(game_events.load_events(database), indent=2),
+                    file_name="lawsuit_game_events.json",
+                    mime="application/json"
+                )
+        else:
+            st.write("No events recorded yet.")
+    
+    if isinstance(database, faulty_db.FaultyDatabase):
+        with st.expander("🧪 Fault Injection"):
+            st.caption(f"Injecting: {database.profile}")
+            st.dataframe(pd.DataFrame(database.report()), use_container_width=True)
     
     # Auto-refresh control and show complete results
-    if expected_players > 0 and completed_matches < (expected_players // 2):
+    if expected_players > 0 and completed_matches < total_matches:
         # Auto-refresh while game is active
         time.sleep(3)
         st.rerun()
-    elif completed_matches >= (expected_players // 2) and expected_players > 0:
+    elif completed_matches >= total_matches and expected_players > 0:
         st.success("🎉 All matches completed! Game finished.")
         
         # Show the same Summary Analysis that participants see
         st.header("📊 Admin View: Summary Analysis - Class Results vs Game Theory")
-        
-        # Collect all results (same as participant view)
-        ebay_offers = []
-        att_responses = []
-        guilt_statuses = []
-        guilty_offers = []
-        innocent_offers = []
-        stingy_responses = []
-        
-        for match_data in all_matches.values():
-            if match_data and isinstance(match_data, dict) and "ebay_response" in match_data and "att_response" in match_data:
-                guilt = match_data["ebay_guilt"]
-                offer = match_data["ebay_response"]
-                response = match_data["att_response"]
-                
-                ebay_offers.append(offer)
-                att_responses.append(response)
-                guilt_statuses.append(guilt)
-                
-                # Separate by guilt status
-                if guilt == "Guilty":
-                    guilty_offers.append(offer)
-                else:
-                    innocent_offers.append(offer)
-                
-                # AT&T responses to stingy offers only
-                if offer == "Stingy":
-                    stingy_responses.append(response)
-        
-        # Show key strategic analysis (same as participants see)
-        st.subheader("🎯 Key Strategic Analysis")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            # % of guilty vs innocent choosing Stingy
-            if guilty_offers and innocent_offers:
-                guilty_stingy = len([o for o in guilty_offers if o == "Stingy"])
-                innocent_stingy = len([o for o in innocent_offers if o == "Stingy"])
-                
-                guilty_stingy_pct = guilty_stingy / len(guilty_offers) * 100
-                innocent_stingy_pct = innocent_stingy / len(innocent_offers) * 100
-                
-                fig, ax = plt.subplots(figsize=(8, 5))
-                categories = ['Guilty eBay', 'Innocent eBay']
-                percentages = [guilty_stingy_pct, innocent_stingy_pct]
-                colors = ['#e74c3c', '#2ecc71']
-                
-                bars = ax.bar(categories, percentages, color=colors, alpha=0.8)
-                ax.set_title("% Choosing Stingy Offer by eBay Type", fontsize=14, fontweight='bold')
-                ax.set_ylabel("Percentage (%)")
-                ax.set_ylim(0, 110)
-                
-                # Add value labels
-                for bar, pct in zip(bars, percentages):
-                    ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                           f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                
-                ax.grid(True, alpha=0.3)
-                plt.tight_layout()
-                st.pyplot(fig)
-            else:
-                st.info("Need both guilty and innocent players to show this analysis")
-        
-        with col2:
-            # % of AT&T accepting stingy offers
-            if stingy_responses:
-                accept_stingy = len([r for r in stingy_responses if r == "Accept"])
-                accept_pct = accept_stingy / len(stingy_responses) * 100
-                
-                fig, ax = plt.subplots(figsize=(8, 5))
-                categories = ['Accept', 'Reject']
-                accept_count = len([r for r in stingy_responses if r == "Accept"])
-                reject_count = len([r for r in stingy_responses if r == "Reject"])
-                
-                values = [accept_count, reject_count]
-                percentages_vals = [v/len(stingy_responses)*100 for v in values]
-                colors = ['#3498db', '#e74c3c']
-                
-                bars = ax.bar(categories, percentages_vals, color=colors, alpha=0.8)
-                ax.set_title("AT&T Responses to Stingy Offers", fontsize=14, fontweight='bold')
-                ax.set_ylabel("Percentage (%)")
-                ax.set_ylim(0, 110)
-                
-                # Add value labels
-                for bar, pct in zip(bars, percentages_vals):
-                    ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                           f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                
-                ax.grid(True, alpha=0.3)
-                plt.tight_layout()
-                st.pyplot(fig)
-            else:
-                st.info("No stingy offers made yet")
-        
-        # Game Theory Analysis (same as participants see)
-        st.subheader("🧮 Game Theory Predictions vs Your Class")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if stingy_responses:
-                accept_stingy_pct = len([r for r in stingy_responses if r == "Accept"]) / len(stingy_responses) * 100
-                st.metric("AT&T Accept Stingy Offers", f"{accept_stingy_pct:.1f}%", "Theory: 40%")
-            else:
-                st.metric("AT&T Accept Stingy Offers", "N/A", "Theory: 40%")
-        
-        with col2:
-            if guilty_offers:
-                guilty_stingy_pct = len([o for o in guilty_offers if o == "Stingy"]) / len(guilty_offers) * 100
-                st.metric("Guilty eBay Choose Stingy", f"{guilty_stingy_pct:.1f}%", "Theory: ~43%")
-            else:
-                st.metric("Guilty eBay Choose Stingy", "N/A", "Theory: ~43%")
-        
-        with col3:
-            if innocent_offers:
-                innocent_stingy_pct = len([o for o in innocent_offers if o == "Stingy"]) / len(innocent_offers) * 100
-                st.metric("Innocent eBay Choose Stingy", f"{innocent_stingy_pct:.1f}%", "Theory: 100%")
-            else:
-                st.metric("Innocent eBay Choose Stingy", "N/A", "Theory: 100%")
-        
-        # Bayesian Analysis (same as participants see)
-        st.subheader("🔍 Bayesian Analysis")
-        if stingy_responses:
-            accept_stingy_pct = len([r for r in stingy_responses if r == "Accept"]) / len(stingy_responses) * 100
-            st.info(f"""
-            **Key Insight**: When you see a **Stingy** offer, what's the probability eBay is guilty?
-            
-            **Your Class Results**: 
-            - {len(stingy_responses)} stingy offers were made
-            - AT&T accepted {len([r for r in stingy_responses if r == "Accept"])} of them ({accept_stingy_pct:.1f}%)
-            
-            **Theoretical Prediction**: 
-            - P(Guilty | Stingy Offer) ≈ 12.5% 
-            - Most stingy offers actually come from innocent parties!
-            """)
+        show_summary_analysis(game_params, tally)
         
         st.success("🎉 **Dynamic Signaling Game Complete!** Students experienced Nash Equilibrium, Bayesian updating, and strategic signaling in action!")
         
@@ -622,15 +815,34 @@ if admin_password == "admin123":
     # Stop here - admin doesn't participate
     st.stop()
 
-# Check if game is configured
-if (db.reference("lawsuit_expected_players").get() or 0) <= 0:
+# Check if game is configured (and which prior/payoffs are in play); every student polls
+# these, so they come from the shared cache when one is configured
+version = shared.version(database)
+expected_players, game_params, round_settings, game_id, bot_settings = gather(
+    lambda: shared.get_or_compute("expected_players", version, database.reference("lawsuit_expected_players").get),
+    lambda: shared.get_or_compute("params", version, lambda: equilibrium.load_parameters(database)),
+    lambda: shared.get_or_compute("rounds", version, lambda: rounds.load_settings(database)),
+    lambda: shared.get_or_compute("game_id", version, database.reference(game_events.GAME_PATH).get),
+    lambda: shared.get_or_compute("bots", version, lambda: bots.load_settings(database)))
+expected_players = expected_players or 0
+multi_round = rounds.is_multi_round(round_settings)
+if expected_players <= 0:
     st.info("⚠️ Game not configured yet. Admin needs to set expected number of players.")
     st.stop()
 
 # Game explanation
 st.header("📖 Simple Explanation of the Game")
 
-st.markdown("""
+payoff_table = game_params.table()
+guilty_pct = f"{game_params.guilt_prior:.0%}"
+innocent_pct = f"{1 - game_params.guilt_prior:.0%}"
+# The commentary on each outcome only fits the standard payoffs
+notes = game_params.payoffs == equilibrium.GameParameters().payoffs
+
+def payoff_text(guilt, offer, response, note):
+    return f"{payoff_table[(guilt, offer, response)]}" + (f" *{note}*" if notes else "")
+
+st.markdown(f"""
 This is a **dynamic signaling game** between two players:
 
 🏢 **eBay** (the sender of the signal/offer)  
@@ -638,7 +850,7 @@ This is a **dynamic signaling game** between two players:
 
 ### 🎯 What's happening?
 
-1. **Nature decides** whether eBay is **guilty (25%)** or **innocent (75%)**
+1. **Nature decides** whether eBay is **guilty ({guilty_pct})** or **innocent ({innocent_pct})**
 2. **eBay makes a settlement offer** to AT&T:
    - **Generous offer (G)**
    - **Stingy offer (S)**
@@ -651,15 +863,15 @@ This is a **dynamic signaling game** between two players:
 
 ### 💰 Payoff Matrix (eBay's payoff, AT&T's payoff):
 
-**If eBay is Guilty (25% probability):**
-- Generous → Accept: (-200, 200) *High cost for eBay*
-- Stingy → Accept: (-20, 20) *Mild cost for eBay*  
-- Stingy → Reject (Trial): (-320, 300) *Very costly for eBay*
+**If eBay is Guilty ({guilty_pct} probability):**
+- Generous → Accept: {payoff_text(Guilt.GUILTY, Offer.GENEROUS, Response.ACCEPT, "High cost for eBay")}
+- Stingy → Accept: {payoff_text(Guilt.GUILTY, Offer.STINGY, Response.ACCEPT, "Mild cost for eBay")}  
+- Stingy → Reject (Trial): {payoff_text(Guilt.GUILTY, Offer.STINGY, Response.REJECT, "Very costly for eBay")}
 
-**If eBay is Innocent (75% probability):**
+**If eBay is Innocent ({innocent_pct} probability):**
 - Generous → Not allowed *(Innocent can't signal guilt!)*
-- Stingy → Accept: (-20, 20) *Same as guilty case*
-- Stingy → Reject (Trial): (0, -20) *AT&T loses failed trial*
+- Stingy → Accept: {payoff_text(Guilt.INNOCENT, Offer.STINGY, Response.ACCEPT, "Same as guilty case")}
+- Stingy → Reject (Trial): {payoff_text(Guilt.INNOCENT, Offer.STINGY, Response.REJECT, "AT&T loses failed trial")}
 
 ### 🎮 Game Steps:
 
@@ -677,92 +889,202 @@ This is a **dynamic signaling game** between two players:
 name = st.text_input("Enter your name to join the game:")
 
 if name:
+    if bots.is_bot(bot_settings, name):
+        st.warning(f"🤖 **{name}** is played by a bot in this game. Please join with another name.")
+        st.stop()
     st.success(f"👋 Welcome, {name}!")
     
-    player_ref = db.reference(f"lawsuit_players/{name}")
-    player_data = player_ref.get()
+    player_ref = database.reference(f"lawsuit_players/{name}")
+    large_cohort = cohort.is_large_cohort(expected_players)
+    # Both modes pair the whole class in one go instead of player by player
+    class_paired = large_cohort or multi_round
+    
+    # Role, guilt, card and match never change once assigned, so the first time they are all
+    # known this session keeps them and afterwards only reads its own match. An admin reset
+    # starts a new game and clears them.
+    if st.session_state.get("facts_game", game_id) != game_id:
+        st.session_state.player_facts = {}
+        st.session_state.pop(f"round_{name}", None)
+        st.session_state.pop("finished_matches", None)
+    st.session_state.facts_game = game_id
+    player_facts = st.session_state.setdefault("player_facts", {})
+    known_player = player_facts.get(name)
+    
+    if known_player is None:
+        # A join still waiting in the admission queue counts as registered (optimistic state)
+        player_data = player_ref.get()
+        queued_player = join_queue.queued_player(name)
+        if not player_data and queued_player:
+            player_data = queued_player.to_wire()
+        
+        if not player_data:
+            # Register new player (queued, then written in a batch with everyone else joining)
+            new_player = Player(name, time.time())
+            if join_queue.admit(new_player) is None:
+                st.warning("🚦 Lots of players are joining right now - you will be let in in a moment...")
+                time.sleep(2)
+                st.rerun()
+            player_data = new_player.to_wire()
+            st.write("✅ You are registered!")
     
-    if not player_data:
-        # Register new player
-        player_ref.set({
-            "joined": True,
-            "timestamp": time.time()
-        })
-        st.write("✅ You are registered!")
+    # Heartbeats keep this player from being reaped while the tab is open
+    @st.fragment(run_every=presence.HEARTBEAT_INTERVAL)
+    def keep_alive():
+        now = time.time()
+        last_name, last_beat = st.session_state.get("last_heartbeat", (None, 0))
+        if last_name != name or now - last_beat >= presence.HEARTBEAT_INTERVAL:
+            presence.heartbeat(database, name, now)
+            st.session_state.last_heartbeat = (name, now)
     
-    # Check if all expected players registered
-    expected_players = db.reference("lawsuit_expected_players").get() or 0
-    all_players = db.reference("lawsuit_players").get() or {}
-    registered_count = len(all_players)
+    keep_alive()
     
-    if registered_count < expected_players:
-        st.info(f"⏳ Waiting for more players... ({registered_count}/{expected_players} registered)")
+    # Waiting room: only this fragment reruns until the class is full, and all sessions in
+    # this server process share one registration count read
+    @st.fragment(run_every=3)
+    def waiting_room():
+        position = join_queue.position(name)
+        registered = join_queue.registered_count()
+        if position is None and registered >= expected_players:
+            st.rerun()
+        if position is not None:
+            st.info(f"🚦 You are number {position} in the join queue - saving your registration...")
+        st.info(f"⏳ Waiting for more players... ({registered}/{expected_players} registered)")
         st.info("🔄 Page will automatically update when all players join.")
-        time.sleep(3)
-        st.rerun()
+    
+    # Check if all expected players registered (a known player was matched, so the class was full).
+    # Roles are written over the player's node, so the join has to land first.
+    if known_player is None and (join_queue.position(name) is not None
+                                 or join_queue.registered_count() < expected_players):
+        waiting_room()
+        st.stop()
     
     # All players registered - start matching process
     st.success(f"🎮 All {expected_players} players registered! Starting the game...")
     
-    # Check if player already has role assigned
-    existing_player = player_ref.get()
-    if not existing_player or "role" not in existing_player:
-        # Auto-assign roles fairly with safe handling
-        try:
-            current_players_raw = db.reference("lawsuit_players").get()
-            current_players = current_players_raw if isinstance(current_players_raw, dict) else {}
-        except:
-            current_players = {}
+    # Role, guilt draw and match creation are collected here and written in one update
+    batch = WriteBatch(database)
+    
+    # Check if player already has role assigned (a copy - round play below changes it)
+    player_info = replace(known_player) if known_player else parse_player(name, player_data)
+    
+    # Partner left mid-match: presence.reap pairs this player with the next player of the other role whose
+    # partner leaves too. Until then they don't count towards the class, so it can finish without them.
+    if player_info and player_info.partner_left and not player_info.match_id:
+        st.info("👋 Your partner left the game. You will be paired again if another player's partner leaves too.")
+        tally = shared.get_or_compute("tally", shared.version(database), lambda: outcome_tally.load(database))
+        if tally.completed >= rounds.expected_matches(expected_players, round_settings):
+            st.success("🏁 All the other matches are complete - thanks for playing!")
+            st.stop()
+        time.sleep(3)
+        st.rerun()
+    # Role balancing and partner search need everyone's current state (read fresh, not from the shared cache)
+    registered_players = None
+    if not class_paired and not (player_info and player_info.match_id):
+        registered_players = database.reference("lawsuit_players").get()
+    assigned_now = False
+    rematch = False
+    if class_paired:
+        # Whole class is assigned and paired (every round, if several) in one batch by a single client
+        if not player_info or not player_info.match_id:
+            # One token per browser session, so a rerun recognises its own claim
+            if "pairing_token" not in st.session_state:
+                st.session_state.pairing_token = uuid.uuid4().hex
+            pairing = cohort.claim_pairing(database, name, st.session_state.pairing_token)
+            if pairing == "claimed":
+                with st.spinner("🤝 Pairing the whole class..."):
+                    class_players = parse_players(database.reference("lawsuit_players").get())
+                    if multi_round:
+                        rounds.schedule_all(database, class_players, expected_players, round_settings,
+                                            guilt_prior=game_params.guilt_prior)
+                    else:
+                        cohort.pair_all(database, class_players, expected_players, guilt_prior=game_params.guilt_prior)
+                player_info = parse_player(name, player_ref.get())
+            elif pairing == "done":
+                if not player_info or player_info.role is None:
+                    st.warning("⚠️ The class has already been paired and you were not included. Please ask the instructor.")
+                    st.stop()
+                if not multi_round:
+                    # Partner left after the class was paired - look for another free player below
+                    registered_players = database.reference("lawsuit_players").get()
+                    rematch = True
+            else:
+                st.info("⏳ Assigning roles and pairing all players...")
+                time.sleep(2)
+                st.rerun()
+    elif not player_info or player_info.role is None:
+        # Auto-assign roles fairly (from the players tree fetched above)
+        current_players = parse_players(registered_players)
         
         ebay_count = 0
         att_count = 0
         
         for player in current_players.values():
-            if player and isinstance(player, dict):
-                role = player.get("role")
-                if role == "eBay":
-                    ebay_count += 1
-                elif role == "AT&T":
-                    att_count += 1
+            if player.role == Role.EBAY:
+                ebay_count += 1
+            elif player.role == Role.ATT:
+                att_count += 1
+        
+        player_info = player_info or Player(name, time.time())
         
         # Assign role to balance teams
         if ebay_count < (expected_players // 2):
-            role = "eBay"
-            # Step 2: Random Nature Draw - Assign guilt status (25% chance of guilty, 75% innocent)
-            is_guilty = random.random() < 0.25
-            guilt_status = "Guilty" if is_guilty else "Innocent"
-            card_color = "🔴 Red Card (Guilty)" if is_guilty else "🔵 Blue Card (Innocent)"
-            
-            player_ref.update({
-                "role": role,
-                "guilt_status": guilt_status,
-                "card_color": card_color
-            })
+            player_info.role = Role.EBAY
+            # Step 2: Random Nature Draw - Assign guilt status (configured prior, 25% by default)
+            is_guilty = random.random() < game_params.guilt_prior
+            player_info.guilt = Guilt.GUILTY if is_guilty else Guilt.INNOCENT
         else:
-            role = "AT&T"
-            player_ref.update({"role": role})
-    else:
-        role = existing_player["role"]
+            player_info.role = Role.ATT
+        
+        batch.add(cohort.role_update(player_info))
+        assigned_now = True
     
     # Display player role
-    player_info = player_ref.get()
     if not player_info:
         st.error("Failed to retrieve player information. Please refresh the page.")
         st.stop()
-    role = player_info.get("role")
+    if (known_player is None and player_info.match_id and not assigned_now
+            and (player_info.role == Role.ATT or player_info.guilt is not None)):
+        player_facts[name] = replace(player_info)
     
-    if role == "eBay":
-        guilt_status = player_info.get("guilt_status")
-        card_color = player_info.get("card_color")
+    # Multi-round: role and guilt come from this round's scheduled match
+    round_no = None
+    if multi_round and player_info.schedule:
+        round_key = f"round_{name}"
+        if round_key not in st.session_state and player_info.match_id in player_info.schedule:
+            st.session_state[round_key] = player_info.schedule.index(player_info.match_id) + 1
+        round_no = st.session_state.get(round_key, 1)
+        round_match_id = player_info.schedule[round_no - 1]
+        round_match = (st.session_state.get("finished_matches", {}).get(round_match_id)
+                       or parse_match(round_match_id, database.reference(f"lawsuit_matches/{round_match_id}").get()))
+        if round_match is None:
+            # This round's partner left the game - skip to the next round
+            if round_no < len(player_info.schedule):
+                st.warning(f"👋 Your round {round_no} partner left the game. Moving on to the next round...")
+                rounds.advance(database, [name], player_info.schedule[round_no], round_no + 1)
+                st.session_state[round_key] = round_no + 1
+                time.sleep(1)
+                st.rerun()
+            st.info("👋 Your partner for the last round left the game, so you have no more rounds to play.")
+            st.stop()
+        st.subheader(f"🔁 Round {round_no} of {len(player_info.schedule)}")
+        player_info.match_id = round_match_id
+        if round_match.ebay_player == name:
+            player_info.role, player_info.guilt = Role.EBAY, round_match.guilt
+        else:
+            player_info.role, player_info.guilt = Role.ATT, None
+    role = player_info.role
+    
+    if role == Role.EBAY:
+        guilt_status = player_info.guilt
         st.success(f"🏢 **You are eBay (the sender)**")
-        if guilt_status and card_color:
-            st.info(f"🎴 **Step 2 - Nature's Decision**: {card_color}")
-            st.write(f"**Your type is: {guilt_status}** (This information is private - AT&T doesn't know this)")
+        if guilt_status is not None:
+            st.info(f"🎴 **Step 2 - Nature's Decision**: {player_info.card_color}")
+            st.write(f"**Your type is: {label(guilt_status)}** (This information is private - AT&T doesn't know this)")
         else:
             st.warning("Setting up your game info...")
             time.sleep(1)
             st.rerun()
-    elif role == "AT&T":
+    elif role == Role.ATT:
         st.success(f"📡 **You are AT&T (the receiver)**")
         st.info("🎴 You don't know whether eBay is guilty or innocent - you must infer from their offer!")
     else:
@@ -771,95 +1093,131 @@ if name:
         st.rerun()
     
     # Matching system
-    matches_ref = db.reference("lawsuit_matches")
-    all_matches = matches_ref.get() or {}
+    matches_ref = database.reference("lawsuit_matches")
     
     # Check if player already matched
-    player_match_id = None
-    for match_id, match_data in all_matches.items():
-        if name in [match_data.get("ebay_player"), match_data.get("att_player")]:
-            player_match_id = match_id
-            break
+    player_match_id = player_info.match_id
+    new_match = None
+    all_matches = {}
     
-    if not player_match_id:
-        # Find a match with safe handling
+    if not player_match_id and not class_paired and not assigned_now:
+        # Records from before match links were stored on players - scan the matches
         try:
-            all_lawsuit_players_raw = db.reference("lawsuit_players").get()
-            all_lawsuit_players = all_lawsuit_players_raw if isinstance(all_lawsuit_players_raw, dict) else {}
-        except:
-            all_lawsuit_players = {}
+            all_matches = parse_matches(matches_ref.get())
+        except Exception:
+            # Pairing against an empty view could match someone twice - try again instead
+            st.warning("⚠️ Could not reach the database. Retrying...")
+            time.sleep(1)
+            st.rerun()
+        for match_id, match in all_matches.items():
+            if match.involves(name):
+                player_match_id = match_id
+                break
+    
+    if not player_match_id and (rematch or not class_paired):
+        # Find a partner in the players tree fetched above
+        all_lawsuit_players = parse_players(registered_players)
+        matched_players = set()
+        for match in all_matches.values():
+            matched_players.update((match.ebay_player, match.att_player))
         
-        if role == "eBay":
+        if role == Role.EBAY:
             # Find an unmatched AT&T player
             unmatched_att_players = []
-            for player_name, player_data in all_lawsuit_players.items():
-                if player_data and isinstance(player_data, dict) and player_data.get("role") == "AT&T" and player_name != name:
+            for player_name, player in all_lawsuit_players.items():
+                if player.role == Role.ATT and player_name != name:
                     # Check if this AT&T player is already matched
-                    already_matched = False
-                    for match_data in all_matches.values():
-                        if player_name == match_data.get("att_player"):
-                            already_matched = True
-                            break
-                    if not already_matched:
+                    if not player.match_id and not player.partner_left and player_name not in matched_players:
                         unmatched_att_players.append(player_name)
             
             if unmatched_att_players:
                 att_partner = unmatched_att_players[0]
-                match_id = f"{name}_vs_{att_partner}"
-                matches_ref.child(match_id).set({
-                    "ebay_player": name,
-                    "att_player": att_partner,
-                    "ebay_guilt": guilt_status,
-                    "timestamp": time.time()
-                })
-                player_match_id = match_id
+                new_match = Match(f"{name}_vs_{att_partner}", name, att_partner, guilt_status, time.time())
                 st.success(f"🤝 You are matched with {att_partner}!")
         
         else:  # AT&T player
             # Find an unmatched eBay player
             unmatched_ebay_players = []
-            for player_name, player_data in all_lawsuit_players.items():
-                if player_data and isinstance(player_data, dict) and player_data.get("role") == "eBay" and player_name != name:
+            for player_name, player in all_lawsuit_players.items():
+                if player.role == Role.EBAY and player_name != name:
                     # Check if this eBay player is already matched
-                    already_matched = False
-                    for match_data in all_matches.values():
-                        if player_name == match_data.get("ebay_player"):
-                            already_matched = True
-                            break
-                    if not already_matched:
+                    if not player.match_id and not player.partner_left and player_name not in matched_players:
                         unmatched_ebay_players.append(player_name)
             
             if unmatched_ebay_players:
                 ebay_partner = unmatched_ebay_players[0]
-                ebay_player_data = all_lawsuit_players[ebay_partner]
-                match_id = f"{ebay_partner}_vs_{name}"
-                matches_ref.child(match_id).set({
-                    "ebay_player": ebay_partner,
-                    "att_player": name,
-                    "ebay_guilt": ebay_player_data.get("guilt_status"),
-                    "timestamp": time.time()
-                })
-                player_match_id = match_id
+                ebay_guilt = all_lawsuit_players[ebay_partner].guilt
+                new_match = Match(f"{ebay_partner}_vs_{name}", ebay_partner, name, ebay_guilt, time.time())
                 st.success(f"🤝 You are matched with {ebay_partner}!")
+        
+        if new_match:
+            batch.add(cohort.match_update(new_match))
+            player_match_id = new_match.match_id
+    
+    # Role and match (if any) land together
+    batch.commit()
     
     if not player_match_id:
+        if not class_paired and not assigned_now:
+            # Someone who left before being paired may be holding up the class
+            presence.sweep(database, all_lawsuit_players, all_matches,
+                           database.reference(presence.PRESENCE_PATH).get() or {}, expected_players,
+                           bot_settings=bot_settings)
         st.info("⏳ Waiting for a match partner...")
         time.sleep(2)
         st.rerun()
     
     # Game play
     match_ref = matches_ref.child(player_match_id)
-    match_data = match_ref.get()
+    # A completed match never changes again: after the first reveal this session shows its own copy
+    finished_matches = st.session_state.setdefault("finished_matches", {})
+    match = finished_matches.get(player_match_id)
+    first_reveal = match is None
+    pending_move = None
+    if match is None:
+        # A match created just now is already known locally
+        if new_match:
+            match_raw, deadline_settings = new_match.to_wire(), deadlines.load_settings(database)
+        else:
+            match_raw, deadline_settings = gather(
+                match_ref.get, lambda: shared.get_or_compute("deadlines", version, lambda: deadlines.load_settings(database)))
+        pending_move = write_queue.pending_value(f"lawsuit_matches/{player_match_id}")
+        if pending_move:
+            # Our own move is still being saved - show it as made
+            match_raw = {**(match_raw or {}), **pending_move}
+        match = parse_match(player_match_id, match_raw)
+        if match is None:
+            # The match was removed (partner left) - pick up the new state
+            player_facts.pop(name, None)
+            time.sleep(1)
+            st.rerun()
+        if match.is_complete and not pending_move:
+            # Only once read back: our own unsaved move may still lose to a default. Older
+            # records have no fixed payoffs yet, so work them out once for this session
+            match.final_payoffs = match.final_payoffs or match.payoffs(payoff_table)
+            finished_matches[player_match_id] = match
     
-    if role == "eBay":
+    # Out of time on our own decision: the default move is made for us
+    own_turn = ((role == Role.EBAY and match.offer is None)
+                or (role == Role.ATT and match.offer is not None and match.response is None))
+    if own_turn and not pending_move and deadlines.enforce(database, match, deadline_settings, grace=0,
+                                                                         payoff_table=payoff_table):
+        shared.bump()
+        st.rerun()
+    
+    if role == Role.EBAY:
         st.subheader("💼 Step 3: eBay's Move - Make Your Settlement Offer")
         
-        if "ebay_response" not in match_data:
-            guilt_status = match_data["ebay_guilt"]
+        if match.offer is None:
+            guilt_status = match.guilt
+            
+            st.write(f"**Reminder**: You are {label(guilt_status)}")
             
-            st.write(f"**Reminder**: You are {guilt_status}")
+            offer_deadline = deadlines.deadline(match, deadline_settings)
+            if offer_deadline is not None:
+                show_countdown(offer_deadline)
             
-            if guilt_status == "Innocent":
+            if guilt_status == Guilt.INNOCENT:
                 st.warning("⚠️ **Game Rule**: Innocent eBay is forced to offer Stingy (to simplify the strategy set)")
                 st.info("💡 **Strategic Note**: If you could offer Generous, it might signal guilt!")
                 offer_options = ["Stingy"]
@@ -871,36 +1229,34 @@ if name:
                            help="Generous = High settlement amount, Stingy = Low settlement amount")
             
             if st.button("Submit Offer"):
-                match_ref.update({
-                    "ebay_response": offer,
-                    "ebay_timestamp": time.time()
-                })
+                # Lands only if no default offer was made for us meanwhile
+                deadlines.submit_move(write_queue, match, deadlines.OFFER, parse_code(Offer, offer), time.time())
                 st.success(f"✅ You offered a {offer} settlement!")
                 st.rerun()
         else:
-            st.success(f"✅ You already submitted: {match_data['ebay_response']} offer")
+            st.success(f"✅ You already submitted: {label(match.offer)} offer")
+            if match.offer_timed_out:
+                st.caption("⏱️ Time ran out, so this default offer was made for you.")
             st.info("⏳ Waiting for AT&T's response...")
             
             # Auto-refresh to check for AT&T response
-            if "att_response" not in match_data:
-                time.sleep(2)
-                st.rerun()
+            if match.response is None:
+                wait_for_partner(match, name, deadline_settings, game_params, bot_settings)
     
-    elif role == "AT&T":
+    elif role == Role.ATT:
         st.subheader("📡 Step 4: AT&T's Response - Accept or Reject")
         
-        if "ebay_response" not in match_data:
+        if match.offer is None:
             st.info("⏳ Waiting for eBay to make an offer...")
-            time.sleep(2)
-            st.rerun()
+            wait_for_partner(match, name, deadline_settings, game_params, bot_settings)
         
-        elif "att_response" not in match_data:
-            ebay_offer = match_data["ebay_response"]
-            ebay_player = match_data["ebay_player"]
+        elif match.response is None:
+            ebay_offer = match.offer
+            ebay_player = match.ebay_player
             
-            st.info(f"💼 **{ebay_player} offered a {ebay_offer} settlement**")
+            st.info(f"💼 **{ebay_player} offered a {label(ebay_offer)} settlement**")
             
-            if ebay_offer == "Generous":
+            if ebay_offer == Offer.GENEROUS:
                 st.success("💰 **Game Rule**: Generous offers are automatically accepted!")
                 st.write("🤔 **Think**: What does this generous offer tell you about eBay's type?")
                 response = "Accept"
@@ -908,356 +1264,121 @@ if name:
             else:  # Stingy
                 st.write("🤔 **Strategic Decision**: You received a stingy offer. What should you infer?")
                 st.info("💡 **Think**: Could this be from a guilty or innocent eBay? What are the probabilities?")
+                response_deadline = deadlines.deadline(match, deadline_settings)
+                if response_deadline is not None:
+                    show_countdown(response_deadline)
                 response = st.radio("What do you do?", ["Accept", "Reject (Go to Court)"],
                                   help="Accept = Take the low settlement, Reject = Go to expensive trial")
                 auto_accept = False
             
             if st.button("Submit Response") or auto_accept:
                 response_final = "Accept" if response == "Accept" else "Reject"
-                match_ref.update({
-                    "att_response": response_final,
-                    "att_timestamp": time.time()
-                })
+                # The response completes the match: counted once it has landed (not if a default beat it)
+                deadlines.submit_move(write_queue, match, deadlines.RESPONSE, parse_code(Response, response_final),
+                                      time.time(), payoff_table,
+                                      after=lambda completed: record_outcome(completed, payoff_table))
                 st.success(f"✅ You chose to {response_final}!")
                 st.rerun()
         else:
-            st.success(f"✅ You responded: {match_data['att_response']}")
+            st.success(f"✅ You responded: {label(match.response)}")
+            if match.response_timed_out:
+                st.caption("⏱️ Time ran out, so this default response was made for you.")
     
     # Show results when both completed
-    if "ebay_response" in match_data and "att_response" in match_data:
+    if match.is_complete:
         st.header("🎯 Step 5: Results - The Truth is Revealed!")
         
-        ebay_player = match_data["ebay_player"]
-        att_player = match_data["att_player"]
-        guilt = match_data["ebay_guilt"]
-        offer = match_data["ebay_response"]
-        response = match_data["att_response"]
+        # Everything shown here was fixed when the match completed (see game_records.MatchResult)
+        result = match.result()
         
         # Show the revelation
         st.subheader("🔍 What Really Happened:")
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.info(f"**eBay's Type**\n{guilt}")
+            st.info(f"**eBay's Type**\n{label(result.guilt)}")
         with col2:
-            st.info(f"**eBay's Offer**\n{offer}")
+            st.info(f"**eBay's Offer**\n{label(result.offer)}")
         with col3:
-            st.info(f"**AT&T's Response**\n{response}")
-        
-        # Calculate payoffs based on correct payoff matrix
-        if guilt == "Guilty":
-            if offer == "Generous" and response == "Accept":
-                ebay_payoff, att_payoff = -200, 200
-            elif offer == "Stingy" and response == "Accept":
-                ebay_payoff, att_payoff = -20, 20
-            else:  # Stingy + Reject (Trial)
-                ebay_payoff, att_payoff = -320, 300
-        else:  # Innocent
-            if offer == "Generous" and response == "Accept":
-                # This shouldn't happen since innocent can't offer generous
-                ebay_payoff, att_payoff = 0, 0  
-            elif offer == "Stingy" and response == "Accept":
-                ebay_payoff, att_payoff = -20, 20
-            else:  # Stingy + Reject (Trial)
-                ebay_payoff, att_payoff = 0, -20
+            st.info(f"**AT&T's Response**\n{label(result.response)}")
         
         # Show payoffs with explanation
         st.subheader("💰 Final Payoffs:")
         col1, col2 = st.columns(2)
         with col1:
-            st.success(f"**eBay ({ebay_player})**\nPayoff: {ebay_payoff}")
+            st.success(f"**eBay ({match.ebay_player})**\nPayoff: {result.ebay_payoff}")
         with col2:
-            st.success(f"**AT&T ({att_player})**\nPayoff: {att_payoff}")
+            st.success(f"**AT&T ({match.att_player})**\nPayoff: {result.att_payoff}")
         
         # Outcome explanation
-        if response == "Reject":
-            st.write("⚖️ **Outcome**: Went to court! Both sides paid legal fees.")
-            if guilt == "Guilty":
-                st.write("🔍 **Court Result**: eBay was found guilty and paid damages plus legal costs")
-            else:
-                st.write("🔍 **Court Result**: eBay was found innocent - AT&T paid all legal costs!")
-        else:
-            st.write("🤝 **Outcome**: Settled out of court - no legal fees!")
-            st.write(f"💸 **Settlement**: AT&T accepted the {offer.lower()} offer")
+        for line in result.narrative:
+            st.write(line)
         
-        st.balloons()
+        if first_reveal:
+            st.balloons()
+        if round_no is not None and round_no < len(player_info.schedule):
+            # More rounds to go - the summary comes after the last one
+            st.success(f"✅ Round {round_no} complete!")
+            if st.button("▶️ Next Round"):
+                rounds.advance(database, [name], player_info.schedule[round_no], round_no + 1)
+                st.session_state[f"round_{name}"] = round_no + 1
+                st.rerun()
+            st.stop()
         st.success("✅ Your match is complete! Thank you for playing.")
         
+        # Both summaries below come from the outcome counters (see outcome_tally.py)
+        tally = shared.get_or_compute("tally", shared.version(database), lambda: outcome_tally.load(database))
+        
+        # Check if all matches completed for results display
+        completed_matches = tally.completed
+        
+        expected_matches = rounds.expected_matches(expected_players, round_settings)
+        
         # Add Summary Analysis for AT&T participants immediately after their match
-        if role == "AT&T":
+        # (once the whole class is done, everyone gets it below)
+        if role == Role.ATT and completed_matches < expected_matches:
             st.header("📊 Step 6: Summary Analysis - Class Results vs Game Theory")
             
-            # Get all completed matches for analysis
-            all_matches = db.reference("lawsuit_matches").get() or {}
-            completed_results = []
-            
-            for match_data in all_matches.values():
-                if "ebay_response" in match_data and "att_response" in match_data:
-                    completed_results.append({
-                        "guilt": match_data["ebay_guilt"],
-                        "offer": match_data["ebay_response"],
-                        "response": match_data["att_response"]
-                    })
-            
-            if len(completed_results) >= 1:
-                st.subheader("🎯 Key Strategic Insights")
-                
-                # Separate data by guilt status
-                guilty_offers = [r["offer"] for r in completed_results if r["guilt"] == "Guilty"]
-                innocent_offers = [r["offer"] for r in completed_results if r["guilt"] == "Innocent"]
-                stingy_responses = [r["response"] for r in completed_results if r["offer"] == "Stingy"]
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if guilty_offers and innocent_offers:
-                        guilty_stingy_pct = len([o for o in guilty_offers if o == "Stingy"]) / len(guilty_offers) * 100
-                        innocent_stingy_pct = len([o for o in innocent_offers if o == "Stingy"]) / len(innocent_offers) * 100
-                        
-                        fig, ax = plt.subplots(figsize=(8, 5))
-                        categories = ['Guilty eBay', 'Innocent eBay']
-                        percentages = [guilty_stingy_pct, innocent_stingy_pct]
-                        colors = ['#e74c3c', '#2ecc71']
-                        
-                        bars = ax.bar(categories, percentages, color=colors, alpha=0.8)
-                        ax.set_title("% Choosing Stingy by eBay Type", fontsize=14, fontweight='bold')
-                        ax.set_ylabel("Percentage (%)")
-                        ax.set_ylim(0, 110)
-                        
-                        for bar, pct in zip(bars, percentages):
-                            ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                                   f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                        
-                        ax.grid(True, alpha=0.3)
-                        plt.tight_layout()
-                        st.pyplot(fig)
-                    else:
-                        st.info("More data needed for guilt comparison")
-                
-                with col2:
-                    if stingy_responses:
-                        accept_count = len([r for r in stingy_responses if r == "Accept"])
-                        accept_pct = accept_count / len(stingy_responses) * 100
-                        
-                        fig, ax = plt.subplots(figsize=(8, 5))
-                        categories = ['Accept', 'Reject']
-                        percentages_vals = [accept_pct, 100 - accept_pct]
-                        colors = ['#3498db', '#e74c3c']
-                        
-                        bars = ax.bar(categories, percentages_vals, color=colors, alpha=0.8)
-                        ax.set_title("AT&T Responses to Stingy Offers", fontsize=14, fontweight='bold')
-                        ax.set_ylabel("Percentage (%)")
-                        ax.set_ylim(0, 110)
-                        
-                        for bar, pct in zip(bars, percentages_vals):
-                            ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                                   f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                        
-                        ax.grid(True, alpha=0.3)
-                        plt.tight_layout()
-                        st.pyplot(fig)
-                    else:
-                        st.info("No stingy offers data yet")
-                
-                # Game Theory Analysis
-                st.subheader("🧮 Theory vs Your Class Results")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    if stingy_responses:
-                        accept_stingy_pct = len([r for r in stingy_responses if r == "Accept"]) / len(stingy_responses) * 100
-                        st.metric("AT&T Accept Stingy", f"{accept_stingy_pct:.1f}%", "Theory: 40%")
-                    else:
-                        st.metric("AT&T Accept Stingy", "N/A", "Theory: 40%")
-                
-                with col2:
-                    if guilty_offers:
-                        guilty_stingy_pct = len([o for o in guilty_offers if o == "Stingy"]) / len(guilty_offers) * 100
-                        st.metric("Guilty Choose Stingy", f"{guilty_stingy_pct:.1f}%", "Theory: ~43%")
-                    else:
-                        st.metric("Guilty Choose Stingy", "N/A", "Theory: ~43%")
-                
-                with col3:
-                    if innocent_offers:
-                        innocent_stingy_pct = len([o for o in innocent_offers if o == "Stingy"]) / len(innocent_offers) * 100
-                        st.metric("Innocent Choose Stingy", f"{innocent_stingy_pct:.1f}%", "Theory: 100%")
-                    else:
-                        st.metric("Innocent Choose Stingy", "N/A", "Theory: 100%")
-                
-                # Bayesian Insight
-                st.subheader("🔍 Bayesian Insight")
-                if stingy_responses:
-                    st.success(f"""
-                    **Key Discovery**: When you see a Stingy offer, the probability eBay is guilty is only ~12.5%!
-                    
-                    **Your Experience**: {len(stingy_responses)} stingy offers made, AT&T accepted {len([r for r in stingy_responses if r == "Accept"])} of them.
-                    
-                    **Why?** Most stingy offers come from innocent eBay players (forced to offer stingy), not guilty ones mixing strategies.
-                    """)
+            if tally.completed >= 1:
+                show_summary_analysis(game_params, tally)
                 
                 st.info("🎓 **You've experienced strategic signaling and Bayesian updating in action!**")
         
-        # Check if all matches completed for results display
-        expected_players = db.reference("lawsuit_expected_players").get() or 0
-        all_matches = db.reference("lawsuit_matches").get() or {}
-        completed_matches = 0
-        for match_data in all_matches.values():
-            if "ebay_response" in match_data and "att_response" in match_data:
-                completed_matches += 1
-        
-        expected_matches = expected_players // 2
-        
         if completed_matches >= expected_matches:
             st.header("📊 Step 6: Summary Analysis - Class Results vs Game Theory")
+            show_summary_analysis(game_params, tally)
             
-            # Collect all results
-            ebay_offers = []
-            att_responses = []
-            guilt_statuses = []
-            guilty_offers = []
-            innocent_offers = []
-            stingy_responses = []
-            
-            for match_data in all_matches.values():
-                if "ebay_response" in match_data and "att_response" in match_data:
-                    guilt = match_data["ebay_guilt"]
-                    offer = match_data["ebay_response"]
-                    response = match_data["att_response"]
-                    
-                    ebay_offers.append(offer)
-                    att_responses.append(response)
-                    guilt_statuses.append(guilt)
-                    
-                    # Separate by guilt status
-                    if guilt == "Guilty":
-                        guilty_offers.append(offer)
-                    else:
-                        innocent_offers.append(offer)
-                    
-                    # AT&T responses to stingy offers only
-                    if offer == "Stingy":
-                        stingy_responses.append(response)
-            
-            # Show key visualization as requested
-            st.subheader("🎯 Key Strategic Analysis")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                # % of guilty vs innocent choosing Stingy
-                if guilty_offers and innocent_offers:
-                    guilty_stingy = len([o for o in guilty_offers if o == "Stingy"])
-                    innocent_stingy = len([o for o in innocent_offers if o == "Stingy"])
-                    
-                    guilty_stingy_pct = guilty_stingy / len(guilty_offers) * 100
-                    innocent_stingy_pct = innocent_stingy / len(innocent_offers) * 100
-                    
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    categories = ['Guilty eBay', 'Innocent eBay']
-                    percentages = [guilty_stingy_pct, innocent_stingy_pct]
-                    colors = ['#e74c3c', '#2ecc71']
-                    
-                    bars = ax.bar(categories, percentages, color=colors, alpha=0.8)
-                    ax.set_title("% Choosing Stingy Offer by eBay Type", fontsize=14, fontweight='bold')
-                    ax.set_ylabel("Percentage (%)")
-                    ax.set_ylim(0, 110)
-                    
-                    # Add value labels
-                    for bar, pct in zip(bars, percentages):
-                        ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                               f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                    
-                    ax.grid(True, alpha=0.3)
-                    plt.tight_layout()
-                    st.pyplot(fig)
-                else:
-                    st.info("Need both guilty and innocent players to show this analysis")
-            
-            with col2:
-                # % of AT&T accepting stingy offers
-                if stingy_responses:
-                    accept_stingy = len([r for r in stingy_responses if r == "Accept"])
-                    accept_pct = accept_stingy / len(stingy_responses) * 100
-                    
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    categories = ['Accept', 'Reject']
-                    accept_count = len([r for r in stingy_responses if r == "Accept"])
-                    reject_count = len([r for r in stingy_responses if r == "Reject"])
-                    
-                    values = [accept_count, reject_count]
-                    percentages_vals = [v/len(stingy_responses)*100 for v in values]
-                    colors = ['#3498db', '#e74c3c']
-                    
-                    bars = ax.bar(categories, percentages_vals, color=colors, alpha=0.8)
-                    ax.set_title("AT&T Responses to Stingy Offers", fontsize=14, fontweight='bold')
-                    ax.set_ylabel("Percentage (%)")
-                    ax.set_ylim(0, 110)
-                    
-                    # Add value labels
-                    for bar, pct in zip(bars, percentages_vals):
-                        ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 2,
-                               f'{pct:.1f}%', ha='center', va='bottom', fontweight='bold')
-                    
-                    ax.grid(True, alpha=0.3)
-                    plt.tight_layout()
-                    st.pyplot(fig)
-                else:
-                    st.info("No stingy offers made yet")
-            
-            # Game Theory Analysis
-            st.subheader("🧮 Game Theory Predictions vs Your Class")
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                if stingy_responses:
-                    accept_stingy_pct = len([r for r in stingy_responses if r == "Accept"]) / len(stingy_responses) * 100
-                    st.metric("AT&T Accept Stingy Offers", f"{accept_stingy_pct:.1f}%", "Theory: 40%")
-                else:
-                    st.metric("AT&T Accept Stingy Offers", "N/A", "Theory: 40%")
-            
-            with col2:
-                if guilty_offers:
-                    guilty_stingy_pct = len([o for o in guilty_offers if o == "Stingy"]) / len(guilty_offers) * 100
-                    st.metric("Guilty eBay Choose Stingy", f"{guilty_stingy_pct:.1f}%", "Theory: ~43%")
-                else:
-                    st.metric("Guilty eBay Choose Stingy", "N/A", "Theory: ~43%")
-            
-            with col3:
-                if innocent_offers:
-                    innocent_stingy_pct = len([o for o in innocent_offers if o == "Stingy"]) / len(innocent_offers) * 100
-                    st.metric("Innocent eBay Choose Stingy", f"{innocent_stingy_pct:.1f}%", "Theory: 100%")
-                else:
-                    st.metric("Innocent eBay Choose Stingy", "N/A", "Theory: 100%")
-            
-            # Bayesian Analysis
-            st.subheader("🔍 Bayesian Analysis")
-            if stingy_responses:
-                st.info(f"""
-                **Key Insight**: When you see a **Stingy** offer, what's the probability eBay is guilty?
-                
-                **Your Class Results**: 
-                - {len(stingy_responses)} stingy offers were made
-                - AT&T accepted {len([r for r in stingy_responses if r == "Accept"])} of them ({accept_stingy_pct:.1f}%)
-                
-                **Theoretical Prediction**: 
-                - P(Guilty | Stingy Offer) ≈ 12.5% 
-                - Most stingy offers actually come from innocent parties!
-                """)
+            # How play changed from round to round (per-round counts folded from the event log)
+            if multi_round:
+                if "round_consumer" not in st.session_state:
+                    st.session_state.round_stats = rounds.RoundStats()
+                    # Only this game's part of the log, not every game played on this database
+                    st.session_state.round_consumer = game_events.EventConsumer(
+                        database, handler=st.session_state.round_stats.handle, cursor=game_events.game_start(database))
+                st.session_state.round_consumer.poll()
+                show_learning_curve(st.session_state.round_stats, game_params)
             
             st.success("🎉 **Dynamic Signaling Game Complete!** You've experienced Nash Equilibrium, Bayesian updating, and strategic signaling in action!")
 
 # Show game status
 st.sidebar.header("🎮 Game Status")
 try:
-    players_raw = db.reference("lawsuit_players").get()
-    players = players_raw if isinstance(players_raw, dict) else {}
-    expected = db.reference("lawsuit_expected_players").get() or 0
-except:
-    players = {}
+    expected = expected_players
+    registered = join_queue.registered_count()  # the registration counters, read once per process per second
+except Exception:
+    registered = 0
     expected = 0
 
-registered = len(players)
-
 st.sidebar.write(f"**Players**: {registered}/{expected}")
 
 if expected > 0:
     progress = min(registered / expected, 1.0)
     st.sidebar.progress(progress)
+
+# Background writes not yet confirmed by the database
+unsaved = write_queue.pending_count()
+if unsaved:
+    if write_queue.last_error is not None:
+        st.sidebar.warning(f"⚠️ Connection problem - retrying {unsaved} unsaved action(s)")
+    else:
+        st.sidebar.caption(f"💾 Saving {unsaved} action(s)...")
@@ -0,0 +1,64 @@
+import pytest
+
+import admission
+import background
+import cohort
+import faulty_db
+from game_records import Player, parse_players
+from memory_db import MemoryDatabase
+
+
+@pytest.fixture(autouse=True)
+def quick_backoff(monkeypatch):
+    monkeypatch.setattr(background, "MIN_BACKOFF", 0.001)
+    monkeypatch.setattr(background, "MAX_BACKOFF", 0.01)
+
+
+def players(count, now=1000.0):
+    return [Player(f"p{i:04d}", now + i) for i in range(count)]
+
+
+def test_joins_are_written_in_batches():
+    database = MemoryDatabase()
+    queue = admission.JoinQueue(database, interval=0.2)
+    joining = players(admission.JOIN_BATCH * 2 + 1)
+    assert [queue.admit(player) for player in joining[:3]] == [1, 2, 3]
+    for player in joining[3:]:
+        queue.admit(player)
+    assert queue.admit(joining[1]) == 2  # a rerun keeps its place
+    assert queue.flush()
+    assert database.stats["update"] == 3
+    assert set(parse_players(database.reference("lawsuit_players").get())) == {p.name for p in joining}
+    assert queue.registered_count() == len(joining)
+    assert queue.position(joining[0].name) is None
+
+
+def test_a_full_queue_turns_joins_away():
+    queue = admission.JoinQueue(MemoryDatabase(), interval=0.2, max_queued=2)
+    first, second, third = players(3)
+    assert queue.admit(first) == 1 and queue.admit(second) == 2
+    assert queue.admit(third) is None
+    assert queue.queued_player(second.name) == second
+
+
+def test_joins_are_counted_once_through_faults():
+    database = MemoryDatabase()
+    faulty = faulty_db.FaultyDatabase(database, faulty_db.parse_profile("errors=0.3,lost=0.3,seed=6"))
+    queue = admission.JoinQueue(faulty, interval=0.001)
+    joining = players(300)
+    for player in joining:
+        queue.admit(player)
+    assert queue.flush()
+    assert len(database.reference("lawsuit_players").get()) == len(joining)
+    assert cohort.registered_count(database) == len(joining)
+
+
+def test_forget_drops_joins_not_yet_written():
+    database = MemoryDatabase()
+    queue = admission.JoinQueue(database, interval=0.2)
+    for player in players(5):
+        queue.admit(player)
+    queue.forget()
+    assert queue.flush()
+    assert database.reference("lawsuit_players").get() is None
+    assert queue.position("p0000") is None
@@ -0,0 +1,50 @@
+import math
+
+import pytest
+
+import class_stats
+import equilibrium
+from game_records import Guilt, Match, Offer, Response
+
+
+def test_outcome_counts_skip_unfinished_and_impossible_matches():
+    matches = [
+        Match("m1", "a", "b", Guilt.GUILTY, 0, Offer.STINGY, 1, Response.REJECT, 2),
+        Match("m2", "c", "d", Guilt.INNOCENT, 0, Offer.STINGY, 1, Response.ACCEPT, 2),
+        Match("m3", "e", "f", Guilt.INNOCENT, 0, Offer.GENEROUS, 1, Response.ACCEPT, 2),
+        Match("m4", "g", "h", Guilt.GUILTY, 0, Offer.STINGY, 1),
+    ]
+    assert class_stats.outcome_counts(matches) == (0, 0, 1, 1, 0)
+
+
+def test_exact_interval_known_values():
+    # Clopper-Pearson for 5/10 at 95%
+    lower, upper = class_stats.exact_interval(5, 10)
+    assert lower == pytest.approx(0.18709, abs=1e-4)
+    assert upper == pytest.approx(0.81291, abs=1e-4)
+    assert class_stats.exact_interval(0, 10)[0] == 0.0
+    assert class_stats.exact_interval(10, 10)[1] == 1.0
+    assert all(math.isnan(x) for x in class_stats.exact_interval(0, 0))
+
+
+def test_binomial_test_known_values():
+    assert class_stats.binomial_test(5, 10, 0.5) == pytest.approx(1.0)
+    assert class_stats.binomial_test(9, 10, 0.5) == pytest.approx(22 / 1024)
+    assert class_stats.binomial_pmf(10, 0.3).sum() == pytest.approx(1.0)
+
+
+def test_class_report_rows():
+    counts = (4, 3, 2, 20, 11)
+    rows = {row["Metric"]: row for row in class_stats.class_report(counts, replicates=2_000)}
+    accept = rows["AT&T accept Stingy"]
+    assert (accept["n"], accept["Class"]) == (36, pytest.approx(23 / 36))
+    assert accept["Theory"] == pytest.approx(equilibrium.solve().accept_stingy)
+    for row in rows.values():
+        for low, high in (row["Exact CI"], row["Bootstrap CI"]):
+            assert 0 <= low <= row["Class"] <= high <= 1
+        assert 0 <= row["p-value"] <= 1
+
+
+def test_class_report_without_data():
+    rows = class_stats.class_report((0, 0, 0, 0, 0))
+    assert all(row["Class"] is None and row["Verdict"] == "No data yet" for row in rows)
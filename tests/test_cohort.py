@@ -0,0 +1,12 @@
+import cohort
+from memory_db import MemoryDatabase
+
+
+def test_pairing_claim_belongs_to_its_token_not_the_name():
+    database = MemoryDatabase()
+    assert cohort.claim_pairing(database, "alice", "tab-1", now=100) == "claimed"
+    assert cohort.claim_pairing(database, "alice", "tab-1", now=101) == "claimed"  # a rerun of the same tab
+    assert cohort.claim_pairing(database, "alice", "tab-2", now=102) == "in_progress"  # a second tab, same name
+    assert cohort.claim_pairing(database, "bob", now=102 + cohort.PAIRING_LOCK_TIMEOUT) == "claimed"  # stalled claim
+    database.reference(cohort.PAIRING_PATH).update({"done": True})
+    assert cohort.claim_pairing(database, "alice", "tab-1", now=200) == "done"
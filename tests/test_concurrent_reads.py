@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+import concurrent_reads
+
+
+def test_results_come_back_in_argument_order():
+    def slow(value, delay):
+        return lambda: time.sleep(delay) or value
+
+    assert concurrent_reads.gather(slow("a", 0.03), slow("b", 0.0), slow("c", 0.01)) == ["a", "b", "c"]
+    assert concurrent_reads.gather() == []
+
+
+def test_first_error_in_argument_order_wins_after_all_finish():
+    finished = []
+
+    def fail(message, delay):
+        def call():
+            time.sleep(delay)
+            finished.append(message)
+            raise ValueError(message)
+        return call
+
+    with pytest.raises(ValueError, match="first"):
+        concurrent_reads.gather(fail("first", 0.03), fail("second", 0.0), lambda: "ok")
+    assert sorted(finished) == ["first", "second"]
+
+
+def test_threads_stay_bounded():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    concurrent_reads.gather(*[call] * (concurrent_reads.MAX_WORKERS * 3))
+    assert peak[0] <= concurrent_reads.MAX_WORKERS
+
+
+def test_nested_gather_runs_inline():
+    def outer():
+        return concurrent_reads.gather(lambda: 1, lambda: 2)
+
+    assert concurrent_reads.gather(*[outer] * (concurrent_reads.MAX_WORKERS * 2)) == [[1, 2]] * (
+        concurrent_reads.MAX_WORKERS * 2)
@@ -0,0 +1,98 @@
+import deadlines
+import faulty_db
+import game_events
+import outcome_tally
+import write_behind
+from game_records import Guilt, Match, Offer, Response, parse_match
+from memory_db import MemoryDatabase
+
+SETTINGS = {**deadlines.DEFAULT_SETTINGS, "offer_seconds": 30, "response_seconds": 30}
+
+
+def open_match(database, now=1000.0, offer=None):
+    match = Match("e_vs_a", "e", "a", Guilt.GUILTY, now, offer, now + 5 if offer else None)
+    database.reference(f"lawsuit_matches/{match.match_id}").set(match.to_wire())
+    return match
+
+
+def stored(database, match_id="e_vs_a"):
+    return parse_match(match_id, database.reference(f"lawsuit_matches/{match_id}").get())
+
+
+class CountersDownFor:
+    """Counter writes fail ``failures`` times before they get through."""
+
+    def __init__(self, database, failures):
+        self.database = database
+        self.failures = failures
+
+    def reference(self, path="/"):
+        if path == outcome_tally.OUTCOMES_PATH and self.failures > 0:
+            self.failures -= 1
+            raise faulty_db.InjectedFault("injected counter failure")
+        return self.database.reference(path)
+
+
+def test_enforce_applies_the_default_once_overdue():
+    database = MemoryDatabase()
+    match = open_match(database)
+    assert deadlines.enforce(database, match, SETTINGS, now=1020) is None
+    assert deadlines.enforce(database, match, SETTINGS, now=1040) == deadlines.OFFER
+    assert deadlines.enforce(database, match, SETTINGS, now=1041) is None  # the stale copy lost the race
+    assert stored(database).offer_timed_out
+
+
+def test_a_count_that_fails_is_retried_in_the_background(monkeypatch):
+    monkeypatch.setattr(outcome_tally, "RETRY_DELAY", 0)
+    database = MemoryDatabase()
+    flaky = CountersDownFor(database, outcome_tally.RECORD_ATTEMPTS + 1)
+    match = open_match(database, offer=Offer.STINGY)
+    assert deadlines.enforce(flaky, match, SETTINGS, now=1050) == deadlines.RESPONSE
+    assert write_behind.queue_for(flaky).flush()
+    assert outcome_tally.load(database) == outcome_tally.from_matches([stored(database)])
+    assert stored(database).response == Response.ACCEPT
+
+
+def test_defaults_follow_the_rules():
+    guilty = Match("m", "e", "a", Guilt.GUILTY, 0)
+    innocent = Match("m", "e", "a", Guilt.INNOCENT, 0)
+    generous = Match("m", "e", "a", Guilt.GUILTY, 0, Offer.GENEROUS, 1)
+    stingy = Match("m", "e", "a", Guilt.GUILTY, 0, Offer.STINGY, 1)
+    settings = {**SETTINGS, "offer_default": "Generous", "response_default": "Reject"}
+    assert deadlines.default_offer(guilty, settings) == Offer.GENEROUS
+    assert deadlines.default_offer(innocent, settings) == Offer.STINGY  # innocent eBay may only offer Stingy
+    assert deadlines.default_response(stingy, settings) == Response.REJECT
+    assert deadlines.default_response(generous, settings) == Response.ACCEPT  # generous offers are always accepted
+    random_settings = {**SETTINGS, "offer_default": deadlines.RANDOM}
+    assert {deadlines.default_offer(guilty, random_settings) for _ in range(50)} == {Offer.GENEROUS, Offer.STINGY}
+
+
+def offer_events(database):
+    return [event for event in (database.reference(game_events.EVENTS_PATH).get() or {}).values()
+            if event["kind"] == game_events.OFFER]
+
+
+def test_a_default_that_lands_first_declines_the_queued_click():
+    database = MemoryDatabase()
+    match = open_match(database)
+    queue = write_behind.WriteQueue(database, batch_window=0.2)
+    followed = []
+    deadlines.submit_move(queue, match, deadlines.OFFER, Offer.GENEROUS, 1029, after=followed.append)
+    assert deadlines.enforce(database, match, SETTINGS, now=1040) == deadlines.OFFER
+    assert queue.flush()
+    assert stored(database).offer == Offer.STINGY and stored(database).offer_timed_out
+    assert followed == []
+    assert [event.get("timed_out") for event in offer_events(database)] == [True]
+
+
+def test_a_click_that_lands_first_is_kept():
+    database = MemoryDatabase()
+    match = open_match(database)
+    queue = write_behind.WriteQueue(database, batch_window=0.01)
+    followed = []
+    deadlines.submit_move(queue, match, deadlines.OFFER, Offer.GENEROUS, 1029, after=followed.append)
+    assert queue.flush()
+    assert deadlines.enforce(database, match, SETTINGS, now=1040) is None  # enforcing from a stale copy
+    assert stored(database).offer == Offer.GENEROUS and not stored(database).offer_timed_out
+    assert [moved.offer for moved in followed] == [Offer.GENEROUS]
+    assert [event.get("timed_out") for event in offer_events(database)] == [None]
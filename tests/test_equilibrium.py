@@ -0,0 +1,42 @@
+import pytest
+
+import equilibrium
+from game_records import Guilt, Offer, Response
+
+GUILTY_GENEROUS = (Guilt.GUILTY, Offer.GENEROUS, Response.ACCEPT)
+
+
+def test_baseline_is_semi_separating():
+    theory = equilibrium.solve(equilibrium.GameParameters())
+    assert theory.kind == "semi-separating"
+    assert theory.accept_stingy == pytest.approx(0.4)
+    assert theory.posterior == pytest.approx(1 / 8)
+    assert theory.guilty_stingy == pytest.approx(3 / 7)
+    assert theory.innocent_stingy == 1.0
+    assert theory.guilty_payoff == pytest.approx(-200)
+    assert theory.ebay_payoff == pytest.approx(-56)
+
+
+def test_posterior_is_consistent_with_the_strategies():
+    for prior in (0.2, 0.25, 0.5, 0.9):
+        params = equilibrium.GameParameters().with_prior(prior)
+        theory = equilibrium.solve(params)
+        stingy = prior * theory.guilty_stingy + (1 - prior)
+        assert theory.posterior == pytest.approx(prior * theory.guilty_stingy / stingy)
+
+
+def test_low_prior_pools_on_stingy():
+    theory = equilibrium.solve(equilibrium.GameParameters().with_prior(0.1))
+    assert (theory.kind, theory.guilty_stingy, theory.accept_stingy) == ("pooling", 1.0, 1.0)
+    assert theory.posterior == pytest.approx(0.1)
+
+
+def test_cheap_generous_offer_separates():
+    theory = equilibrium.solve(equilibrium.GameParameters().with_payoff(GUILTY_GENEROUS, -10, 10))
+    assert (theory.kind, theory.guilty_stingy, theory.posterior) == ("separating", 0.0, 0.0)
+
+
+def test_parameters_wire_round_trip():
+    params = equilibrium.GameParameters().with_prior(0.4).with_payoff(GUILTY_GENEROUS, -150, 150)
+    assert equilibrium.GameParameters.from_wire(params.to_wire()) == params
+    assert equilibrium.GameParameters.from_wire(None) == equilibrium.GameParameters()
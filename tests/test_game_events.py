@@ -0,0 +1,66 @@
+import random
+import time
+
+import cohort
+import deadlines
+import game_events
+from game_records import Guilt, Offer, Response, parse_matches, parse_players
+from memory_db import MemoryDatabase
+
+
+def play_game(players=6, seed=1):
+    """A class that joins, is paired and plays every match through the live write paths."""
+    rng = random.Random(seed)
+    now = time.time()
+    database = MemoryDatabase({"lawsuit_expected_players": players})
+    for i in range(players):
+        cohort.register_player(database, f"p{i}", now=now - 60 + i)
+    cohort.pair_all(database, parse_players(database.reference("lawsuit_players").get()), players, rng)
+    matches = sorted(parse_matches(database.reference("lawsuit_matches").get()).values(), key=lambda m: m.match_id)
+    for i, match in enumerate(matches):
+        offer = Offer.GENEROUS if match.guilt == Guilt.GUILTY else Offer.STINGY
+        deadlines.apply_move(database, match, deadlines.OFFER, offer, now + 10 + i)
+        match = parse_matches(database.reference("lawsuit_matches").get())[match.match_id]
+        response = Response.REJECT if i % 2 and offer == Offer.STINGY else Response.ACCEPT
+        deadlines.apply_move(database, match, deadlines.RESPONSE, response, now + 20 + i, timed_out=i == 0)
+    return database
+
+
+def test_fold_matches_live_trees():
+    database = play_game()
+    state = game_events.fold_events(database.reference(game_events.EVENTS_PATH).get())
+    assert state["players"] == database.reference("lawsuit_players").get()
+    assert state["matches"] == database.reference("lawsuit_matches").get()
+    assert all("pe" in match for match in state["matches"].values())
+
+
+def test_replay_ends_in_the_fold():
+    events = play_game().reference(game_events.EVENTS_PATH).get()
+    steps = list(game_events.replay(events, speed=None))
+    assert len(steps) == len(events)
+    assert steps[-1][1] == game_events.fold_events(events)
+
+
+def test_fold_continues_from_a_partial_state():
+    pairs = game_events.sorted_events(play_game().reference(game_events.EVENTS_PATH).get())
+    half = len(pairs) // 2
+    state = game_events.fold_events(dict(pairs[:half]))
+    assert game_events.fold_events(dict(pairs[half:]), state) == game_events.fold_events(dict(pairs))
+
+
+def test_reset_clears_the_game():
+    database = play_game()
+    database.reference("/").update(game_events.reset_update(time.time() + 60))
+    game_events.log_event(database, game_events.JOIN, player="late", ts=time.time() + 70)
+    events = database.reference(game_events.EVENTS_PATH).get()
+    assert list(game_events.fold_events(events)["players"]) == ["late"]
+    assert [len(game) for game in game_events.split_games(events)] == [len(events) - 2, 1]
+
+
+def test_consumer_starts_at_the_current_game():
+    database = play_game()
+    database.reference("/").update(game_events.reset_update(time.time() + 60))
+    cohort.register_player(database, "late", now=time.time() + 70)
+    consumer = game_events.EventConsumer(database, cursor=game_events.game_start(database))
+    assert consumer.poll() == 1  # just the join after the reset
+    assert consumer.state == game_events.fold_events(database.reference(game_events.EVENTS_PATH).get())
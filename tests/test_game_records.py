@@ -0,0 +1,67 @@
+from game_records import (SCHEMA_VERSION, Guilt, Match, Offer, Player, Response, Role, migrate, parse_match,
+                          parse_matches, parse_players)
+from memory_db import MemoryDatabase
+
+
+def test_player_round_trip():
+    player = Player("alice", 1712.5, Role.EBAY, Guilt.GUILTY, "alice_vs_bob", ("alice_vs_bob", "alice_vs_carol"))
+    wire = player.to_wire()
+    assert wire["v"] == SCHEMA_VERSION
+    assert parse_players({"alice": wire}) == {"alice": player}
+
+
+def test_new_player_round_trip():
+    player = Player("alice", 1712.5)
+    assert player.to_wire() == {"v": SCHEMA_VERSION, "t": 1712.5}
+    assert parse_players({"alice": player.to_wire()})["alice"] == player
+
+
+def test_match_round_trip():
+    match = Match("m1", "alice", "bob", Guilt.INNOCENT, 100.0, Offer.STINGY, 105.0, Response.REJECT, 111.0,
+                  offer_timed_out=True, response_timed_out=True, round_no=2, final_payoffs=(0, -20))
+    assert parse_match("m1", match.to_wire()) == match
+
+
+def test_unfinished_match_round_trip():
+    match = Match("m1", "alice", "bob", Guilt.GUILTY, 100.0)
+    assert parse_match("m1", match.to_wire()) == match
+    assert parse_match("m1", match.to_wire()).result() is None
+
+
+def test_result_keeps_the_payoffs_fixed_at_completion():
+    match = Match("m1", "alice", "bob", Guilt.GUILTY, 100.0, Offer.STINGY, 105.0, Response.ACCEPT, 111.0,
+                  final_payoffs=(-1, 1))
+    assert (match.result().ebay_payoff, match.result().att_payoff) == (-1, 1)
+    legacy = parse_match("m1", {k: v for k, v in match.to_wire().items() if k not in ("pe", "pa")})
+    assert (legacy.result().ebay_payoff, legacy.result().att_payoff) == legacy.payoffs()
+
+
+def test_legacy_nodes_parse():
+    players = parse_players({"alice": {"timestamp": 1.0, "role": "eBay", "guilt_status": "Guilty"}})
+    assert players["alice"] == Player("alice", 1.0, Role.EBAY, Guilt.GUILTY)
+    matches = parse_matches({"m1": {"ebay_player": "alice", "att_player": "bob", "ebay_guilt": "Guilty",
+                                    "timestamp": 2.0, "ebay_response": "Stingy", "ebay_timestamp": 3.0,
+                                    "att_response": "Accept", "att_timestamp": 4.0}})
+    assert matches["m1"] == Match("m1", "alice", "bob", Guilt.GUILTY, 2.0, Offer.STINGY, 3.0, Response.ACCEPT, 4.0)
+
+
+def test_junk_entries_are_dropped():
+    assert parse_players({"alice": "junk", "bob": {"v": 1, "t": 1.0}}) == {"bob": Player("bob", 1.0)}
+    assert parse_matches(None) == {}
+
+
+def test_migrate_rewrites_legacy_nodes_once():
+    database = MemoryDatabase({
+        "lawsuit_players": {"alice": {"timestamp": 1.0, "role": "eBay", "guilt_status": "Innocent"},
+                            "bob": Player("bob", 2.0, Role.ATT).to_wire()},
+        "lawsuit_matches": {"m1": {"ebay_player": "alice", "att_player": "bob", "ebay_guilt": "Innocent",
+                                   "timestamp": 3.0}},
+    })
+    before = (parse_players(database.reference("lawsuit_players").get()),
+              parse_matches(database.reference("lawsuit_matches").get()))
+    assert migrate(database) == 2
+    assert database.reference("lawsuit_players/alice/v").get() == SCHEMA_VERSION
+    assert database.reference("lawsuit_matches/m1/v").get() == SCHEMA_VERSION
+    assert (parse_players(database.reference("lawsuit_players").get()),
+            parse_matches(database.reference("lawsuit_matches").get())) == before
+    assert migrate(database) == 0
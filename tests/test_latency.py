@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+import latency
+from game_records import Guilt, Match, Offer, Response
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(0)
+    values = sorted(rng.lognormvariate(2, 1) for _ in range(5_000))
+    sketch = latency.QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=latency.RELATIVE_ACCURACY)
+    assert (sketch.min, sketch.max, sketch.count) == (values[0], values[-1], len(values))
+    assert sketch.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_fast_values_go_in_the_zero_bucket():
+    sketch = latency.QuantileSketch()
+    for value in (0.0, 0.001, -1.0, 5.0):
+        sketch.add(value)
+    assert sketch.zero == 3
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == 5.0
+
+
+def test_merge_equals_one_sketch():
+    left, right, both = latency.QuantileSketch(), latency.QuantileSketch(), latency.QuantileSketch()
+    for i in range(1, 200):
+        (left if i % 2 else right).add(i / 10)
+        both.add(i / 10)
+    merged = left.merge(right)
+    assert merged.buckets == both.buckets
+    assert (merged.count, merged.min, merged.max) == (both.count, both.min, both.max)
+    assert merged.quantile(0.75) == both.quantile(0.75)
+
+
+def test_wire_round_trip_and_histogram():
+    sketch = latency.QuantileSketch()
+    for value in (0.0, 1.0, 2.5, 7.0, 30.0):
+        sketch.add(value)
+    restored = latency.QuantileSketch.from_wire(sketch.to_wire())
+    assert restored.to_wire() == sketch.to_wire()
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    histogram = sketch.histogram(bins=3)
+    assert [count for _, _, count in histogram] == [4, 0, 1]
+    assert histogram[-1][1] == pytest.approx(30.0)
+    assert latency.QuantileSketch().quantile(0.5) is None
+
+
+def test_matches_add_their_delays():
+    matches = {
+        "m1": Match("m1", "a", "b", Guilt.GUILTY, 100.0, Offer.STINGY, 104.0, Response.ACCEPT, 110.0),
+        "m2": Match("m2", "c", "d", Guilt.INNOCENT, 100.0, Offer.STINGY, 130.0, Response.REJECT, 131.0,
+                    offer_timed_out=True),
+        "m3": Match("m3", "e", "f", Guilt.INNOCENT, 100.0),
+    }
+    rows = {row["Measure"]: row for row in latency.from_matches(matches).rows()}
+    assert (rows[latency.TO_OFFER]["Count"], rows[latency.TO_OFFER]["Timed out"]) == (2, 1)
+    assert rows[latency.TO_OFFER]["Median (s)"] == pytest.approx(4.0, rel=latency.RELATIVE_ACCURACY)
+    assert rows[latency.TO_RESPOND]["Slowest (s)"] == 6.0
+    assert rows[latency.DURATION]["Slowest (s)"] == 31.0
@@ -0,0 +1,78 @@
+from dataclasses import replace
+
+import pytest
+
+import faulty_db
+import outcome_tally
+from game_records import Guilt, Match, Offer, Response
+from memory_db import MemoryDatabase
+
+OUTCOMES = [(Guilt.GUILTY, Offer.GENEROUS, Response.ACCEPT), (Guilt.GUILTY, Offer.STINGY, Response.REJECT),
+            (Guilt.INNOCENT, Offer.STINGY, Response.ACCEPT)]
+
+
+def completed_matches(database, count=12):
+    matches = []
+    for i in range(count):
+        guilt, offer, response = OUTCOMES[i % len(OUTCOMES)]
+        match = Match(f"e{i}_vs_a{i}", f"e{i}", f"a{i}", guilt, 100.0, offer, 110.0 + i, response, 120.0 + i)
+        database.reference(f"lawsuit_matches/{match.match_id}").set(match.to_wire())
+        matches.append(match)
+    return matches
+
+
+class CountersUnreachable:
+    """Claims land but the counter writes never do, as for a client that dies between the steps."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def reference(self, path="/"):
+        if path == outcome_tally.OUTCOMES_PATH:
+            raise faulty_db.InjectedFault("injected counter failure")
+        return self.database.reference(path)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(outcome_tally, "RETRY_DELAY", 0)
+
+
+def test_each_match_is_counted_once():
+    database = MemoryDatabase()
+    matches = completed_matches(database)
+    assert all(outcome_tally.record(database, match) for match in matches)
+    assert not any(outcome_tally.record(database, match) for match in matches)
+    assert outcome_tally.load(database) == outcome_tally.from_matches(matches)
+    assert set(database.reference(outcome_tally.COUNTED_PATH).get().values()) == {True}
+
+
+def test_retries_through_faults_count_each_match_once():
+    database = MemoryDatabase()
+    matches = completed_matches(database, 30)
+    faulty = faulty_db.FaultyDatabase(database, faulty_db.parse_profile("errors=0.2,lost=0.2,seed=5"),
+                                      sleep=lambda seconds: None)
+    for match in matches:
+        while True:
+            try:
+                outcome_tally.record(faulty, match)
+                break
+            except faulty_db.InjectedFault:
+                pass  # the caller retries, as the write-behind follow-up does
+    assert outcome_tally.load(database) == outcome_tally.from_matches(matches)
+    assert outcome_tally.settle(database) == 0
+
+
+def test_settle_counts_a_claim_left_open():
+    database = MemoryDatabase()
+    matches = completed_matches(database, 3)
+    outcome_tally.record(database, matches[0])
+    with pytest.raises(faulty_db.InjectedFault):
+        outcome_tally.record(CountersUnreachable(database), matches[1])
+    assert outcome_tally.load(database).completed == 1
+    # Another completion of the same match id can't take over the open claim
+    assert not outcome_tally.record(database, replace(matches[1], response_at=999.0))
+
+    assert outcome_tally.settle(database) == 1
+    assert outcome_tally.settle(database) == 0
+    assert outcome_tally.load(database) == outcome_tally.from_matches(matches[:2])
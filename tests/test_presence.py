@@ -0,0 +1,130 @@
+import random
+import time
+
+import cohort
+import game_events
+import presence
+import rounds
+from game_records import Role, parse_matches, parse_player, parse_players
+from memory_db import MemoryDatabase
+
+
+def paired_class(players=8, seed=3):
+    database = MemoryDatabase({"lawsuit_expected_players": players})
+    now = time.time() - 120
+    for i in range(players):
+        cohort.register_player(database, f"p{i}", now=now + i)
+    cohort.pair_all(database, parse_players(database.reference("lawsuit_players").get()), players, random.Random(seed))
+    return database
+
+
+def state(database):
+    return (parse_players(database.reference("lawsuit_players").get()),
+            parse_matches(database.reference("lawsuit_matches").get()),
+            database.reference("lawsuit_expected_players").get())
+
+
+def assert_fold_matches(database):
+    folded = game_events.fold_events(database.reference(game_events.EVENTS_PATH).get())
+    assert folded["players"] == database.reference("lawsuit_players").get()
+    assert folded["matches"] == database.reference("lawsuit_matches").get()
+
+
+def leave(database, name):
+    players, matches, _ = state(database)
+    player = players[name]
+    return presence.reap(database, player, matches.get(player.match_id))
+
+
+def test_partner_left_mid_match_waits_and_stops_counting():
+    database = paired_class()
+    players, matches, _ = state(database)
+    match = next(iter(matches.values()))
+    assert leave(database, match.ebay_player)
+
+    players, matches, expected = state(database)
+    partner = players[match.att_player]
+    assert partner.partner_left and partner.match_id is None
+    assert match.match_id not in matches
+    assert expected == 6  # the leaver and the waiting partner
+    assert cohort.registered_count(database) == 7
+    assert_fold_matches(database)
+
+
+def test_waiting_partners_of_both_roles_are_paired():
+    database = paired_class()
+    _, matches, _ = state(database)
+    first, second = sorted(matches.values(), key=lambda m: m.match_id)[:2]
+    leave(database, first.ebay_player)  # leaves an AT&T player waiting
+    leave(database, second.att_player)  # its eBay partner is paired with them at once
+
+    players, matches, expected = state(database)
+    new_match = matches[f"{second.ebay_player}_vs_{first.att_player}"]
+    assert new_match.guilt == second.guilt
+    assert players[first.att_player].match_id == players[second.ebay_player].match_id == new_match.match_id
+    assert not players[first.att_player].partner_left
+    assert expected == 6 == 2 * len(matches)
+    assert_fold_matches(database)
+
+
+def test_same_role_partners_keep_waiting():
+    database = paired_class()
+    _, matches, _ = state(database)
+    first, second = sorted(matches.values(), key=lambda m: m.match_id)[:2]
+    leave(database, first.ebay_player)
+    leave(database, second.ebay_player)
+
+    players, _, expected = state(database)
+    assert players[first.att_player].partner_left and players[second.att_player].partner_left
+    assert expected == 4
+    assert_fold_matches(database)
+
+
+def test_waiting_player_who_leaves_does_not_shrink_again():
+    database = paired_class()
+    _, matches, _ = state(database)
+    match = next(iter(matches.values()))
+    leave(database, match.ebay_player)
+    assert leave(database, match.att_player)
+    assert state(database)[2] == 6
+    assert_fold_matches(database)
+
+
+def test_reap_only_removes_the_stale_record():
+    database = paired_class()
+    players, matches, _ = state(database)
+    stale = players["p0"]
+    database.reference("lawsuit_players/p0/t").set(time.time())  # re-registered since
+    assert not presence.reap(database, stale, matches.get(stale.match_id))
+    assert parse_player("p0", database.reference("lawsuit_players/p0").get()) is not None
+
+
+def test_sweep_reaps_silent_players_who_are_needed():
+    database = MemoryDatabase({"lawsuit_expected_players": 4})
+    now = time.time()
+    cohort.register_player(database, "gone", now=now - 300)
+    cohort.register_player(database, "here", now=now - 300)
+    presence.heartbeat(database, "here", now)
+    players, matches, expected = state(database)
+    seen = database.reference(presence.PRESENCE_PATH).get()
+    assert presence.sweep(database, players, matches, seen, expected, now) == ["gone"]
+    # Someone leaving the waiting room frees their seat without shrinking the class
+    assert set(state(database)[0]) == {"here"}
+    assert state(database)[2] == 4
+
+
+def test_multi_round_partner_skips_the_round():
+    database = MemoryDatabase({"lawsuit_expected_players": 4})
+    now = time.time() - 120
+    for i in range(4):
+        cohort.register_player(database, f"p{i}", now=now + i)
+    rounds.schedule_all(database, parse_players(database.reference("lawsuit_players").get()), 4,
+                        {"rounds": 2, "swap_roles": False}, random.Random(1))
+    players, matches, _ = state(database)
+    ebay = next(p for p in players.values() if p.role == Role.EBAY)
+    partner = matches[ebay.match_id].att_player
+    assert presence.reap(database, ebay, matches[ebay.match_id])
+    players, matches, expected = state(database)
+    assert not players[partner].partner_left and players[partner].match_id is None
+    assert expected == 3
+    assert_fold_matches(database)
@@ -0,0 +1,25 @@
+import time
+from pathlib import Path
+
+import matplotlib.figure
+import pytest
+import streamlit
+
+import charts
+import rerun_budgets
+
+
+@pytest.fixture(autouse=True)
+def app_directory(monkeypatch):
+    monkeypatch.chdir(Path(__file__).resolve().parent.parent)
+    # Meter.install patches these for the whole process; put them back after each test
+    monkeypatch.setattr(time, "sleep", time.sleep)
+    monkeypatch.setattr(matplotlib.figure.Figure, "__init__", matplotlib.figure.Figure.__init__)
+    monkeypatch.setattr(streamlit, "rerun", streamlit.rerun)
+
+
+@pytest.mark.parametrize("chart_backend", [charts.NATIVE, charts.MATPLOTLIB])
+@pytest.mark.parametrize("players", rerun_budgets.DEFAULT_SIZES)
+def test_every_screen_stays_within_budget(players, chart_backend):
+    results = rerun_budgets.run([players], chart_backend)
+    assert [(label, detail) for label, ok, detail in results if not ok] == []
@@ -0,0 +1,30 @@
+import random
+import time
+
+import cohort
+import deadlines
+import game_events
+import rounds
+from game_records import Offer, parse_matches, parse_players
+from memory_db import MemoryDatabase
+
+
+def test_later_round_starts_at_the_first_arrival():
+    now = time.time()
+    database = MemoryDatabase({"lawsuit_expected_players": 2})
+    for name in ("a", "b"):
+        cohort.register_player(database, name, now=now - 60)
+    players = parse_players(database.reference("lawsuit_players").get())
+    rounds.schedule_all(database, players, 2, {"rounds": 2, "swap_roles": False}, random.Random(1))
+    match = next(m for m in parse_matches(database.reference("lawsuit_matches").get()).values() if m.round_no == 2)
+
+    rounds.advance(database, [match.att_player], match.match_id, 2, now + 1)
+    deadlines.apply_move(database, match, deadlines.OFFER, Offer.STINGY, now + 5)
+    rounds.advance(database, [match.ebay_player], match.match_id, 2, now + 10)
+
+    match = parse_matches(database.reference("lawsuit_matches").get())[match.match_id]
+    assert match.created_at == now + 1
+    assert match.offer_delay == 4
+    state = game_events.fold_events(database.reference(game_events.EVENTS_PATH).get())
+    assert state["matches"] == database.reference("lawsuit_matches").get()
+    assert state["players"] == database.reference("lawsuit_players").get()
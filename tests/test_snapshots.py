@@ -0,0 +1,65 @@
+import random
+import time
+
+import pytest
+
+import cohort
+import deadlines
+import game_events
+import outcome_tally
+import presence
+import snapshots
+from game_records import Offer, Response, parse_matches, parse_players
+from memory_db import MemoryDatabase
+
+
+def played(players=6):
+    """A class that has joined, been paired and played half its matches."""
+    now = time.time()
+    database = MemoryDatabase({"lawsuit_expected_players": players})
+    for i in range(players):
+        cohort.register_player(database, f"p{i}", now=now - 60 + i)
+    cohort.pair_all(database, parse_players(database.reference("lawsuit_players").get()), players, random.Random(2))
+    for i, match in enumerate(sorted(parse_matches(database.reference("lawsuit_matches").get()).values(),
+                                     key=lambda m: m.match_id)[:players // 4 + 1]):
+        deadlines.apply_move(database, match, deadlines.OFFER, Offer.STINGY, now + i)
+        match = parse_matches(database.reference("lawsuit_matches").get())[match.match_id]
+        deadlines.apply_move(database, match, deadlines.RESPONSE, Response.ACCEPT, now + 10 + i)
+    return database
+
+
+def game_state(database):
+    return {path: database.reference(path).get() for path in snapshots.GAME_PATHS}
+
+
+def test_checkpoint_survives_a_file_round_trip():
+    database = played()
+    snapshot = snapshots.checkpoint(database, now=123.0)
+    assert snapshots.loads(snapshots.dumps(snapshot)) == snapshot
+    assert snapshots.summary(snapshot)["players"] == 6
+
+
+def test_restore_replaces_the_current_game():
+    original = played()
+    snapshot = snapshots.loads(snapshots.dumps(snapshots.checkpoint(original)))
+    database = played(8)  # a different game is running
+    database.reference("/").update(game_events.reset_update())
+    cohort.register_player(database, "late")
+
+    summary = snapshots.restore(database, snapshot, now=500.0)
+    assert game_state(database) == game_state(original)
+    assert summary == snapshots.summary(snapshot)
+    assert database.reference(presence.PRESENCE_PATH).get() == {f"p{i}": 500.0 for i in range(6)}
+    assert outcome_tally.load(database).completed == 2
+    consumer = game_events.EventConsumer(database, cursor=game_events.game_start(database))
+    consumer.poll()
+    assert consumer.state["players"] == database.reference("lawsuit_players").get()
+
+
+def test_loads_rejects_other_files():
+    with pytest.raises(ValueError):
+        snapshots.loads(b"not gzip")
+    with pytest.raises(ValueError):
+        snapshots.loads(snapshots.dumps({"version": snapshots.FORMAT_VERSION + 1, "paths": {}}))
+    with pytest.raises(ValueError):
+        snapshots.loads(snapshots.dumps({"version": snapshots.FORMAT_VERSION, "paths": {"elsewhere": 1}}))
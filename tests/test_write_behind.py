@@ -0,0 +1,70 @@
+import pytest
+
+import background
+import faulty_db
+from memory_db import MemoryDatabase
+from write_behind import WriteQueue
+
+
+@pytest.fixture(autouse=True)
+def quick_backoff(monkeypatch):
+    monkeypatch.setattr(background, "MIN_BACKOFF", 0.001)
+    monkeypatch.setattr(background, "MAX_BACKOFF", 0.01)
+
+
+def test_backoff_doubles_up_to_the_cap_and_resets(monkeypatch):
+    monkeypatch.setattr(background, "MIN_BACKOFF", 0.5)
+    monkeypatch.setattr(background, "MAX_BACKOFF", 8.0)
+    waits = []
+    backoff = background.Backoff(sleep=waits.append)
+    for _ in range(6):
+        backoff.wait()
+    backoff.reset()
+    backoff.wait()
+    assert waits == [0.5, 1, 2, 4, 8, 8, 0.5]
+
+
+def test_flush_applies_each_key_once():
+    database = MemoryDatabase()
+    queue = WriteQueue(database, batch_window=0.01)
+    followed = []
+    assert queue.submit("a", {"x/a": 1}, after=lambda: followed.append("a"))
+    assert not queue.submit("a", {"x/a": 2})  # a double click
+    assert queue.pending_value("x") == {"a": 1}
+    assert queue.flush()
+    assert not queue.submit("a", {"x/a": 3})  # already applied
+    assert database.reference("x").get() == {"a": 1}
+    assert followed == ["a"]
+
+
+def test_a_declined_write_has_no_follow_up():
+    database = MemoryDatabase()
+    queue = WriteQueue(database, batch_window=0.01)
+    followed = []
+    queue.submit("move", {"x/a": 1}, after=lambda: followed.append("move"), apply=lambda: False)
+    assert queue.flush()
+    assert followed == []
+
+
+def test_writes_land_through_faults():
+    database = MemoryDatabase()
+    faulty = faulty_db.FaultyDatabase(database, faulty_db.parse_profile("errors=0.3,lost=0.3,seed=4"))
+    queue = WriteQueue(faulty, batch_window=0.001)
+    for i in range(50):
+        queue.submit(f"k{i}", {f"x/k{i}": i}, after=lambda i=i: faulty.reference(f"y/k{i}").set(i))
+    assert queue.flush()
+    assert database.reference("x").get() == {f"k{i}": i for i in range(50)}
+    assert database.reference("y").get() == {f"k{i}": i for i in range(50)}
+    assert sum(faulty.faults.values()) > 0
+
+
+def test_forget_drops_queued_writes_and_applied_keys():
+    database = MemoryDatabase()
+    queue = WriteQueue(database, batch_window=0.2)
+    queue.submit("old", {"x/old": 1})
+    queue.forget()
+    assert queue.flush()
+    assert database.reference("x").get() is None
+    assert queue.submit("old", {"x/old": 2})  # the key is free for the next game
+    assert queue.flush()
+    assert database.reference("x").get() == {"old": 2}
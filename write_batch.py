@@ -0,0 +1,39 @@
+"""Collect related changes and write them in a single multi-path update.
+
+A student's onboarding touches several nodes (their player record, a new
+match, the partner's match link and the event log). Instead of writing each
+one and reading it back, callers keep the records they built locally, ``add``
+the multi-path updates built by ``cohort`` / ``game_events`` to a
+``WriteBatch`` and ``commit`` everything in one root ``update()``.
+"""
+
+
+def updates_under(updates, path):
+    """Values in multi-path ``updates`` written at or directly under ``path``, as one dict."""
+    path = path.strip("/")
+    merged = {}
+    for update_path, value in updates.items():
+        update_path = update_path.strip("/")
+        if update_path == path and isinstance(value, dict):
+            merged.update(value)
+        elif update_path.startswith(path + "/") and "/" not in update_path[len(path) + 1:]:
+            merged[update_path[len(path) + 1:]] = value
+    return merged
+
+
+class WriteBatch:
+    def __init__(self, database):
+        self.database = database
+        self.updates = {}
+
+    def add(self, updates):
+        self.updates.update(updates)
+        return self
+
+    def commit(self):
+        """Write everything added so far in one round trip; no-op if empty."""
+        if not self.updates:
+            return False
+        self.database.reference("/").update(self.updates)
+        self.updates = {}
+        return True
@@ -0,0 +1,163 @@
+"""Write-behind queue so player actions never block on the network.
+
+Clicks such as "Submit Offer" enqueue a multi-path update under an
+idempotency key and return immediately; a background writer thread merges
+everything pending into one root ``update()`` and retries with backoff until
+it lands. Updates are built at click time with fixed values (including
+timestamps and event-log keys), so re-applying one after a lost response
+writes exactly the same data, and a key that is already queued or applied
+is ignored, so double clicks can't produce a second move.
+
+A write that must not overwrite someone else's (a player's move racing a
+deadline default) is queued with ``apply``: the writer runs that callable -
+typically a transaction - on its own instead of merging the update into the
+batch, and skips the follow-up if it reports the write was declined.
+
+Until an update is flushed, ``pending_value`` lets the UI overlay it on what
+it reads back from the database (optimistic state).
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from background import Backoff, PerDatabase, ensure_thread
+from write_batch import updates_under
+
+BATCH_WINDOW = 0.05  # seconds to wait for more writes before flushing
+MAX_BATCH = 200
+APPLIED_KEYS_KEPT = 10_000
+APPLIED_KEY_TTL = 60.0  # seconds a flushed key keeps rejecting duplicates
+
+
+@dataclass(slots=True)
+class QueuedWrite:
+    key: str
+    updates: dict
+    after: object = None  # optional callable run once after the update lands
+    apply: object = None  # optional callable writing the item itself; returns False if declined
+    written: bool = False
+    attempts: int = 0
+
+
+class WriteQueue:
+    def __init__(self, database, batch_window=BATCH_WINDOW):
+        self.database = database
+        self.batch_window = batch_window
+        self.last_error = None
+        self._pending = OrderedDict()
+        self._applied = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, key, updates, after=None, apply=None):
+        """Queue ``updates`` under idempotency ``key``; False if the key was seen before.
+
+        With ``apply``, ``updates`` is only the optimistic view and ``apply()`` does the write.
+        """
+        with self._cond:
+            if key in self._pending or time.time() - self._applied.get(key, 0) < APPLIED_KEY_TTL:
+                return False
+            self._pending[key] = QueuedWrite(key, updates, after, apply)
+            self._thread = ensure_thread(self._thread, self._run, "write-behind")
+            self._cond.notify_all()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def pending_value(self, path):
+        """Merge of all queued, not yet flushed writes at or directly under ``path``."""
+        merged = {}
+        with self._cond:
+            for item in self._pending.values():
+                if not item.written:
+                    merged.update(updates_under(item.updates, path))
+        return merged
+
+    def forget(self):
+        """Drop queued writes and the record of applied keys (after an admin reset or restore).
+
+        Writes still queued belong to the previous game and must not land in the
+        next one. A batch already on its way to the database can't be called back.
+        """
+        with self._cond:
+            self._pending.clear()
+            self._applied.clear()
+            self._cond.notify_all()
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far has been applied; True on success."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        backoff = Backoff()
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self.batch_window)
+            with self._cond:
+                batch = list(self._pending.values())[:MAX_BATCH]
+
+            try:
+                merged = {}
+                with self._cond:
+                    # Anything forgotten while the batch window was open is dropped
+                    batch = [item for item in batch if self._pending.get(item.key) is item]
+                for item in batch:
+                    if not item.written and item.apply is None:
+                        item.attempts += 1
+                        merged.update(item.updates)
+                if merged:
+                    self.database.reference("/").update(merged)
+                for item in batch:
+                    if item.apply is None:
+                        item.written = True
+            except Exception as error:
+                self.last_error = error
+                backoff.wait()
+                continue
+
+            finished = []
+            for item in batch:
+                try:
+                    if not item.written:
+                        # Conditional writes go one by one; a declined one has nothing to follow up
+                        item.attempts += 1
+                        if not item.apply():
+                            item.after = None
+                        item.written = True
+                    if item.after is not None:
+                        item.after()
+                        item.after = None
+                    finished.append(item.key)
+                except Exception as error:
+                    # Retried on the next pass (only the follow-up, once the write has landed)
+                    self.last_error = error
+
+            with self._cond:
+                for key in finished:
+                    self._pending.pop(key, None)
+                    self._applied[key] = time.time()
+                while len(self._applied) > APPLIED_KEYS_KEPT:
+                    self._applied.popitem(last=False)
+                self._cond.notify_all()
+
+            if len(finished) < len(batch):
+                backoff.wait()
+            else:
+                backoff.reset()
+                self.last_error = None
+
+
+# Process-wide queue for a database (shared by every session)
+queue_for = PerDatabase(WriteQueue)